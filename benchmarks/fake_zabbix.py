@@ -0,0 +1,474 @@
+# -*- coding: utf-8 -*-
+
+from collections import Counter
+import json, threading, time
+
+# API objects stored by the server: ID key, IDs parameter and name key
+OBJECT_KEYS = {
+    'host':         ('hostid',          'hostids',          'host'),
+    'template':     ('templateid',      'templateids',      'host'),
+    'hostgroup':    ('groupid',         'groupids',         'name'),
+    'valuemap':     ('valuemapid',      'valuemapids',      'name'),
+    'usergroup':    ('usrgrpid',        'usrgrpids',        'name'),
+    'usermacro':    ('globalmacroid',   'globalmacroids',   'macro'),
+    'drule':        ('druleid',         'druleids',         'name'),
+    'action':       ('actionid',        'actionids',        'name'),
+}
+
+# Global macros are changed by "usermacro.createglobal", "usermacro.updateglobal" and "usermacro.deleteglobal"
+WRITE_METHODS = {
+    'create':       'create',
+    'createglobal': 'create',
+    'update':       'update',
+    'updateglobal': 'update',
+    'delete':       'delete',
+    'deleteglobal': 'delete',
+}
+
+SUMMARY_GROUP = 'DUMMY Summary'
+TEMPLATES_GROUP = 'Templates'
+TEMPLATE_ITEMS = 10
+TEMPLATE_TRIGGERS = 2
+
+class FakeZabbixServer(object):
+    ''' In-process fake Zabbix JSON-RPC server with synthetic data, it is a handler of LocalTransport.
+        Host groups, hosts, templates, value maps, macros, discovery rules and actions are stored
+        and can be got, created, updated, deleted, exported and imported.
+        Triggers and problems are generated from their IDs, so large numbers of problems take no memory:
+        event N is a problem of trigger (N - 1) % triggers + 1, which belongs to one of the initial hosts.
+        Problems resolved by resolve_problems get recovery events (returned by "event.get") with IDs after all problems.
+        Every call sleeps for the latency outside of the server lock, so concurrent calls overlap like real ones.
+    '''
+
+    def __init__(self, hosts=1000, problems=5000, actions=50, templates=30, groups=None, triggers=None,
+            macros=100, discovery_rules=10, latency=0.0):
+        """ Generate synthetic data.
+            :param hosts:           (int) number of hosts
+            :param problems:        (int) number of problems (event IDs from 1 to problems)
+            :param actions:         (int) number of actions
+            :param templates:       (int) number of templates, templates "DUMMY Group N" are linked to hosts of "Group N"
+            :param groups:          (int) number of host groups (a group per 500 hosts by default)
+            :param triggers:        (int) number of triggers with problems (a trigger per 2 problems by default)
+            :param macros:          (int) number of global macros
+            :param discovery_rules: (int) number of discovery rules
+            :param latency:         (float) seconds every call takes
+        """
+        self.latency = latency
+        self._problems = problems
+        self._triggers = triggers or max(1, problems // 2)
+        self._resolved_problems = set()
+        self._recovery_events = []
+        self._objects = { object_name: {} for object_name in OBJECT_KEYS }
+        self._indexes = {}
+        self._next_id = 1
+        self._calls = Counter()
+        self._lock = threading.Lock()
+
+        groups = groups or max(1, hosts // 500)
+        group_ids = [ self._create('hostgroup', { 'name': 'Group {}'.format(i) }) for i in range(groups) ]
+        self._create('hostgroup', { 'name': SUMMARY_GROUP })
+        templates_group_id = self._create('hostgroup', { 'name': TEMPLATES_GROUP })
+
+        template_ids = []
+        for i in range(templates):
+            name = 'DUMMY Group {}'.format(i) if i < groups else 'Template {}'.format(i)
+            template_ids.append( self._create('template', { 'host': name, 'groups': [{ 'groupid': templates_group_id }] }) )
+
+        self._problem_hosts = []
+        for i in range(hosts):
+            host = {
+                'host': 'host-{}'.format(i),
+                'groups': [{ 'groupid': group_ids[i % groups] }],
+                'templates': [{ 'templateid': template_ids[i % groups] }] if i % groups < templates else [],
+                'interfaces': [{ 'type': 1, 'main': 1, 'useip': 1, 'ip': '10.{}.{}.{}'.format(i >> 16 & 255, i >> 8 & 255, i & 255),
+                                 'dns': '', 'port': '10050' }],
+            }
+            self._problem_hosts.append( self._create('host', host) )
+
+        self._create('valuemap', { 'name': 'Service state', 'mappings': [
+            { 'value': '0', 'newvalue': 'Down' },
+            { 'value': '1', 'newvalue': 'Up' },
+        ]})
+        user_group_id = self._create('usergroup', { 'name': 'Zabbix administrators' })
+
+        for i in range(macros):
+            self._create('usermacro', { 'macro': '{{$MACRO_{}}}'.format(i), 'value': str(i) })
+
+        for i in range(discovery_rules):
+            self._create('drule', {
+                'name': 'Discovery {}'.format(i), 'iprange': '10.{}.0.1-254'.format(i % 256), 'delay': '1h',
+                'status': '1', 'proxy_hostid': '0', 'nextcheck': '0',
+                'dchecks': [{ 'dcheckid': str(i + 1), 'type': '9', 'key_': 'system.uname', 'ports': '10050', 'uniq': '0' }],
+            })
+
+        for i in range(actions):
+            self._create('action', {
+                'name': 'Action {}'.format(i), 'eventsource': '0', 'status': '0', 'esc_period': '1h',
+                'def_shortdata': '{TRIGGER.NAME}', 'def_longdata': '{TRIGGER.STATUS}: {TRIGGER.NAME}',
+                'filter': {
+                    'evaltype': '0', 'formula': '', 'eval_formula': 'A',
+                    'conditions': [{ 'conditiontype': '0', 'operator': '0', 'value': group_ids[i % groups], 'formulaid': 'A' }],
+                },
+                'operations': [{
+                    'operationtype': '0', 'esc_period': '0', 'esc_step_from': '1', 'esc_step_to': '1', 'evaltype': '0',
+                    'opmessage': { 'default_msg': '1', 'mediatypeid': '0' },
+                    'opmessage_grp': [{ 'usrgrpid': user_group_id }],
+                }],
+                'recoveryOperations': [],
+                'acknowledgeOperations': [],
+            })
+
+    def __call__(self, method, params):
+        with self._lock:
+            self._calls[method] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+        object_name, method_name = method.split('.', 1)
+        if method == 'user.login':
+            return 'fake_auth_token'
+        elif method == 'problem.get':
+            return self._get_problems(params)
+        elif method == 'trigger.get':
+            return self._get_triggers(params)
+        elif method == 'event.get':
+            return self._get_recovery_events(params)
+        elif method == 'configuration.export':
+            with self._lock:
+                return json.dumps({ 'zabbix_export': self._export(params['options']) })
+        elif method == 'configuration.import':
+            with self._lock:
+                return self._import(json.loads(params['source'])['zabbix_export'], params['rules'])
+        elif object_name in OBJECT_KEYS and method_name == 'get':
+            with self._lock:
+                return self._get(object_name, params)
+        elif object_name in OBJECT_KEYS and method_name in WRITE_METHODS:
+            objects = params if isinstance(params, list) else [params]
+            with self._lock:
+                return { OBJECT_KEYS[object_name][1]: self._write(object_name, WRITE_METHODS[method_name], objects) }
+        else:
+            raise Exception('Method "{}" is not supported by fake Zabbix server'.format(method))
+
+    def resolve_problems(self, event_ids):
+        ''' Resolve open problems creating a recovery event for every problem. '''
+        with self._lock:
+            for event_id in event_ids:
+                if 1 <= event_id <= self._problems and event_id not in self._resolved_problems:
+                    self._resolved_problems.add(event_id)
+                    recovery_event_id = self._problems + len(self._recovery_events) + 1
+                    self._recovery_events.append( (recovery_event_id, (event_id - 1) % self._triggers + 1) )
+
+    def get_calls(self, reset=False):
+        ''' Return a dictionary with numbers of calls by method, optionally resetting the counters. '''
+        with self._lock:
+            calls = dict(self._calls)
+            if reset:
+                self._calls.clear()
+            return calls
+
+    def _write(self, object_name, operation, objects):
+        # Changes of one call are applied all or nothing like in Zabbix
+        if operation == 'delete':
+            for id in objects:
+                if id not in self._objects[object_name]:
+                    raise Exception('No permissions to referred object or it does not exist!')
+        elif operation == 'update':
+            for object in objects:
+                if object.get(OBJECT_KEYS[object_name][0]) not in self._objects[object_name]:
+                    raise Exception('No permissions to referred object or it does not exist!')
+
+        ids = []
+        try:
+            for object in objects:
+                ids.append( getattr(self, '_' + operation)(object_name, object) )
+        except Exception:
+            for id in ids:
+                self._delete(object_name, id)
+            raise
+        return ids
+
+    def _create(self, object_name, object):
+        id_key, ids_key, name_key = OBJECT_KEYS[object_name]
+        if self._find_ids(object_name, { name_key: object[name_key] }):
+            raise Exception('Object "{}" already exists.'.format(object[name_key]))
+
+        object = dict(object)
+        object[id_key] = str(self._next_id)
+        self._next_id += 1
+        if object_name in ['host', 'template']:
+            object.setdefault('name', object['host'])
+        if object_name in ['host', 'hostgroup']:
+            object.setdefault('flags', '0')
+        if object_name == 'hostgroup':
+            object.setdefault('internal', '0')
+
+        self._objects[object_name][ object[id_key] ] = object
+        self._index_object(object_name, object[id_key])
+        return object[id_key]
+
+    def _update(self, object_name, object):
+        id_key = OBJECT_KEYS[object_name][0]
+        if object.get(id_key) not in self._objects[object_name]:
+            raise Exception('No permissions to referred object or it does not exist!')
+        self._index_object(object_name, object[id_key], remove=True)
+        self._objects[object_name][ object[id_key] ].update(object)
+        self._index_object(object_name, object[id_key])
+        return object[id_key]
+
+    def _delete(self, object_name, id):
+        if id not in self._objects[object_name]:
+            raise Exception('No permissions to referred object or it does not exist!')
+        self._index_object(object_name, id, remove=True)
+        del self._objects[object_name][id]
+        return id
+
+    def _get_index(self, object_name, key):
+        # Indexes {field value: set of IDs} are built on the first filter by the field and kept up to date by changes
+        indexes = self._indexes.setdefault(object_name, {})
+        if key not in indexes:
+            index = {}
+            for id, object in self._objects[object_name].items():
+                index.setdefault(unicode(object.get(key)), set()).add(id)
+            indexes[key] = index
+        return indexes[key]
+
+    def _index_object(self, object_name, id, remove=False):
+        object = self._objects[object_name][id]
+        for key, index in self._indexes.get(object_name, {}).items():
+            if remove:
+                index[ unicode(object.get(key)) ].discard(id)
+            else:
+                index.setdefault(unicode(object.get(key)), set()).add(id)
+
+    def _find_ids(self, object_name, filter):
+        ''' Return a list of IDs of objects matching the filter {key: value or list of values}. '''
+        ids = None
+        for key, values in filter.items():
+            values = values if isinstance(values, list) else [values]
+            index = self._get_index(object_name, key)
+            matched_ids = set( id for value in values for id in index.get(unicode(value), []) )
+            ids = matched_ids if ids is None else ids & matched_ids
+        return sorted(ids, key=int) if ids is not None else sorted(self._objects[object_name], key=int)
+
+    def _get(self, object_name, params):
+        id_key, ids_key, name_key = OBJECT_KEYS[object_name]
+        ids = self._find_ids(object_name, params.get('filter', {}))
+        if ids_key in params:
+            requested_ids = params[ids_key] if isinstance(params[ids_key], list) else [ params[ids_key] ]
+            requested_ids = set( str(id) for id in requested_ids )
+            ids = [ id for id in ids if id in requested_ids ]
+        if params.get('templated_hosts'):
+            template_group_ids = set( group['groupid'] for template in self._objects['template'].values() for group in template['groups'] )
+            ids = [ id for id in ids if id in template_group_ids ]
+
+        output = params.get('output', 'extend')
+        objects = []
+        for id in ids:
+            object = self._objects[object_name][id]
+            if output != 'extend':
+                object = { key: object[key] for key in output if key in object }
+            objects.append(object)
+
+        if params.get('preservekeys'):
+            return { id: object for id, object in zip(ids, objects) }
+        return objects
+
+    def _get_trigger(self, trigger_id):
+        ''' Return trigger with expanded description, hosts and groups (None if its host is deleted). '''
+        host = self._objects['host'].get( self._problem_hosts[ (trigger_id - 1) % len(self._problem_hosts) ] )
+        if host is None:
+            return None
+        hostgroups = self._objects['hostgroup']
+        return {
+            'triggerid': str(trigger_id),
+            'description': 'Problem {} on {}'.format(trigger_id, host['name']),
+            'priority': str(trigger_id % 6),
+            'hosts': [{ 'hostid': host['hostid'], 'name': host['name'] }],
+            'groups': [
+                { 'groupid': group['groupid'], 'name': hostgroups[ group['groupid'] ]['name'] }
+                    for group in host['groups']
+                        if group['groupid'] in hostgroups
+            ],
+        }
+
+    def _get_triggers(self, params):
+        triggers = {}
+        with self._lock:
+            for trigger_id in params.get('triggerids', []):
+                if 1 <= int(trigger_id) <= self._triggers:
+                    trigger = self._get_trigger(int(trigger_id))
+                    if trigger is not None:
+                        triggers[ trigger['triggerid'] ] = trigger
+
+        if params.get('preservekeys'):
+            return triggers
+        return triggers.values()
+
+    def _get_trigger_host(self, trigger_id):
+        return self._objects['host'].get( self._problem_hosts[ (trigger_id - 1) % len(self._problem_hosts) ] )
+
+    def _get_recovery_events(self, params):
+        if str(params.get('value')) != '0':
+            raise Exception('Only recovery events are supported by fake Zabbix server')
+        group_ids = set( str(group_id) for group_id in params['groupids'] ) if 'groupids' in params else None
+        eventid_from = int(params.get('eventid_from', 0))
+        limit = int(params.get('limit', 0))
+
+        events = []
+        with self._lock:
+            recovery_events = self._recovery_events[::-1] if params.get('sortorder') == 'DESC' else self._recovery_events
+            for event_id, trigger_id in recovery_events:
+                if event_id < eventid_from:
+                    continue
+                if group_ids is not None:
+                    host = self._get_trigger_host(trigger_id)
+                    if host is None or not any( group['groupid'] in group_ids for group in host['groups'] ):
+                        continue
+                events.append({ 'eventid': str(event_id), 'objectid': str(trigger_id) })
+                if limit and len(events) == limit:
+                    break
+
+        return events
+
+    def _get_problems(self, params):
+        severities = set( int(severity) for severity in params['severities'] ) if 'severities' in params else None
+        group_ids = set( str(group_id) for group_id in params['groupids'] ) if 'groupids' in params else None
+        event_ids = set( int(event_id) for event_id in params['eventids'] ) if 'eventids' in params else None
+        eventid_from = int(params.get('eventid_from', 1))
+        eventid_till = int(params.get('eventid_till', self._problems))
+        limit = int(params.get('limit', 0))
+        select_tags = 'selectTags' in params
+        if event_ids is not None:
+            event_id_range = sorted( event_id for event_id in event_ids if eventid_from <= event_id <= min(self._problems, eventid_till) )
+        else:
+            event_id_range = range(max(1, eventid_from), min(self._problems, eventid_till) + 1)
+        if params.get('sortorder') == 'DESC':
+            event_id_range.reverse()
+
+        problems = []
+        with self._lock:
+            hosts = self._objects['host']
+            for event_id in event_id_range:
+                if event_id in self._resolved_problems:
+                    continue
+                trigger_id = (event_id - 1) % self._triggers + 1
+                if severities is not None and trigger_id % 6 not in severities:
+                    continue
+                host = hosts.get( self._problem_hosts[ (trigger_id - 1) % len(self._problem_hosts) ] )
+                if host is None:
+                    continue
+                if group_ids is not None and not any( group['groupid'] in group_ids for group in host['groups'] ):
+                    continue
+
+                problem = { 'eventid': str(event_id), 'objectid': str(trigger_id) }
+                if select_tags:
+                    problem['tags'] = [{ 'tag': 'service', 'value': 'svc-{}'.format(event_id % 50) }] if event_id % 3 == 0 else []
+                problems.append(problem)
+                if limit and len(problems) == limit:
+                    break
+
+        return problems
+
+    def _get_names(self, object_name, ids, name_key='name'):
+        objects = self._objects[object_name]
+        return [ { 'name': objects[id][name_key] } for id in ids if id in objects ]
+
+    def _export(self, options):
+        hosts = [ self._objects['host'][id] for id in options.get('hosts', []) if id in self._objects['host'] ]
+        templates = [ self._objects['template'][id] for id in options.get('templates', []) if id in self._objects['template'] ]
+        group_ids = set(options.get('groups', []))
+        for object in hosts + templates:
+            group_ids.update( group['groupid'] for group in object['groups'] )
+
+        export = {
+            'version': '4.0',
+            'groups': self._get_names('hostgroup', sorted(group_ids, key=int)),
+            'value_maps': [
+                { 'name': value_map['name'], 'mappings': value_map['mappings'] }
+                    for value_map in ( self._objects['valuemap'].get(id) for id in options.get('valueMaps', []) )
+                        if value_map is not None
+            ],
+        }
+
+        if len(templates) != 0:
+            export['templates'] = [{
+                'template': template['host'],
+                'name': template['name'],
+                'groups': self._get_names('hostgroup', [ group['groupid'] for group in template['groups'] ]),
+                'items': [
+                    { 'name': 'Metric {}'.format(i), 'type': 'ZABBIX_PASSIVE', 'key': 'metric[{}]'.format(i),
+                      'delay': '1m', 'history': '90d', 'trends': '365d', 'value_type': 'FLOAT' }
+                        for i in range(TEMPLATE_ITEMS)
+                ],
+            } for template in templates ]
+            export['triggers'] = [
+                { 'expression': '{{{}:metric[{}].last()}}>{}'.format(template['host'], i, 90 + i),
+                  'name': 'Metric {} is too high on {{HOST.NAME}}'.format(i), 'priority': 'HIGH' }
+                    for template in templates
+                        for i in range(TEMPLATE_TRIGGERS)
+            ]
+
+        if len(hosts) != 0:
+            export['hosts'] = [{
+                'host': host['host'],
+                'name': host['name'],
+                'groups': self._get_names('hostgroup', [ group['groupid'] for group in host['groups'] ]),
+                'templates': self._get_names('template', [ template['templateid'] for template in host['templates'] ], 'host'),
+                'interfaces': [
+                    { 'type': 'ZABBIX', 'useip': 'YES' if interface['useip'] else 'NO', 'ip': interface['ip'],
+                      'dns': interface['dns'], 'port': str(interface['port']), 'default': 'YES', 'interface_ref': 'if1' }
+                        for interface in host['interfaces']
+                ],
+            } for host in hosts ]
+
+        return export
+
+    def _get_ids_by_names(self, object_name, objects):
+        name_key = OBJECT_KEYS[object_name][2]
+        ids = []
+        for object in objects:
+            found_ids = self._find_ids(object_name, { name_key: object['name'] })
+            if len(found_ids) == 0:
+                raise Exception('Object "{}" does not exist.'.format(object['name']))
+            ids.append(found_ids[0])
+        return ids
+
+    def _import_object(self, object_name, name, object, rule):
+        name_key = OBJECT_KEYS[object_name][2]
+        ids = self._find_ids(object_name, { name_key: name })
+        if len(ids) == 0:
+            if rule.get('createMissing'):
+                self._create(object_name, object)
+        elif rule.get('updateExisting'):
+            object = dict(object)
+            object[ OBJECT_KEYS[object_name][0] ] = ids[0]
+            self._update(object_name, object)
+
+    def _import(self, source, rules):
+        for group in source.get('groups', []):
+            self._import_object('hostgroup', group['name'], { 'name': group['name'] }, rules.get('groups', {}))
+
+        for value_map in source.get('value_maps', []):
+            self._import_object('valuemap', value_map['name'], value_map, rules.get('valueMaps', {}))
+
+        for template in source.get('templates', []):
+            self._import_object('template', template['template'], {
+                'host': template['template'],
+                'name': template.get('name', template['template']),
+                'groups': [ { 'groupid': id } for id in self._get_ids_by_names('hostgroup', template['groups']) ],
+            }, rules.get('templates', {}))
+
+        for host in source.get('hosts', []):
+            self._import_object('host', host['host'], {
+                'host': host['host'],
+                'name': host.get('name', host['host']),
+                'groups': [ { 'groupid': id } for id in self._get_ids_by_names('hostgroup', host['groups']) ],
+                'templates': [ { 'templateid': id } for id in self._get_ids_by_names('template', host.get('templates', [])) ],
+                'interfaces': [
+                    { 'type': 1, 'main': 1, 'useip': 1 if interface.get('useip', 'YES') == 'YES' else 0, 'ip': interface.get('ip', ''),
+                      'dns': interface.get('dns', ''), 'port': interface.get('port', '10050') }
+                        for interface in host.get('interfaces', [])
+                ],
+            }, rules.get('hosts', {}))
+
+        return True
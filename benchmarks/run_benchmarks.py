@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+''' Benchmarks of ZabbixAPI against an in-process fake Zabbix server with synthetic data.
+    Run from the repository root: python -m benchmarks.run_benchmarks --help
+    Every benchmark runs in a forked process with its own server and API object, so peak memory is measured separately.
+    Peak memory is the high-water mark of resident set size (tracemalloc is not available in Python 2),
+    it includes the server data; "grown" is how much the high-water mark has grown during the benchmark.
+'''
+
+from collections import OrderedDict
+from unimonapi import ZabbixAPI
+from unimonapi import Event
+from unimonapi.zabbix.transport import LocalTransport
+from unimonapi.zabbix.metrics import APIMetrics
+from fake_zabbix import FakeZabbixServer
+import argparse, gc, json, logging, multiprocessing, resource, sys, time
+
+FAKE_ZABBIX_URL = 'http://fake-zabbix'
+
+def get_peak_memory_mb():
+    # Linux reports maximum resident set size in kilobytes
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+def run_get_problems(api, state, options):
+    return '{} events'.format(len(api.get_problems()))
+
+def run_get_summary(api, state, options):
+    return '{} groups'.format(len(api.get_summary(Event.SEVERITY_ICONS.keys())))
+
+def run_add_host(api, state, options):
+    groups = [ 'Group {}'.format(i % state['groups']) for i in range(options['new_hosts']) ]
+    for i, group in enumerate(groups):
+        api.add_host('new-host-{}'.format(i), [group])
+    return '{} hosts'.format(len(groups))
+
+def run_export_config(api, state, options):
+    config = api.export_config()
+    return '{} hosts, {} templates'.format(len(config.get('hosts', [])), len(config.get('templates', [])))
+
+def setup_import_config(api, server, options):
+    return { 'config': api.export_config() }
+
+def run_import_config(api, state, options):
+    api.import_config(state['config'])
+    return '{} hosts, {} templates'.format(len(state['config'].get('hosts', [])), len(state['config'].get('templates', [])))
+
+def setup_add_host(api, server, options):
+    return { 'groups': options['groups'] or max(1, options['hosts'] // 500) }
+
+# Benchmarks by name: setup function (not measured) and benchmark function returning a short description of the result
+BENCHMARKS = OrderedDict([
+    ('get_problems',    (None,                  run_get_problems)),
+    ('get_summary',     (None,                  run_get_summary)),
+    ('add_host',        (setup_add_host,        run_add_host)),
+    ('export_config',   (None,                  run_export_config)),
+    ('import_config',   (setup_import_config,   run_import_config)),
+])
+
+def run_benchmark(name, options):
+    ''' Run the benchmark with a new fake server, return a dictionary with the result and measurements. '''
+    server = FakeZabbixServer(
+        hosts=options['hosts'],
+        problems=options['problems'],
+        actions=options['actions'],
+        templates=options['templates'],
+        groups=options['groups'],
+        latency=options['latency'] / 1000.0,
+    )
+    metrics = APIMetrics()
+    api = ZabbixAPI(FAKE_ZABBIX_URL, 'Admin', 'zabbix', transport=LocalTransport(server), metrics=metrics)
+    setup, benchmark = BENCHMARKS[name]
+    state = setup(api, server, options) if setup is not None else None
+
+    gc.collect()
+    server.get_calls(reset=True)
+    metrics.reset()
+    peak_memory_before = get_peak_memory_mb()
+    start = time.time()
+    result = benchmark(api, state, options)
+    wall_time = time.time() - start
+    peak_memory = get_peak_memory_mb()
+    calls = server.get_calls()
+    api_metrics = metrics.get()
+
+    return {
+        'benchmark': name,
+        'result': result,
+        'wall_time': wall_time,
+        'api_calls': sum(calls.values()),
+        'calls': calls,
+        'request_bytes': sum( api_metrics[method]['request_bytes'] for method in api_metrics ),
+        'response_bytes': sum( api_metrics[method]['response_bytes'] for method in api_metrics ),
+        'methods': api_metrics,
+        'peak_memory_mb': peak_memory,
+        'peak_memory_grown_mb': peak_memory - peak_memory_before,
+    }
+
+def run_forked_benchmark(name, options):
+    # A new process for every benchmark: peak memory cannot be reset within a process
+    pool = multiprocessing.Pool(1)
+    try:
+        return pool.apply(run_benchmark, (name, options))
+    finally:
+        pool.terminate()
+        pool.join()
+
+def print_results(results, f):
+    f.write('{:<16} {:>10} {:>10} {:>10} {:>10} {:>10} {:>10}   {}\n'.format(
+        'benchmark', 'wall, s', 'API calls', 'sent, KB', 'recv, KB', 'peak, MB', 'grown, MB', 'result'))
+    for result in results:
+        f.write('{:<16} {:>10.3f} {:>10} {:>10.1f} {:>10.1f} {:>10.1f} {:>10.1f}   {}\n'.format(
+            result['benchmark'], result['wall_time'], result['api_calls'], result['request_bytes'] / 1024.0,
+            result['response_bytes'] / 1024.0, result['peak_memory_mb'], result['peak_memory_grown_mb'], result['result']))
+        for method in sorted(result['methods']):
+            method_metrics = result['methods'][method]
+            f.write('    {:<23} {:>10.3f} {:>10} {:>10.1f} {:>10.1f}\n'.format(method, method_metrics['latency_sum'],
+                method_metrics['calls'], method_metrics['request_bytes'] / 1024.0, method_metrics['response_bytes'] / 1024.0))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark ZabbixAPI against an in-process fake Zabbix server')
+    parser.add_argument('benchmarks', nargs='*', metavar='benchmark', help='benchmarks to run (all by default): ' + ', '.join(BENCHMARKS))
+    parser.add_argument('--hosts', type=int, default=50000, help='number of hosts')
+    parser.add_argument('--problems', type=int, default=200000, help='number of problems')
+    parser.add_argument('--actions', type=int, default=500, help='number of actions')
+    parser.add_argument('--templates', type=int, default=300, help='number of templates')
+    parser.add_argument('--groups', type=int, default=None, help='number of host groups (a group per 500 hosts by default)')
+    parser.add_argument('--new-hosts', type=int, default=100, help='number of hosts added by add_host benchmark')
+    parser.add_argument('--latency', type=float, default=5, help='latency of every API call in milliseconds')
+    parser.add_argument('--no-fork', action='store_true', help='run benchmarks in this process (peak memory is cumulative)')
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    parser.add_argument('-v', '--verbose', action='store_true', help='log API messages')
+    args = parser.parse_args(argv)
+
+    unknown_benchmarks = [ name for name in args.benchmarks if name not in BENCHMARKS ]
+    if len(unknown_benchmarks) != 0:
+        parser.error('unknown benchmarks: ' + ', '.join(unknown_benchmarks))
+
+    logging.basicConfig(format='%(message)s', level=logging.INFO if args.verbose else logging.WARNING, stream=sys.stderr)
+    options = vars(args)
+    results = []
+    for name in args.benchmarks or BENCHMARKS.keys():
+        if args.no_fork:
+            results.append( run_benchmark(name, options) )
+        else:
+            results.append( run_forked_benchmark(name, options) )
+
+    if args.json:
+        json.dump(results, sys.stdout, indent=2, sort_keys=True)
+        sys.stdout.write('\n')
+    else:
+        print_results(results, sys.stdout)
+    return results
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,10 @@
 #!/usr/bin/env python
 
-import argparse, getpass, json, sys, logging, unimonapi, traceback
+import argparse, atexit, getpass, json, sys, logging, unimonapi, traceback
+from unimonapi.zabbix.export_writers import JsonExportWriter
+from unimonapi.zabbix.export_writers import NdjsonExportWriter
+from unimonapi.zabbix.manifest import ImportManifest
+from unimonapi.zabbix.metrics import APIMetrics
 
 LOG_LEVEL = logging.INFO
 LOG_FORMAT = '%(message)s'
@@ -14,16 +18,26 @@ login_parser = argparse.ArgumentParser(add_help=False)
 login_parser.add_argument('-u', '--url', default=DEFAULT_ZABBIX_URL, help='Zabbix URL')
 login_parser.add_argument('-l', '--login', required=True, help='Zabbix user login')
 login_parser.add_argument('-p', '--password', help='Zabbix user password')
+login_parser.add_argument('--metrics', help='write metrics of Zabbix API calls to file on exit (Prometheus text format)')
 
 import_parser = subparsers.add_parser('import', description='import Zabbix configuration via API', parents=[login_parser])
 import_parser.add_argument('-f', '--file', required=True, help='import from file')
 import_parser.add_argument('-s', '--skip', action='store_true', help='skip (do not import) configurations that already exist (update by default)')
 import_parser.add_argument('-d', '--delete', action='store_true', help='delete existing configurations that are not in the import file')
+import_parser.add_argument('--diff', action='store_true', help='import only configurations that differ from the existing ones')
+import_parser.add_argument('-m', '--manifest', help='state file to skip configurations not changed since the last import to this server')
+import_parser.add_argument('-c', '--chunk-size', type=int, default=unimonapi.zabbix.batch.IMPORT_CHUNK_SIZE, help='maximum number of macros, discovery rules or actions imported by one API call')
+import_parser.add_argument('--dry-run', action='store_true', help='only show configurations to be created, updated and deleted')
+import_parser.add_argument('--force', action='store_true', help='import all configurations ignoring the manifest')
 
 export_parser = subparsers.add_parser('export', description='export Zabbix configuration via API', parents=[login_parser])
 export_parser.add_argument('-f', '--file', help='export to file (defaults to stdout)')
 export_parser.add_argument('-j', '--json', action='store_true', help='pretty-printed JSON object')
+export_parser.add_argument('-n', '--ndjson', action='store_true', help='newline-delimited JSON: one object per line')
 export_parser.add_argument('-t', '--temp', action='store_true', help='export auto-created/discovered/temporary configurations')
+export_parser.add_argument('-w', '--workers', type=int, default=unimonapi.zabbix.import_export.EXPORT_WORKERS, help='maximum number of concurrent API calls')
+export_parser.add_argument('-c', '--chunk-size', type=int, default=unimonapi.zabbix.import_export.EXPORT_CHUNK_SIZE, help='maximum number of objects exported by one API call')
+export_parser.add_argument('--concurrent-chunks', action='store_true', help='export chunks of objects concurrently')
 
 args = super_parser.parse_args()
 logging.basicConfig(format=LOG_FORMAT, level=LOG_LEVEL, stream=sys.stderr)
@@ -36,23 +50,58 @@ except BaseException:
     sys.stderr.write('Exit\n')
     sys.exit(0)
 
-zabbix_api = unimonapi.ZabbixAPI(args.url, args.login, args.password)
+metrics = None
+if args.metrics:
+    metrics = APIMetrics()
 
-if args.action == 'export':
-    export_result = zabbix_api.export_config(args.temp)
-    json_indent = JSON_INDENT if args.json else None
+    # Write metrics even if the command fails
+    def write_metrics():
+        with open(args.metrics, 'w') as f:
+            f.write(metrics.format_prometheus())
+    atexit.register(write_metrics)
+
+zabbix_api = unimonapi.ZabbixAPI(args.url, args.login, args.password, metrics=metrics)
+
+def export_config(f):
+    if args.ndjson:
+        writer = NdjsonExportWriter(f)
+    else:
+        writer = JsonExportWriter(f, JSON_INDENT if args.json else None)
+
+    # Write every exported section as soon as it is ready
+    for section, objects in zabbix_api.iter_config(args.temp, args.workers, args.chunk_size, args.concurrent_chunks):
+        writer.write(section, objects)
 
+    writer.close()
+
+if args.action == 'export':
     if args.file:
         with open(args.file, 'w') as f:
-            json.dump(export_result, f, indent=json_indent)
+            export_config(f)
     else:
-        json.dump(export_result, sys.stdout, indent=json_indent)
-        sys.stdout.write('\n')
+        export_config(sys.stdout)
 
     logging.info('Configurations exported successfully')
 else:
     with open(args.file, 'r') as f:
         config_to_import = json.load(f)
 
-    zabbix_api.import_config(config_to_import, not args.skip, args.delete)
+    if args.dry_run:
+        plans = zabbix_api.plan_import_config(config_to_import, args.delete)
+        for section in sorted(plans):
+            plan = plans[section]
+            logging.info('{}: create {}, update {}, delete {}'.format(section, len(plan.creates), len(plan.updates), len(plan.deletes)))
+            for name in plan.creates:
+                logging.info(u'  + {}'.format(name).encode('utf-8'))
+            for name in sorted(plan.deletes.values()):
+                logging.info(u'  - {}'.format(name).encode('utf-8'))
+        sys.exit(0)
+
+    manifest = None
+    if args.manifest:
+        manifest = ImportManifest(args.manifest, args.url)
+        if args.force:
+            manifest.clear()
+
+    zabbix_api.import_config(config_to_import, not args.skip, args.delete, args.diff, manifest, args.chunk_size)
     logging.info('Configurations imported successfully')
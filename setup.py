@@ -20,7 +20,7 @@ setup(
     author_email='max.grechnev@gmail.com',
     license='MIT',
     url='https://github.com/maxgrechnev/unimonapi',
-    packages=find_packages(exclude=['tests*']),
+    packages=find_packages(exclude=['tests*', 'benchmarks*']),
     install_requires=requirements(),
     scripts=['bin/zabbix_cli.py'],
     classifiers=[
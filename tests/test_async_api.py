@@ -0,0 +1,59 @@
+import pytest
+import threading, time
+from unimonapi import ZabbixAPI
+from unimonapi import AsyncZabbixAPI
+from unimonapi.zabbix.transport import LocalTransport
+
+class FakeZabbix:
+    ''' In-process Zabbix server stand-in: every hostgroup.get call takes 0.1 seconds '''
+
+    def __init__(self):
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def __call__(self, method, params):
+        with self.lock:
+            self.calls.append(method)
+        if method == 'user.login':
+            return 'auth_token'
+        if method == 'hostgroup.get':
+            time.sleep(0.1)
+            if params.get('templated_hosts'):
+                return [{'groupid': '2'}]
+            return [{'groupid': '1', 'name': 'Linux servers'}, {'groupid': '2', 'name': 'Templates'}]
+        raise Exception('Unsupported method ' + method)
+
+@pytest.fixture
+def async_api():
+    fake_zabbix = FakeZabbix()
+    zabbix_api = ZabbixAPI('http://zabbix-frontend', 'Admin', 'zabbix', transport=LocalTransport(fake_zabbix))
+    async_api = AsyncZabbixAPI(zabbix_api, workers=2)
+    yield async_api
+    async_api.close()
+
+def test_async_get_available_host_groups(async_api):
+    start = time.time()
+    result = async_api.get_available_host_groups()
+
+    assert result.get(timeout=5) == ['Linux servers']
+    # Both hostgroup.get calls are run at once
+    assert time.time() - start < 0.19
+
+def test_async_callback(async_api):
+    results = []
+    event = threading.Event()
+
+    def callback(result):
+        results.append(result)
+        event.set()
+
+    async_api.get_available_host_groups(callback=callback)
+
+    assert event.wait(5)
+    assert results == [['Linux servers']]
+
+def test_async_error(async_api):
+    result = async_api.add_host('10.0.0.1', ['Unknown group'])
+
+    with pytest.raises(Exception, match=r'Unsupported method'):
+        result.get(timeout=5)
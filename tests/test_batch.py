@@ -0,0 +1,38 @@
+import pytest
+from mock import MagicMock
+from pyzabbix import ZabbixAPIException
+from unimonapi.zabbix.batch import chunks
+from unimonapi.zabbix.batch import call_in_chunks
+
+@pytest.mark.parametrize('chunk_size, expected_chunks', [
+    (2,     [[1, 2], [3, 4], [5]]),
+    (10,    [[1, 2, 3, 4, 5]]),
+    (0,     [[1, 2, 3, 4, 5]]),
+    (None,  [[1, 2, 3, 4, 5]]),
+])
+def test_chunks(chunk_size, expected_chunks):
+    assert list(chunks([1, 2, 3, 4, 5], chunk_size)) == expected_chunks
+    assert list(chunks([], chunk_size)) == []
+
+def test_call_in_chunks():
+    api_method = MagicMock()
+    succeeded = []
+
+    call_in_chunks(api_method, [{'id': 1}, {'id': 2}, {'id': 3}], 2, succeeded.extend)
+
+    assert [ call[0] for call in api_method.call_args_list ] == [({'id': 1}, {'id': 2}), ({'id': 3},)]
+    assert succeeded == [{'id': 1}, {'id': 2}, {'id': 3}]
+
+def test_call_in_chunks_fallback():
+    def api_method(*objects):
+        if {'id': 2} in objects:
+            raise ZabbixAPIException('Invalid object', -32602)
+    api_method = MagicMock(side_effect=api_method)
+    succeeded = []
+
+    with pytest.raises(ZabbixAPIException):
+        call_in_chunks(api_method, [{'id': 1}, {'id': 2}, {'id': 3}], 3, succeeded.extend)
+
+    # The failed chunk is retried object by object up to the offending one
+    assert [ call[0] for call in api_method.call_args_list ] == [({'id': 1}, {'id': 2}, {'id': 3}), ({'id': 1},), ({'id': 2},)]
+    assert succeeded == [{'id': 1}]
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+
+from benchmarks.fake_zabbix import FakeZabbixServer
+from benchmarks.run_benchmarks import BENCHMARKS
+from benchmarks.run_benchmarks import run_benchmark
+from unimonapi import ZabbixAPI
+from unimonapi import UnimonError
+from unimonapi.zabbix.transport import LocalTransport
+import pytest
+
+SMALL_SCALE = {
+    'hosts': 50,
+    'problems': 200,
+    'actions': 5,
+    'templates': 3,
+    'groups': 2,
+    'new_hosts': 3,
+    'latency': 0,
+}
+
+@pytest.fixture
+def fake_api():
+    server = FakeZabbixServer(hosts=50, problems=200, actions=5, templates=3, groups=2)
+    return server, ZabbixAPI('http://fake-zabbix', 'Admin', 'zabbix', transport=LocalTransport(server))
+
+@pytest.mark.parametrize('name', BENCHMARKS.keys())
+def test_run_benchmark(name):
+    result = run_benchmark(name, SMALL_SCALE)
+    assert result['benchmark'] == name
+    assert result['wall_time'] >= 0
+    assert result['api_calls'] == sum(result['calls'].values())
+    assert result['api_calls'] > 0
+    assert result['peak_memory_mb'] > 0
+
+def test_fake_server_problems(fake_api):
+    server, api = fake_api
+    events = api.get_problems()
+    assert len(events) == 200
+    assert [ event.id for event in events[:3] ] == ['200', '199', '198']
+
+    server.get_calls(reset=True)
+    assert len(list(api.iter_problems(page_size=60))) == 200
+    assert server.get_calls()['problem.get'] == 4
+
+def test_fake_server_hosts(fake_api):
+    server, api = fake_api
+    host_id = api.add_host('new-host', ['Group 1'])
+    assert api.get_host_id('new-host') == host_id
+    with pytest.raises(UnimonError):
+        api.add_host('new-host-2', ['Group 5'])
+
+    results = api.add_hosts([ ('new-host', ['Group 0']), ('new-host-3', ['Group 0']) ])
+    assert isinstance(results[0], UnimonError)
+    assert api.get_host_id('new-host-3') == results[1]
+
+def test_fake_server_export_import(fake_api):
+    server, api = fake_api
+    config = api.export_config()
+    assert len(config['hosts']) == 50
+    assert len(config['templates']) == 3
+    assert len(config['actions']) == 5
+
+    config['hosts'].append(dict(config['hosts'][0], host='imported-host', name='imported-host'))
+    api.import_config(config)
+    assert api.get_host_id('imported-host') is not None
+    assert len(api.export_config()['hosts']) == 51
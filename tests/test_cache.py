@@ -0,0 +1,54 @@
+import pytest
+from mock import patch
+from unimonapi.zabbix.cache import LRUCache
+
+def test_cache_get_put():
+    cache = LRUCache(max_size=2)
+    cache.put('a', 1)
+
+    assert cache.get('a') == 1
+    assert cache.get('b') is LRUCache.MISSING
+    assert cache.stats() == {'hits': 1, 'misses': 1, 'size': 1}
+
+def test_cache_lru_eviction():
+    cache = LRUCache(max_size=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    cache.get('a')
+    cache.put('c', 3)
+
+    assert len(cache) == 2
+    assert cache.get('a') == 1
+    assert cache.get('b') is LRUCache.MISSING
+    assert cache.get('c') == 3
+
+def test_cache_disabled():
+    cache = LRUCache(max_size=0)
+    cache.put('a', 1)
+    assert cache.get('a') is LRUCache.MISSING
+
+@patch('unimonapi.zabbix.cache.time.time')
+def test_cache_ttl(time_mock):
+    cache = LRUCache(ttl=10, negative_ttl=1)
+    time_mock.return_value = 100
+    cache.put('found', 'id')
+    cache.put('not found', None)
+
+    time_mock.return_value = 105
+    assert cache.get('found') == 'id'
+    assert cache.get('not found') is LRUCache.MISSING
+
+    time_mock.return_value = 111
+    assert cache.get('found') is LRUCache.MISSING
+
+def test_cache_invalidate():
+    cache = LRUCache()
+    cache.put(('host', 'a'), 1)
+    cache.put(('group', 'b'), 2)
+
+    cache.invalidate(lambda key: key[0] == 'host')
+    assert cache.get(('host', 'a')) is LRUCache.MISSING
+    assert cache.get(('group', 'b')) == 2
+
+    cache.invalidate()
+    assert len(cache) == 0
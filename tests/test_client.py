@@ -0,0 +1,53 @@
+import pytest
+from mock import MagicMock
+from pyzabbix import ZabbixAPIException
+from unimonapi.zabbix.client import ZabbixClient
+
+@pytest.fixture
+def client():
+    zabbix_api = MagicMock()
+    zabbix_api.auth = 'token_1'
+    def login(user, password):
+        zabbix_api.auth = 'token_2'
+    zabbix_api.login.side_effect = login
+    return ZabbixClient(zabbix_api, 'Admin', 'zabbix')
+
+def test_client_call(client):
+    client._zabbix_api.host.get.return_value = ['host']
+
+    assert client.host.get(output=['hostid']) == ['host']
+    client._zabbix_api.host.get.assert_called_once_with(output=['hostid'])
+    client._zabbix_api.login.assert_not_called()
+
+def test_client_relogin(client):
+    client._zabbix_api.host.get.side_effect = (
+        ZabbixAPIException('Error -32602: Invalid params., Session terminated, re-login, please.'),
+        ['host'],
+    )
+
+    assert client.host.get() == ['host']
+    client._zabbix_api.login.assert_called_once_with('Admin', 'zabbix')
+    assert client._zabbix_api.auth == 'token_2'
+
+def test_client_relogin_already_done(client):
+    def get():
+        if client._zabbix_api.auth == 'token_1':
+            # Another thread renews the session while this call is in progress
+            client._zabbix_api.auth = 'token_3'
+            raise ZabbixAPIException('Error -32602: Invalid params., Not authorised.')
+        return ['host']
+    client._zabbix_api.host.get.side_effect = get
+
+    assert client.host.get() == ['host']
+    client._zabbix_api.login.assert_not_called()
+
+def test_client_error(client):
+    client._zabbix_api.host.get.side_effect = ZabbixAPIException('Error -32602: Invalid params., No permissions.')
+
+    with pytest.raises(ZabbixAPIException, match=r'No permissions'):
+        client.host.get()
+    client._zabbix_api.login.assert_not_called()
+
+def test_client_confimport(client):
+    client.confimport('json', '{}', {'hosts': {}})
+    client._zabbix_api.confimport.assert_called_once_with(confformat='json', source='{}', rules={'hosts': {}})
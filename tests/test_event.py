@@ -1,4 +1,5 @@
 import pytest
+import pickle
 from unimonapi import Event
 from unimonapi import UnimonError
 
@@ -33,3 +34,21 @@ def test_event_unicode(critical_event):
 def test_event_str(critical_event):
     event_unicode = str(critical_event)
     assert event_unicode == '\xe2\x9b\x94 host: text'
+
+def test_event_trusted():
+    event = Event.trusted(Event.PROBLEM, True, Event.WARNING, 'host', 'text', 'id', 'source')
+    assert isinstance(event, Event)
+    assert (event.type, event.detailed, event.severity, event.host, event.text, event.id, event.source) == \
+        (Event.PROBLEM, True, Event.WARNING, 'host', 'text', 'id', 'source')
+
+def test_event_slots(critical_event):
+    assert critical_event.source is None
+    with pytest.raises(AttributeError):
+        critical_event.unknown = 'value'
+
+@pytest.mark.parametrize('protocol', range(pickle.HIGHEST_PROTOCOL + 1))
+def test_event_pickle(critical_event, protocol):
+    event = pickle.loads(pickle.dumps(critical_event, protocol))
+    assert type(event) == Event
+    assert (event.type, event.detailed, event.severity, event.host, event.text, event.id, event.source) == \
+        (Event.PROBLEM, True, Event.CRITICAL, 'host', 'text', 'id', None)
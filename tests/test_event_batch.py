@@ -0,0 +1,40 @@
+import pytest
+from unimonapi import Event
+from unimonapi import EventBatch
+
+@pytest.fixture
+def event_batch():
+    event_batch = EventBatch()
+    event_batch.append(Event.PROBLEM, True, Event.CRITICAL, u'host', u'text 1', '1')
+    event_batch.append(Event.PROBLEM, False, Event.WARNING, u'host', u'text 2', '2', 'east')
+    return event_batch
+
+def test_event_batch_getitem(event_batch):
+    assert len(event_batch) == 2
+    event = event_batch[-1]
+    assert isinstance(event, Event)
+    assert (event.type, event.detailed, event.severity, event.host, event.text, event.id, event.source) == \
+        (Event.PROBLEM, False, Event.WARNING, u'host', u'text 2', '2', 'east')
+    assert [ event.id for event in event_batch[:1] ] == ['1']
+    with pytest.raises(IndexError):
+        event_batch[2]
+
+def test_event_batch_iter(event_batch):
+    assert [ unicode(event) for event in event_batch ] == [u'\u26d4 host: text 1', u'\u26a0 host: text 2']
+
+def test_event_batch_interned_hosts():
+    event_batch = EventBatch([
+        Event(Event.PROBLEM, True, Event.INFO, ''.join(['ho', 'st']), 'text', str(i)) for i in range(3)
+    ])
+    assert len(set( id(host) for host in event_batch.hosts )) == 1
+
+def test_event_batch_count_by_severity(event_batch):
+    assert event_batch.count_by_severity() == {Event.INFO: 0, Event.WARNING: 1, Event.CRITICAL: 1}
+
+def test_event_batch_extend(event_batch):
+    event_batch.extend(Event.RESOLUTION, True, [(Event.INFO, u'host', u'text 3', '3'), (Event.INFO, u'other', u'text 4', '4')])
+
+    assert len(event_batch) == 4
+    assert [ event.type for event in event_batch ] == [Event.PROBLEM, Event.PROBLEM, Event.RESOLUTION, Event.RESOLUTION]
+    assert event_batch[3].host == u'other'
+    assert event_batch[3].detailed is True
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+
+import pytest
+import json
+from StringIO import StringIO
+from unimonapi.zabbix.export_writers import JsonExportWriter
+from unimonapi.zabbix.export_writers import NdjsonExportWriter
+from unimonapi.zabbix.transport import LocalTransport
+from unimonapi import ZabbixAPI
+from benchmarks.fake_zabbix import FakeZabbixServer
+
+SECTIONS = [
+    ('templates', [{'template': 'Template 1', 'items': [{'key': 'a'}]}]),
+    ('groups', [{'name': u'Group ✅'}]),
+    ('version', '4.0'),
+    ('templates', [{'template': 'Template 2'}, {'template': 'Template 3'}]),
+    ('macros', []),
+]
+
+@pytest.mark.parametrize('indent', [None, 2])
+def test_json_export_writer(indent):
+    output = StringIO()
+    writer = JsonExportWriter(output, indent)
+
+    for section, objects in SECTIONS:
+        writer.write(section, objects)
+    writer.close()
+
+    assert json.loads(output.getvalue()) == {
+        'templates': [{'template': 'Template 1', 'items': [{'key': 'a'}]}, {'template': 'Template 2'}, {'template': 'Template 3'}],
+        'groups': [{'name': u'Group ✅'}],
+        'version': '4.0',
+        'macros': [],
+    }
+    assert output.getvalue().endswith('}\n')
+
+def test_json_export_writer_indent():
+    output = StringIO()
+    writer = JsonExportWriter(output, 2)
+
+    writer.write('groups', [{'name': 'Group'}])
+    writer.close()
+
+    assert output.getvalue() == '{\n  "groups": [\n    {\n      "name": "Group"\n    }\n  ]\n}\n'
+
+@pytest.mark.parametrize('indent', [None, 2])
+def test_json_export_writer_empty_write(indent):
+    output = StringIO()
+    writer = JsonExportWriter(output, indent)
+
+    writer.write('hosts', [])
+    writer.write('hosts', [{'host': 'Host 1'}])
+    writer.write('hosts', [])
+    writer.write('hosts', [{'host': 'Host 2'}])
+    writer.close()
+
+    assert json.loads(output.getvalue()) == {'hosts': [{'host': 'Host 1'}, {'host': 'Host 2'}]}
+
+def test_json_export_writer_chunked_export():
+    server = FakeZabbixServer(hosts=120, problems=10, actions=3, templates=5, groups=3)
+    zabbix_api = ZabbixAPI('http://zabbix-frontend', 'Admin', 'zabbix', transport=LocalTransport(server))
+    output = StringIO()
+    writer = JsonExportWriter(output)
+
+    for section, objects in zabbix_api.iter_config(chunk_size=50):
+        writer.write(section, objects)
+    writer.close()
+
+    assert json.loads(output.getvalue()) == zabbix_api.export_config(chunk_size=50)
+
+def test_ndjson_export_writer():
+    output = StringIO()
+    writer = NdjsonExportWriter(output)
+
+    for section, objects in SECTIONS:
+        writer.write(section, objects)
+    writer.close()
+
+    lines = [ json.loads(line) for line in output.getvalue().splitlines() ]
+    assert lines == [
+        {'section': 'templates', 'object': {'template': 'Template 1', 'items': [{'key': 'a'}]}},
+        {'section': 'groups', 'object': {'name': u'Group ✅'}},
+        {'section': 'version', 'object': '4.0'},
+        {'section': 'templates', 'object': {'template': 'Template 2'}},
+        {'section': 'templates', 'object': {'template': 'Template 3'}},
+    ]
@@ -0,0 +1,148 @@
+import pytest
+import time
+from mock import MagicMock
+from unimonapi import FederatedMonitoringAPI
+from unimonapi import MonitoringAPI
+from unimonapi import Event
+from unimonapi import HostGroup
+from unimonapi import UnimonError
+
+def make_backend(problems=[], groups=[], delay=0):
+    backend = MagicMock(spec=MonitoringAPI)
+    def get_problems(severities=None, groups=None):
+        time.sleep(delay)
+        return list(problems)
+    backend.get_problems.side_effect = get_problems
+    backend.get_summary.return_value = groups
+    backend.get_available_host_groups.return_value = [ group.name for group in groups ]
+    return backend
+
+def make_group(name, id, *severities):
+    host_group = HostGroup(name, id)
+    for severity in severities:
+        host_group.count_problem(severity)
+    return host_group
+
+@pytest.fixture
+def federated_api():
+    federated_api = FederatedMonitoringAPI({
+        'east': make_backend(
+            problems=[Event(Event.PROBLEM, True, Event.WARNING, 'host1', 'text', '1')],
+            groups=[make_group('Linux servers', '2', Event.WARNING)],
+        ),
+        'west': make_backend(
+            problems=[Event(Event.PROBLEM, True, Event.CRITICAL, 'host2', 'text', '1')],
+            groups=[make_group('Linux servers', '5', Event.CRITICAL), make_group('Windows servers', '6', Event.INFO)],
+        ),
+    })
+    yield federated_api
+    federated_api.close()
+
+def test_federated_get_problems(federated_api):
+    problems = federated_api.get_problems()
+
+    assert [ (event.source, event.host) for event in problems ] == [('west', 'host2'), ('east', 'host1')]
+    assert problems.is_complete()
+
+def test_federated_get_summary(federated_api):
+    summary = federated_api.get_summary([Event.INFO])
+
+    assert [ host_group.name for host_group in summary ] == ['Linux servers', 'Windows servers']
+    assert summary[0].id == {'east': '2', 'west': '5'}
+    assert summary[0].severity == Event.CRITICAL
+    assert summary[0].problems == 2
+    assert summary[0].problems_by_severity[Event.WARNING] == 1
+    assert summary[0].problems_by_severity[Event.CRITICAL] == 1
+
+def test_federated_get_available_host_groups(federated_api):
+    assert federated_api.get_available_host_groups() == ['Linux servers', 'Windows servers']
+
+def test_federated_partial_result():
+    failed_backend = make_backend()
+    failed_backend.get_problems.side_effect = UnimonError('Connection refused')
+    federated_api = FederatedMonitoringAPI({
+        'fast': make_backend(problems=[Event(Event.PROBLEM, True, Event.WARNING, 'host1', 'text', '1')]),
+        'slow': make_backend(delay=1),
+        'failed': failed_backend,
+    }, timeout={'fast': 1, 'slow': 0.1, 'failed': 1})
+
+    start = time.time()
+    problems = federated_api.get_problems()
+    federated_api.close()
+
+    assert time.time() - start < 0.5
+    assert [ event.host for event in problems ] == ['host1']
+    assert not problems.is_complete()
+    assert sorted(problems.errors) == ['failed', 'slow']
+    assert unicode(problems.errors['failed']) == u'Connection refused'
+
+def test_federated_default_timeout():
+    federated_api = FederatedMonitoringAPI({
+        'fast': make_backend(problems=[Event(Event.PROBLEM, True, Event.WARNING, 'host1', 'text', '1')]),
+        'slow': make_backend(delay=1),
+    }, timeout={'fast': 1}, default_timeout=0.1)
+
+    start = time.time()
+    problems = federated_api.get_problems()
+    federated_api.close()
+
+    assert time.time() - start < 0.5
+    assert [ event.host for event in problems ] == ['host1']
+    assert sorted(problems.errors) == ['slow']
+
+def test_federated_busy_backend():
+    slow_backend = make_backend(delay=0.5)
+    federated_api = FederatedMonitoringAPI({
+        'fast': make_backend(problems=[Event(Event.PROBLEM, True, Event.WARNING, 'host1', 'text', '1')]),
+        'slow': slow_backend,
+    }, timeout=0.1)
+
+    problems = federated_api.get_problems()
+    assert sorted(problems.errors) == ['slow']
+
+    # The timed out call is still running: the backend is not called again
+    problems = federated_api.get_problems()
+    assert [ event.host for event in problems ] == ['host1']
+    assert sorted(problems.errors) == ['slow']
+    assert unicode(problems.errors['slow']) == u'Monitoring system "slow" is busy with a previous call'
+    assert slow_backend.get_problems.call_count == 1
+
+    time.sleep(0.5)
+    federated_api.get_problems()
+    federated_api.close()
+    assert slow_backend.get_problems.call_count == 2
+
+def test_federated_late_problem_updates():
+    updates = [
+        (0.3, [Event(Event.PROBLEM, True, Event.WARNING, 'host1', 'P1', '1')], []),
+        (0, [], [Event(Event.RESOLUTION, True, Event.WARNING, 'host1', 'P1', '1')]),
+    ]
+    def get_problem_updates(severities=None, groups=None):
+        delay, problems, resolutions = updates.pop(0)
+        time.sleep(delay)
+        return problems, resolutions
+    slow_backend = make_backend()
+    slow_backend.get_problem_updates.side_effect = get_problem_updates
+    fast_backend = make_backend()
+    fast_backend.get_problem_updates.return_value = ([], [])
+    federated_api = FederatedMonitoringAPI({'fast': fast_backend, 'slow': slow_backend}, timeout=0.1)
+
+    problems, resolutions = federated_api.get_problem_updates()
+    assert problems == []
+    assert sorted(problems.errors) == ['slow']
+
+    # Updates of the timed out call are returned by the next call
+    time.sleep(0.3)
+    problems, resolutions = federated_api.get_problem_updates()
+    federated_api.close()
+    assert [ (event.source, event.text) for event in problems ] == [('slow', 'P1')]
+    assert [ (event.source, event.text) for event in resolutions ] == [('slow', 'P1')]
+    assert problems.is_complete()
+
+def test_host_group_merge():
+    host_group = make_group('name', 'id', Event.INFO)
+    host_group.merge(make_group('name', 'id', Event.WARNING, Event.WARNING))
+
+    assert host_group.severity == Event.WARNING
+    assert host_group.problems == 3
+    assert host_group.problems_by_severity == {Event.INFO: 1, Event.WARNING: 2, Event.CRITICAL: 0}
@@ -1,4 +1,5 @@
 import pytest
+import pickle
 from unimonapi import HostGroup
 from unimonapi import Event
 from unimonapi import UnimonError
@@ -41,3 +42,30 @@ def test_host_group_count_problem(host_group):
 def test_host_group_count_problem_unsupported(host_group):
     with pytest.raises(UnimonError, match=r'Unsupported problem severity "unsupported"'):
         host_group.count_problem('unsupported')
+
+def test_host_group_uncount_problem(host_group):
+    host_group.count_problem(Event.WARNING)
+    host_group.count_problem(Event.CRITICAL)
+
+    host_group.uncount_problem(Event.CRITICAL)
+    assert host_group.severity == Event.WARNING
+    assert host_group.problems == 1
+    assert host_group.problems_by_severity[Event.CRITICAL] == 0
+
+    host_group.uncount_problem(Event.WARNING)
+    assert host_group.severity == Event.NO_SEVERITY
+    assert host_group.problems == 0
+
+    with pytest.raises(UnimonError, match=r'No problems with severity "1" to uncount'):
+        host_group.uncount_problem(Event.WARNING)
+
+@pytest.mark.parametrize('protocol', range(pickle.HIGHEST_PROTOCOL + 1))
+def test_host_group_pickle(host_group, protocol):
+    host_group.count_problem(Event.WARNING)
+    unpickled_group = pickle.loads(pickle.dumps(host_group, protocol))
+    assert type(unpickled_group) == HostGroup
+    assert unpickled_group.name == 'name'
+    assert unpickled_group.id == 'id'
+    assert unpickled_group.severity == Event.WARNING
+    assert unpickled_group.problems == 1
+    assert unpickled_group.problems_by_severity == host_group.problems_by_severity
@@ -0,0 +1,267 @@
+import pytest
+import json, time
+from mock import MagicMock
+from unimonapi.zabbix.import_export import export_configs
+from unimonapi.zabbix.import_export import iter_export_configs
+from unimonapi.zabbix.import_export import import_configs
+from unimonapi.zabbix.import_export import plan_import_configs
+from unimonapi.zabbix.manifest import ImportManifest
+
+@pytest.fixture
+def zabbix_api():
+    zabbix_api = MagicMock()
+    zabbix_api.template.get.return_value = {'1': {'templateid': '1'}}
+    zabbix_api.host.get.return_value = {'2': {'hostid': '2'}}
+    zabbix_api.valuemap.get.return_value = {'3': {'valuemapid': '3'}}
+    zabbix_api.hostgroup.get.return_value = {'4': {'groupid': '4'}}
+    zabbix_api.usermacro.get.return_value = [{'globalmacroid': '5', 'macro': '{$MACRO}', 'value': 'value'}]
+    zabbix_api.drule.get.return_value = [{'druleid': '6', 'name': 'Rule', 'nextcheck': '0', 'dchecks': []}]
+    zabbix_api.action.get.return_value = []
+    zabbix_api.configuration.export.return_value = json.dumps({
+        'zabbix_export': {
+            'version': '4.0',
+            'date': '2019-01-01T00:00:00Z',
+            'groups': [{'name': 'Group'}],
+            'templates': [{'template': 'Template'}],
+            'hosts': [{'host': 'Host'}],
+        }
+    })
+    return zabbix_api
+
+@pytest.mark.parametrize('workers', [1, 4])
+def test_export_configs(zabbix_api, workers):
+    export_result = export_configs(zabbix_api, workers=workers)
+
+    zabbix_api.configuration.export.assert_called_once_with(
+        format='json',
+        options={
+            'templates': ['1'],
+            'hosts': ['2'],
+            'valueMaps': ['3'],
+            'groups': ['4'],
+        }
+    )
+    assert export_result == {
+        'version': '4.0',
+        'groups': [{'name': 'Group'}],
+        'templates': [{'template': 'Template'}],
+        'hosts': [{'host': 'Host'}],
+        'macros': [{'macro': '{$MACRO}', 'value': 'value'}],
+        'discovery_rules': [{'name': 'Rule', 'dchecks': []}],
+        'actions': [],
+    }
+
+def test_export_configs_concurrently(zabbix_api):
+    def slow(method):
+        return_value = method.return_value
+        def call(*args, **kwargs):
+            time.sleep(0.1)
+            return return_value
+        method.side_effect = call
+
+    for method in [zabbix_api.template.get, zabbix_api.host.get, zabbix_api.valuemap.get, zabbix_api.hostgroup.get,
+            zabbix_api.usermacro.get, zabbix_api.drule.get, zabbix_api.action.get]:
+        slow(method)
+
+    start = time.time()
+    export_configs(zabbix_api, workers=8)
+
+    # Sequential export would take at least 0.7 seconds
+    assert time.time() - start < 0.4
+
+@pytest.mark.parametrize('concurrent_chunks', [False, True])
+def test_export_configs_chunked(zabbix_api, concurrent_chunks):
+    zabbix_api.host.get.return_value = {'2': {'hostid': '2'}, '7': {'hostid': '7'}}
+    zabbix_api.configuration.export.side_effect = lambda format, options: json.dumps({
+        'zabbix_export': {
+            'version': '4.0',
+            'groups': [{'name': 'Group'}],
+            'value_maps': [{'name': 'Value map'}] if options['valueMaps'] else [],
+            'hosts': [ {'host': 'Host ' + id} for id in options['hosts'] ],
+            'triggers': [{'name': 'Trigger', 'expression': '{Host 2:a.last()}={Host 7:a.last()}'}] if options['hosts'] else [],
+        }
+    })
+
+    export_result = export_configs(zabbix_api, chunk_size=2, concurrent_chunks=concurrent_chunks)
+
+    assert zabbix_api.configuration.export.call_count == 3
+    for args, kwargs in zabbix_api.configuration.export.call_args_list:
+        assert sum( len(ids) for ids in kwargs['options'].values() ) <= 2
+    assert export_result['version'] == '4.0'
+    assert export_result['groups'] == [{'name': 'Group'}]
+    assert export_result['value_maps'] == [{'name': 'Value map'}]
+    assert sorted( host['host'] for host in export_result['hosts'] ) == ['Host 2', 'Host 7']
+    assert len(export_result['triggers']) == 1
+
+def test_iter_export_configs(zabbix_api):
+    zabbix_api.host.get.return_value = {'2': {'hostid': '2'}, '7': {'hostid': '7'}}
+    zabbix_api.configuration.export.side_effect = lambda format, options: json.dumps({
+        'zabbix_export': {
+            'version': '4.0',
+            'groups': [{'name': 'Group'}],
+            'hosts': [ {'host': 'Host ' + id} for id in options['hosts'] ],
+        }
+    })
+
+    sections = list(iter_export_configs(zabbix_api, chunk_size=1))
+
+    hosts = [ objects for section, objects in sections if section == 'hosts' and objects ]
+    assert len(hosts) == 2
+    assert sorted( host['host'] for objects in hosts for host in objects ) == ['Host 2', 'Host 7']
+    assert [ objects for section, objects in sections if section == 'version' ] == ['4.0']
+    assert sum( len(objects) for section, objects in sections if section == 'groups' ) == 1
+    assert sections[-3:] == [
+        ('macros', [{'macro': '{$MACRO}', 'value': 'value'}]),
+        ('discovery_rules', [{'name': 'Rule', 'dchecks': []}]),
+        ('actions', []),
+    ]
+
+def test_import_configs_diff(zabbix_api):
+    zabbix_api.template.get.return_value = [{'templateid': '1', 'host': 'Template'}]
+    zabbix_api.host.get.return_value = [{'hostid': '2', 'host': 'Host'}]
+    zabbix_api.valuemap.get.return_value = []
+    zabbix_api.configuration.export.return_value = json.dumps({
+        'zabbix_export': {
+            'version': '4.0',
+            'groups': [{'name': 'Group'}],
+            'templates': [{'template': 'Template', 'name': 'Template'}],
+            'hosts': [{'host': 'Host', 'name': 'Host'}],
+            'triggers': [
+                {'name': 'Template trigger', 'expression': '{Template:a.last()}=1'},
+                {'name': 'Host trigger', 'expression': '{Host:a.last()}=1'},
+            ],
+        }
+    })
+    config = {
+        'version': '4.0',
+        'groups': [{'name': 'Group'}, {'name': 'New group'}],
+        'templates': [{'template': 'Template', 'name': 'Template'}],
+        'hosts': [{'host': 'Host', 'name': 'Renamed host'}],
+        'triggers': [
+            {'name': 'Template trigger', 'expression': '{Template:a.last()}=1'},
+            {'name': 'Host trigger', 'expression': '{Host:a.last()}=1'},
+        ],
+    }
+
+    skipped = import_configs(zabbix_api, config, diff=True)
+
+    zabbix_api.configuration.export.assert_called_once_with(
+        format='json',
+        options={'templates': ['1'], 'hosts': ['2'], 'valueMaps': [], 'groups': []},
+    )
+    assert skipped == {'groups': 1, 'templates': 1, 'hosts': 0, 'triggers': 1}
+    import_source = json.loads(zabbix_api.confimport.call_args[1]['source'])['zabbix_export']
+    assert import_source['groups'] == [{'name': 'New group'}]
+    assert import_source['templates'] == []
+    assert import_source['hosts'] == [{'host': 'Host', 'name': 'Renamed host'}]
+    # Unchanged trigger of the imported host is kept to not be deleted as missing
+    assert import_source['triggers'] == [{'name': 'Host trigger', 'expression': '{Host:a.last()}=1'}]
+
+def test_import_configs_diff_unchanged(zabbix_api):
+    zabbix_api.template.get.return_value = [{'templateid': '1', 'host': 'Template'}]
+    config = {
+        'version': '4.0',
+        'groups': [{'name': 'Group'}],
+        'templates': [{'template': 'Template'}],
+    }
+
+    skipped = import_configs(zabbix_api, config, diff=True)
+
+    assert skipped == {'groups': 1, 'templates': 1}
+    zabbix_api.confimport.assert_not_called()
+
+def test_import_configs_manifest(zabbix_api, tmpdir):
+    zabbix_api.template.get.return_value = [{'templateid': '1', 'host': 'Template'}]
+    zabbix_api.usermacro.get.return_value = [{'globalmacroid': '5', 'macro': '{$MACRO}', 'value': 'value'}]
+    zabbix_api.drule.get.return_value = [{'druleid': '6', 'name': 'Rule'}]
+    config = {
+        'templates': [{'template': 'Template'}],
+        'triggers': [{'name': 'Trigger', 'expression': '{Template:a.last()}=1'}],
+        'macros': [{'macro': '{$MACRO}', 'value': 'value'}],
+        'discovery_rules': [{'name': 'Rule', 'dchecks': []}],
+    }
+    manifest = ImportManifest(str(tmpdir.join('manifest.json')), 'http://zabbix')
+
+    assert import_configs(zabbix_api, config, manifest=manifest) == {'templates': 0, 'triggers': 0}
+    assert zabbix_api.confimport.call_count == 1
+    assert zabbix_api.drule.update.call_count == 1
+
+    assert import_configs(zabbix_api, config, manifest=manifest) == {'templates': 1, 'triggers': 1}
+    assert zabbix_api.confimport.call_count == 1
+    assert zabbix_api.drule.update.call_count == 1
+
+    # Changed trigger is imported alone
+    config['triggers'] = [{'name': 'Trigger', 'expression': '{Template:a.last()}=2'}]
+    assert import_configs(zabbix_api, config, manifest=manifest) == {'templates': 1, 'triggers': 0}
+    import_source = json.loads(zabbix_api.confimport.call_args[1]['source'])['zabbix_export']
+    assert import_source['templates'] == []
+    assert import_source['triggers'] == config['triggers']
+
+    # Objects deleted from the server are imported again
+    zabbix_api.template.get.return_value = []
+    assert import_configs(zabbix_api, config, manifest=manifest) == {'templates': 0, 'triggers': 0}
+
+def test_import_configs_manifest_actions(zabbix_api, tmpdir):
+    zabbix_api.hostgroup.get.return_value = [{'groupid': '4', 'name': 'Group'}]
+    zabbix_api.action.get.return_value = [{'actionid': '7', 'name': 'Action'}]
+    action = {
+        'name': 'Action',
+        'eventsource': '0',
+        'filter': {'conditions': [{'conditiontype': '0', 'value': 'Group'}]},
+    }
+    config = {'actions': [action]}
+    manifest = ImportManifest(str(tmpdir.join('manifest.json')), 'http://zabbix')
+
+    import_configs(zabbix_api, config, manifest=manifest)
+    zabbix_api.action.update.assert_called_once_with({
+        'actionid': '7',
+        'name': 'Action',
+        'filter': {'conditions': [{'conditiontype': '0', 'value': '4'}]},
+    })
+    # Imported configuration is not changed by preparation
+    assert config['actions'] == [{
+        'name': 'Action',
+        'eventsource': '0',
+        'filter': {'conditions': [{'conditiontype': '0', 'value': 'Group'}]},
+    }]
+
+    import_configs(zabbix_api, config, manifest=manifest)
+    assert zabbix_api.action.update.call_count == 1
+
+def test_import_configs_in_chunks(zabbix_api):
+    zabbix_api.usermacro.get.return_value = [
+        {'globalmacroid': str(i), 'macro': '{$MACRO_%d}' % i, 'value': 'old'} for i in range(3)
+    ]
+    zabbix_api.drule.get.return_value = []
+    config = {
+        'macros': [ {'macro': '{$MACRO_%d}' % i, 'value': 'new'} for i in range(5) ],
+        'discovery_rules': [ {'name': 'Rule %d' % i, 'dchecks': []} for i in range(5) ],
+    }
+
+    import_configs(zabbix_api, config, chunk_size=2)
+
+    assert zabbix_api.usermacro.updateglobal.call_count == 2
+    assert zabbix_api.usermacro.updateglobal.call_args_list[0][0] == (
+        {'globalmacroid': '0', 'value': 'new'},
+        {'globalmacroid': '1', 'value': 'new'},
+    )
+    zabbix_api.usermacro.createglobal.assert_called_once_with(
+        {'macro': '{$MACRO_3}', 'value': 'new'},
+        {'macro': '{$MACRO_4}', 'value': 'new'},
+    )
+    assert zabbix_api.drule.create.call_count == 3
+
+def test_plan_import_configs(zabbix_api):
+    zabbix_api.template.get.return_value = [{'templateid': '1', 'host': 'Template'}, {'templateid': '2', 'host': 'Old template'}]
+    config = {
+        'templates': [{'template': 'Template'}, {'template': 'New template'}],
+    }
+
+    plans = plan_import_configs(zabbix_api, config, delete=True)
+
+    assert list(plans) == ['templates']
+    assert plans['templates'].creates == ['New template']
+    assert plans['templates'].updates == {'Template': '1'}
+    assert plans['templates'].deletes == {'2': 'Old template'}
+    zabbix_api.template.delete.assert_not_called()
+    zabbix_api.confimport.assert_not_called()
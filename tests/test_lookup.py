@@ -0,0 +1,64 @@
+import pytest
+from mock import MagicMock
+from unimonapi import UnimonError
+from unimonapi.zabbix import lookup
+from unimonapi.zabbix.actions import EXPAND_KEYS
+from unimonapi.zabbix.actions import TYPED_KEYS
+
+@pytest.fixture
+def zabbix_api():
+    zabbix_api = MagicMock()
+    zabbix_api.hostgroup.get.return_value = [
+        {'groupid': '1', 'name': 'Group 1'},
+        {'groupid': '2', 'name': 'Group 2'},
+    ]
+    zabbix_api.host.get.return_value = [
+        {'hostid': '10', 'host': 'host-10'},
+    ]
+    return zabbix_api
+
+def test_get_object_names(zabbix_api):
+    names = lookup.get_object_names(zabbix_api, ['1', '2', '1'], lookup.HOST_GROUP)
+
+    zabbix_api.hostgroup.get.assert_called_once()
+    args, kwargs = zabbix_api.hostgroup.get.call_args
+    assert sorted(kwargs['groupids']) == ['1', '2']
+    assert names == {'1': 'Group 1', '2': 'Group 2'}
+
+def test_get_object_ids_chunked(zabbix_api):
+    ids = lookup.get_object_ids(zabbix_api, ['Group 1', 'Group 2', 'Group 3'], lookup.HOST_GROUP, chunk_size=2)
+
+    assert zabbix_api.hostgroup.get.call_count == 2
+    assert ids == {'Group 1': '1', 'Group 2': '2'}
+
+def test_prepare_object_for_export(zabbix_api):
+    actions = [
+        {
+            'name': 'Action {}'.format(i),
+            'operations': [{'opgroup': [{'groupid': '1'}, {'groupid': '2'}], 'opcommand_hst': [{'hostid': '0'}]}],
+            'filter': {'conditions': [{'conditiontype': '1', 'value': '10'}, {'conditiontype': '16', 'value': ''}]},
+        }
+        for i in range(10)
+    ]
+
+    actions = lookup.prepare_object_for_import_export(zabbix_api, actions, expand_keys=EXPAND_KEYS, typed_keys=TYPED_KEYS)
+
+    zabbix_api.hostgroup.get.assert_called_once()
+    zabbix_api.host.get.assert_called_once()
+    assert actions[9]['operations'][0]['opgroup'] == [{'groupid': 'Group 1'}, {'groupid': 'Group 2'}]
+    assert actions[9]['operations'][0]['opcommand_hst'] == [{'hostid': '0'}]
+    assert actions[9]['filter']['conditions'] == [{'conditiontype': '1', 'value': 'host-10'}, {'conditiontype': '16', 'value': ''}]
+
+def test_prepare_object_for_import(zabbix_api):
+    groups = [{'groupid': 'Group 2'}, {'groupid': 'Group 1'}]
+
+    groups = lookup.prepare_object_for_import_export(zabbix_api, groups, export=False, expand_keys=EXPAND_KEYS)
+
+    zabbix_api.hostgroup.get.assert_called_once()
+    args, kwargs = zabbix_api.hostgroup.get.call_args
+    assert sorted(kwargs['filter']['name']) == ['Group 1', 'Group 2']
+    assert groups == [{'groupid': '2'}, {'groupid': '1'}]
+
+def test_prepare_object_not_found(zabbix_api):
+    with pytest.raises(UnimonError, match=r'Object "groupid" not found: 3'):
+        lookup.prepare_object_for_import_export(zabbix_api, {'groupid': '3'}, expand_keys=EXPAND_KEYS)
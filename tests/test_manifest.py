@@ -0,0 +1,34 @@
+import pytest
+import json
+from unimonapi.zabbix.manifest import ImportManifest
+
+def test_manifest_record_and_save(tmpdir):
+    path = str(tmpdir.join('manifest.json'))
+    manifest = ImportManifest(path, 'http://zabbix1')
+    manifest.record('hosts', 'Host', {'host': 'Host'})
+    manifest.save()
+
+    manifest = ImportManifest(path, 'http://zabbix1')
+    assert manifest.is_unchanged('hosts', 'Host', {'host': 'Host'})
+    assert not manifest.is_unchanged('hosts', 'Host', {'host': 'Host', 'name': 'Renamed'})
+    assert not manifest.is_unchanged('templates', 'Host', {'host': 'Host'})
+
+    # Manifests of different servers are independent
+    manifest = ImportManifest(path, 'http://zabbix2')
+    assert not manifest.is_unchanged('hosts', 'Host', {'host': 'Host'})
+    manifest.record('hosts', 'Other host', {'host': 'Other host'})
+    manifest.save()
+    with open(path) as f:
+        assert sorted(json.load(f)) == ['http://zabbix1', 'http://zabbix2']
+
+def test_manifest_prune_and_clear(tmpdir):
+    manifest = ImportManifest(str(tmpdir.join('manifest.json')), 'http://zabbix')
+    manifest.record('hosts', 'Host 1', {'host': 'Host 1'})
+    manifest.record('hosts', 'Host 2', {'host': 'Host 2'})
+
+    manifest.prune('hosts', ['Host 2'])
+    assert not manifest.is_unchanged('hosts', 'Host 1', {'host': 'Host 1'})
+    assert manifest.is_unchanged('hosts', 'Host 2', {'host': 'Host 2'})
+
+    manifest.clear()
+    assert not manifest.is_unchanged('hosts', 'Host 2', {'host': 'Host 2'})
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+
+import pytest, json
+from mock import MagicMock
+from pyzabbix import ZabbixAPIException
+from unimonapi.zabbix.metrics import APIMetrics
+from unimonapi.zabbix.metrics import record_transfer
+from unimonapi.zabbix.client import ZabbixClient
+from unimonapi.zabbix.transport import LocalTransport
+from unimonapi import ZabbixAPI
+
+def test_record_histogram():
+    metrics = APIMetrics(buckets=[0.1, 1])
+    metrics.record('host.get', 0.05, 10, 100)
+    metrics.record('host.get', 0.1, 10, 200)
+    metrics.record('host.get', 5, 20, 0, error=True)
+
+    host_get = metrics.get()['host.get']
+    assert host_get['calls'] == 3
+    assert host_get['errors'] == 1
+    assert host_get['latency_sum'] == pytest.approx(5.15)
+    assert host_get['latency_histogram'] == [(0.1, 2), (1, 2), (None, 3)]
+    assert host_get['request_bytes'] == 40
+    assert host_get['response_bytes'] == 300
+
+    metrics.reset()
+    assert metrics.get() == {}
+
+def test_measure_transfer():
+    callback = MagicMock()
+    metrics = APIMetrics(callback=callback)
+
+    def call():
+        record_transfer(10, 100)
+        # Nested call is measured separately
+        metrics.measure('user.login', record_transfer, 1, 2)
+        record_transfer(5, 50)
+        return 'result'
+
+    assert metrics.measure('host.get', call) == 'result'
+    with pytest.raises(ValueError):
+        metrics.measure('host.delete', MagicMock(side_effect=ValueError))
+    # Transfers out of measured calls are ignored
+    record_transfer(1000, 1000)
+
+    snapshot = metrics.get()
+    assert (snapshot['host.get']['request_bytes'], snapshot['host.get']['response_bytes']) == (15, 150)
+    assert (snapshot['user.login']['request_bytes'], snapshot['user.login']['response_bytes']) == (1, 2)
+    assert (snapshot['host.delete']['calls'], snapshot['host.delete']['errors']) == (1, 1)
+    assert callback.call_count == 3
+    method, latency, request_bytes, response_bytes, error = callback.call_args[0]
+    assert (method, request_bytes, response_bytes, error) == ('host.delete', 0, 0, True)
+
+def test_failed_callback():
+    metrics = APIMetrics(callback=MagicMock(side_effect=Exception('Callback failed')))
+    metrics.record('host.get', 0.1)
+    assert metrics.get()['host.get']['calls'] == 1
+
+def test_format_prometheus():
+    metrics = APIMetrics(buckets=[0.5])
+    metrics.record('host.get', 0.25, 10, 100)
+    metrics.record('problem.get', 1, 20, 200, error=True)
+
+    lines = metrics.format_prometheus().splitlines()
+    assert '# TYPE zabbix_api_calls_total counter' in lines
+    assert 'zabbix_api_calls_total{method="host.get"} 1' in lines
+    assert 'zabbix_api_errors_total{method="problem.get"} 1' in lines
+    assert 'zabbix_api_request_bytes_total{method="problem.get"} 20' in lines
+    assert 'zabbix_api_response_bytes_total{method="host.get"} 100' in lines
+    assert '# TYPE zabbix_api_call_duration_seconds histogram' in lines
+    assert 'zabbix_api_call_duration_seconds_bucket{method="host.get",le="0.5"} 1' in lines
+    assert 'zabbix_api_call_duration_seconds_bucket{method="problem.get",le="0.5"} 0' in lines
+    assert 'zabbix_api_call_duration_seconds_bucket{method="problem.get",le="+Inf"} 1' in lines
+    assert 'zabbix_api_call_duration_seconds_sum{method="host.get"} 0.25' in lines
+    assert 'zabbix_api_call_duration_seconds_count{method="problem.get"} 1' in lines
+
+def test_client_metrics():
+    zabbix_api = MagicMock()
+    zabbix_api.auth = 'token_1'
+    def login(user, password):
+        zabbix_api.auth = 'token_2'
+    zabbix_api.login.side_effect = login
+    zabbix_api.host.get.side_effect = (
+        ZabbixAPIException('Error -32602: Invalid params., Session terminated, re-login, please.'),
+        ['host'],
+    )
+    zabbix_api.host.delete.side_effect = ZabbixAPIException('Error -32500: Application error., No permissions')
+    metrics = APIMetrics()
+    client = ZabbixClient(zabbix_api, 'Admin', 'zabbix', metrics)
+
+    assert client.host.get() == ['host']
+    with pytest.raises(ZabbixAPIException):
+        client.host.delete('host_id')
+    client.confimport('json', '{}', {})
+
+    snapshot = metrics.get()
+    assert (snapshot['host.get']['calls'], snapshot['host.get']['errors']) == (1, 0)
+    assert (snapshot['host.delete']['calls'], snapshot['host.delete']['errors']) == (1, 1)
+    assert snapshot['user.login']['calls'] == 1
+    assert snapshot['configuration.import']['calls'] == 1
+
+def test_zabbix_api_metrics():
+    def handler(method, params):
+        if method == 'user.login':
+            return 'token'
+        return [{ 'hostid': '1' }]
+
+    metrics = APIMetrics()
+    api = ZabbixAPI('http://zabbix-frontend', 'Admin', 'zabbix', transport=LocalTransport(handler), metrics=metrics)
+    assert api.get_host_id('host') == '1'
+
+    snapshot = api.get_api_metrics()
+    assert sorted(snapshot) == ['host.get', 'user.login']
+    assert snapshot['host.get']['calls'] == 1
+    assert snapshot['host.get']['request_bytes'] > 0
+    assert snapshot['host.get']['response_bytes'] == len(json.dumps({ 'jsonrpc': '2.0', 'id': 1, 'result': [{ 'hostid': '1' }] }))
+
+    api = ZabbixAPI('http://zabbix-frontend', 'Admin', 'zabbix', transport=LocalTransport(handler))
+    assert api.get_api_metrics() == {}
@@ -0,0 +1,68 @@
+import pytest
+import Queue
+from mock import MagicMock
+from unimonapi import ProblemPoller
+from unimonapi import MonitoringAPI
+from unimonapi import NotImplemented
+from unimonapi import Event
+
+def make_event(id, event_type=Event.PROBLEM):
+    return Event(event_type, True, Event.WARNING, 'host', 'text', id)
+
+def test_poller_problem_updates():
+    monitoring_api = MagicMock(spec=MonitoringAPI)
+    monitoring_api.get_problem_updates.side_effect = [
+        ([make_event('1'), make_event('2')], []),
+        ([make_event('3')], [make_event('1', Event.RESOLUTION)]),
+        ([], []),
+    ]
+    poller = ProblemPoller(monitoring_api, severities=[Event.WARNING])
+    batches = []
+    poller.subscribe(batches.append)
+
+    poller.poll()
+    poller.poll()
+    poller.poll()
+
+    monitoring_api.get_problem_updates.assert_called_with([Event.WARNING], None)
+    # Every poll is delivered as one batch, empty polls are not delivered
+    assert [ [ (event.type, event.id) for event in batch ] for batch in batches ] == [
+        [(Event.PROBLEM, '1'), (Event.PROBLEM, '2')],
+        [(Event.PROBLEM, '3'), (Event.RESOLUTION, '1')],
+    ]
+    assert sorted( event.id for event in poller.get_open_problems() ) == ['2', '3']
+
+def test_poller_problems_diff():
+    monitoring_api = MagicMock(spec=MonitoringAPI)
+    monitoring_api.get_problem_updates.side_effect = NotImplemented('MonitoringAPI method "get_problem_updates" is not implemented')
+    monitoring_api.get_problems.side_effect = [
+        [make_event('1'), make_event('2')],
+        [make_event('2'), make_event('3')],
+    ]
+    poller = ProblemPoller(monitoring_api)
+
+    assert [ event.id for event in poller.poll() ] == ['1', '2']
+    events = poller.poll()
+
+    assert [ (event.type, event.id) for event in events ] == [(Event.PROBLEM, '3'), (Event.RESOLUTION, '1')]
+    assert monitoring_api.get_problem_updates.call_count == 1
+
+def test_poller_thread():
+    monitoring_api = MagicMock(spec=MonitoringAPI)
+    monitoring_api.get_problem_updates.side_effect = lambda severities, groups: ([make_event('1')], [])
+    poller = ProblemPoller(monitoring_api, interval=0.01)
+    events = Queue.Queue()
+    poller.subscribe(events.put)
+    failing_subscriber = MagicMock(side_effect=Exception('Subscriber error'))
+    poller.subscribe(failing_subscriber)
+
+    poller.start()
+    try:
+        first_batch = events.get(timeout=5)
+        second_batch = events.get(timeout=5)
+    finally:
+        poller.stop(timeout=5)
+
+    assert [ event.id for event in first_batch ] == ['1']
+    assert [ event.id for event in second_batch ] == ['1']
+    assert failing_subscriber.call_count >= 2
@@ -0,0 +1,52 @@
+import pytest
+from mock import MagicMock
+from unimonapi.zabbix.reconcile import reconcile
+from unimonapi.zabbix.reconcile import plan_reconcile
+
+@pytest.fixture
+def zabbix_api():
+    zabbix_api = MagicMock()
+    zabbix_api.host.get.return_value = [ {'hostid': str(i), 'host': 'Host %d' % i} for i in range(5) ]
+    zabbix_api.hostgroup.get.return_value = [
+        {'groupid': '1', 'name': 'Group', 'internal': '0'},
+        {'groupid': '2', 'name': 'Discovered hosts', 'internal': '1'},
+        {'groupid': '3', 'name': 'Old group', 'internal': '0'},
+    ]
+    return zabbix_api
+
+def test_plan_reconcile(zabbix_api):
+    plan = plan_reconcile(zabbix_api, 'hosts', ['Host 0', 'Host 1', 'New host'])
+
+    zabbix_api.host.get.assert_called_once_with(output=['hostid', 'host'])
+    assert plan.creates == ['New host']
+    assert plan.updates == {'Host 0': '0', 'Host 1': '1'}
+    assert plan.deletes == {'2': 'Host 2', '3': 'Host 3', '4': 'Host 4'}
+
+    plan = plan_reconcile(zabbix_api, 'hosts', ['Host 0'], delete=False)
+    assert plan.deletes == {}
+
+def test_plan_reconcile_internal_groups(zabbix_api):
+    plan = plan_reconcile(zabbix_api, 'groups', ['Group'])
+
+    zabbix_api.hostgroup.get.assert_called_once_with(output=['groupid', 'name', 'internal'])
+    assert plan.deletes == {'3': 'Old group'}
+
+def test_reconcile_in_chunks(zabbix_api):
+    plan = reconcile(zabbix_api, 'hosts', ['Host 0'], chunk_size=2)
+
+    assert len(plan.deletes) == 4
+    assert [ call[0] for call in zabbix_api.host.delete.call_args_list ] == [('1', '2'), ('3', '4')]
+
+def test_reconcile_dry_run(zabbix_api):
+    plan = reconcile(zabbix_api, 'hosts', ['Host 0'], dry_run=True)
+
+    assert len(plan.deletes) == 4
+    zabbix_api.host.delete.assert_not_called()
+
+def test_reconcile_existing_objects(zabbix_api):
+    existing_macros = [{'globalmacroid': '1', 'macro': '{$A}', 'value': 'a'}, {'globalmacroid': '2', 'macro': '{$B}', 'value': 'b'}]
+
+    reconcile(zabbix_api, 'macros', ['{$A}'], existing_objects=existing_macros)
+
+    zabbix_api.usermacro.get.assert_not_called()
+    zabbix_api.usermacro.deleteglobal.assert_called_once_with('2')
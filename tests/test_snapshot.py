@@ -0,0 +1,13 @@
+import pytest
+from unimonapi import Snapshot
+from unimonapi import Event
+from unimonapi import HostGroup
+
+def test_snapshot_init():
+    event = Event(Event.PROBLEM, True, Event.CRITICAL, 'host', 'text', 'id')
+    host_group = HostGroup('name', 'id')
+    snapshot = Snapshot([event], [host_group], {'host': 1})
+
+    assert snapshot.problems == [event]
+    assert snapshot.groups == [host_group]
+    assert snapshot.hosts == {'host': 1}
@@ -0,0 +1,78 @@
+import pytest
+import json, threading, time
+from mock import patch
+from pyzabbix import ZabbixAPI as PyZabbixAPI
+from pyzabbix import ZabbixAPIException
+from unimonapi import ZabbixAPI
+from unimonapi.zabbix.transport import HttpTransport
+from unimonapi.zabbix.transport import LocalTransport
+
+def fake_zabbix(method, params):
+    if method == 'user.login':
+        return 'auth_token'
+    elif method == 'host.get':
+        return [{'hostid': '10', 'host': params['filter']['host']}]
+    else:
+        raise Exception('Unsupported method ' + method)
+
+def test_http_transport_init():
+    transport = HttpTransport(pool_size=4, compression=False)
+    session = transport._create_session()
+
+    assert session.get_adapter('https://zabbix-frontend')._pool_maxsize == 1
+    assert transport.headers['Connection'] == 'keep-alive'
+    assert transport.headers['Accept-Encoding'] == 'identity'
+    assert HttpTransport().headers['Accept-Encoding'] == 'gzip, deflate'
+
+@patch('requests.Session.post')
+def test_http_transport_timeout(post):
+    transport = HttpTransport(connect_timeout=1, read_timeout=2)
+
+    transport.post('http://zabbix-frontend', data='{}')
+    post.assert_called_once_with('http://zabbix-frontend', data='{}', headers=transport.headers, timeout=(1, 2))
+
+    transport.post('http://zabbix-frontend', data='{}', timeout=5)
+    post.assert_called_with('http://zabbix-frontend', data='{}', headers=transport.headers, timeout=5)
+
+def test_http_transport_session_pool():
+    transport = HttpTransport(pool_size=2)
+    sessions = []
+    threads = []
+    lock = threading.Lock()
+
+    def post(session, url, **kwargs):
+        with lock:
+            sessions.append(session)
+        time.sleep(0.01)
+
+    with patch('requests.Session.post', autospec=True, side_effect=post):
+        for i in range(8):
+            thread = threading.Thread(target=transport.post, args=('http://zabbix-frontend', '{}'))
+            thread.start()
+            threads.append(thread)
+        for thread in threads:
+            thread.join()
+
+    assert len(sessions) == 8
+    assert len(set( id(session) for session in sessions )) <= 2
+
+def test_local_transport():
+    transport = LocalTransport(fake_zabbix)
+
+    response = transport.post('http://zabbix-frontend', data=json.dumps({'method': 'user.login', 'params': {}, 'id': 7}))
+
+    assert json.loads(response.text) == {'jsonrpc': '2.0', 'result': 'auth_token', 'id': 7}
+
+def test_local_transport_with_pyzabbix():
+    zabbix_api = PyZabbixAPI('http://zabbix-frontend', session=LocalTransport(fake_zabbix))
+    zabbix_api.login('Admin', 'zabbix')
+
+    assert zabbix_api.auth == 'auth_token'
+    assert zabbix_api.host.get(filter={'host': 'my-host'}) == [{'hostid': '10', 'host': 'my-host'}]
+    with pytest.raises(ZabbixAPIException, match=r'Unsupported method item.get'):
+        zabbix_api.item.get()
+
+def test_zabbix_api_with_local_transport():
+    zabbix_api = ZabbixAPI('http://zabbix-frontend', 'Admin', 'zabbix', transport=LocalTransport(fake_zabbix))
+
+    assert zabbix_api.get_host_id('my-host') == '10'
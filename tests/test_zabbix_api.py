@@ -1,4 +1,5 @@
 import pytest
+import json, threading, BaseHTTPServer, SocketServer
 from mock import patch
 from mock import call
 from mock import MagicMock
@@ -6,7 +7,11 @@ from unimonapi import MonitoringAPI
 from unimonapi import ZabbixAPI
 from unimonapi import UnimonError
 from unimonapi import Event
+from unimonapi import EventBatch
 from unimonapi import HostGroup
+from unimonapi.zabbix.transport import HttpTransport
+from unimonapi.zabbix.transport import LocalTransport
+from benchmarks import fake_zabbix
 
 @pytest.fixture(scope='module')
 @patch('unimonapi.zabbix.zabbix_api.PyZabbixAPI')
@@ -16,9 +21,16 @@ def zabbix_api(mock):
     zabbix_api.mock_instance = mock.return_value
     return zabbix_api
 
+@pytest.fixture(autouse=True)
+def clear_cache(zabbix_api):
+    zabbix_api.clear_cache()
+
 def test_zabbix_api_init(zabbix_api):
     assert isinstance(zabbix_api, MonitoringAPI)
-    zabbix_api.mock.assert_called_once_with('http://zabbix-frontend')
+    zabbix_api.mock.assert_called_once()
+    args, kwargs = zabbix_api.mock.call_args
+    assert args == ('http://zabbix-frontend',)
+    assert isinstance(kwargs['session'], HttpTransport)
     zabbix_api.mock_instance.login.assert_called_once_with('Admin', 'zabbix123')
 
 @pytest.mark.parametrize('rules_number', [1, 5, pytest.param(0, marks=pytest.mark.xfail(raises=UnimonError))])
@@ -114,6 +126,31 @@ def test_get_problems(zabbix_api, problems_number):
     assert problems[0].text == 'High CPU usage'
     assert problems[0].id == 'event_id'
 
+def test_get_problem_batch(zabbix_api):
+    zabbix_api.mock_instance.problem.get = MagicMock()
+    zabbix_api.mock_instance.trigger.get = MagicMock()
+    zabbix_api.mock_instance.problem.get.return_value = [
+        { 'eventid': str(i), 'objectid': 'trigger_id', 'tags': [] } for i in range(3)
+    ]
+    zabbix_api.mock_instance.trigger.get.return_value = {
+        'trigger_id': {
+            'triggerid': 'trigger_id',
+            'description': 'High CPU usage',
+            'priority': 4,
+            'hosts': [{'hostid': 'host_id', 'name': 'zabbix-server'}],
+            'groups': [{'groupid': 'group_id', 'name': 'Zabbix Servers'}],
+        }
+    }
+
+    problems = zabbix_api.get_problem_batch()
+
+    assert isinstance(problems, EventBatch)
+    assert len(problems) == 3
+    assert [ event.id for event in problems ] == ['0', '1', '2']
+    assert problems[0].severity == Event.CRITICAL
+    assert problems[0].host == 'zabbix-server'
+    assert problems.count_by_severity()[Event.CRITICAL] == 3
+
 @pytest.mark.parametrize(
     ('priority', 'severity'),
     [
@@ -237,6 +274,153 @@ def test_get_problems_dependent(zabbix_api):
     assert kwargs['skipDependent'] == 1
     assert len(problems) == 0
 
+def test_get_problems_trigger_cache(zabbix_api):
+    zabbix_api.mock_instance.problem.get = MagicMock()
+    zabbix_api.mock_instance.trigger.get = MagicMock()
+    zabbix_api.mock_instance.problem.get.return_value = [
+        {'eventid': '3', 'objectid': 'trigger_id', 'tags': []},
+        {'eventid': '2', 'objectid': 'dependent_trigger_id', 'tags': []},
+        {'eventid': '1', 'objectid': 'trigger_id', 'tags': []},
+    ]
+    zabbix_api.mock_instance.trigger.get.return_value = {
+        'trigger_id': {
+            'triggerid': 'trigger_id',
+            'description': 'High CPU usage',
+            'priority': 1,
+            'hosts': [{
+                'hostid': 'host_id',
+                'name': 'zabbix-server',
+            }],
+            'groups': [{
+                'groupid': 'group_id',
+                'name': 'Zabbix Servers',
+            }],
+        }
+    }
+
+    assert len(zabbix_api.get_problems()) == 2
+    assert len(zabbix_api.get_problems()) == 2
+
+    zabbix_api.mock_instance.trigger.get.assert_called_once()
+    args, kwargs = zabbix_api.mock_instance.trigger.get.call_args
+    assert sorted(kwargs['triggerids']) == ['dependent_trigger_id', 'trigger_id']
+    assert zabbix_api.get_trigger_cache_stats()['hits'] == 2
+
+def test_get_problem_updates(zabbix_api):
+    trigger = {
+        'triggerid': 'trigger_id',
+        'description': 'High CPU usage',
+        'priority': 4,
+        'hosts': [{
+            'hostid': 'host_id',
+            'name': 'zabbix-server',
+        }],
+        'groups': [{
+            'groupid': 'group_id',
+            'name': 'Zabbix Servers',
+        }],
+    }
+    zabbix_api.mock_instance.problem.get = MagicMock()
+    zabbix_api.mock_instance.trigger.get = MagicMock()
+    zabbix_api.mock_instance.event.get = MagicMock(return_value=[])
+    zabbix_api.mock_instance.trigger.get.return_value = {'trigger_id': trigger}
+    zabbix_api.mock_instance.problem.get.return_value = [
+        {'eventid': '11', 'objectid': 'trigger_id', 'tags': []},
+        {'eventid': '10', 'objectid': 'trigger_id', 'tags': []},
+    ]
+
+    new_events, resolved_events = zabbix_api.get_problem_updates()
+
+    assert [ event.id for event in new_events ] == ['11', '10']
+    assert resolved_events == []
+
+    args, kwargs = zabbix_api.mock_instance.event.get.call_args
+    assert kwargs['value'] == 0
+    assert kwargs['limit'] == 1
+
+    zabbix_api.mock_instance.problem.get.reset_mock()
+    zabbix_api.mock_instance.trigger.get.reset_mock()
+    zabbix_api.mock_instance.event.get.return_value = [{'eventid': '13', 'objectid': 'trigger_id'}]
+    zabbix_api.mock_instance.problem.get.side_effect = (
+        [{'eventid': '11'}],
+        [{'eventid': '12', 'objectid': 'trigger_id', 'tags': []}],
+    )
+
+    new_events, resolved_events = zabbix_api.get_problem_updates()
+
+    # Recovery events after the initial watermark are requested
+    args, kwargs = zabbix_api.mock_instance.event.get.call_args
+    assert kwargs['eventid_from'] == 1
+    assert 'limit' not in kwargs
+    assert zabbix_api.mock_instance.problem.get.call_count == 2
+    args, kwargs = zabbix_api.mock_instance.problem.get.call_args_list[0]
+    assert sorted(kwargs['eventids']) == ['10', '11']
+    assert kwargs['output'] == ['eventid']
+    args, kwargs = zabbix_api.mock_instance.problem.get.call_args_list[1]
+    assert kwargs['eventid_from'] == 12
+    # Trigger metadata is already cached
+    zabbix_api.mock_instance.trigger.get.assert_not_called()
+    assert [ event.id for event in new_events ] == ['12']
+    assert len(resolved_events) == 1
+    assert resolved_events[0].id == '10'
+    assert resolved_events[0].type == Event.RESOLUTION
+    assert resolved_events[0].severity == Event.CRITICAL
+    assert resolved_events[0].host == 'zabbix-server'
+
+def test_get_problem_updates_no_changes(zabbix_api):
+    zabbix_api.mock_instance.problem.get = MagicMock()
+    zabbix_api.mock_instance.trigger.get = MagicMock()
+    zabbix_api.mock_instance.problem.get.return_value = []
+
+    assert zabbix_api.get_problem_updates() == ([], [])
+    assert zabbix_api.get_problem_updates() == ([], [])
+
+    zabbix_api.mock_instance.trigger.get.assert_not_called()
+    args, kwargs = zabbix_api.mock_instance.problem.get.call_args
+    assert 'eventid_from' not in kwargs
+
+def test_get_problem_updates_by_churn():
+    server = fake_zabbix.FakeZabbixServer(hosts=100, problems=20000, actions=0, templates=0)
+    api = ZabbixAPI('http://zabbix-frontend', 'Admin', 'zabbix', transport=LocalTransport(server))
+    new_events, resolved_events = api.get_problem_updates()
+    assert len(new_events) == 20000
+
+    # Open problems are not requested without changes
+    server.get_calls(reset=True)
+    assert api.get_problem_updates() == ([], [])
+    assert server.get_calls() == {'event.get': 1, 'problem.get': 1}
+
+    # Only problems of recovered triggers are checked
+    server.resolve_problems([5, 20000])
+    server.get_calls(reset=True)
+    new_events, resolved_events = api.get_problem_updates()
+    assert new_events == []
+    assert sorted( event.id for event in resolved_events ) == ['20000', '5']
+    assert server.get_calls() == {'event.get': 1, 'problem.get': 2}
+
+def test_get_summary_incremental_by_churn():
+    server = fake_zabbix.FakeZabbixServer(hosts=100, problems=20000, actions=0, templates=0)
+    api = ZabbixAPI('http://zabbix-frontend', 'Admin', 'zabbix', transport=LocalTransport(server))
+    severities = Event.SEVERITY_ICONS.keys()
+    assert sum( group.problems for group in api.get_summary(severities, incremental=True) ) == 20000
+
+    server.get_calls(reset=True)
+    assert sum( group.problems for group in api.get_summary(severities, incremental=True) ) == 20000
+    assert server.get_calls() == {'event.get': 1, 'problem.get': 1}
+
+    server.resolve_problems([1, 2, 3])
+    assert sum( group.problems for group in api.get_summary(severities, incremental=True) ) == 19997
+
+def test_get_problem_updates_resync():
+    server = fake_zabbix.FakeZabbixServer(hosts=10, problems=10, actions=0, templates=0)
+    api = ZabbixAPI('http://zabbix-frontend', 'Admin', 'zabbix', transport=LocalTransport(server), problem_resync_interval=0)
+    api.get_problem_updates()
+
+    # Problems closed without recovery events are found by the periodic check of all problems
+    server._resolved_problems.add(3)
+    new_events, resolved_events = api.get_problem_updates()
+    assert [ event.id for event in resolved_events ] == ['3']
+
 def test_get_summary(zabbix_api):
     zabbix_api.mock_instance.problem.get = MagicMock()
     zabbix_api.mock_instance.trigger.get = MagicMock()
@@ -287,6 +471,69 @@ def test_get_summary(zabbix_api):
     assert host_groups[1].severity == Event.CRITICAL
     assert host_groups[1].problems == 1
 
+def test_get_snapshot(zabbix_api):
+    zabbix_api.mock_instance.problem.get = MagicMock()
+    zabbix_api.mock_instance.trigger.get = MagicMock()
+    zabbix_api.mock_instance.problem.get.return_value = [
+        {
+            'eventid': 'critical_event_id',
+            'objectid': 'critical_trigger_id',
+            'tags': [],
+        },
+        {
+            'eventid': 'warning_event_id',
+            'objectid': 'warning_trigger_id',
+            'tags': [],
+        },
+    ]
+    zabbix_api.mock_instance.trigger.get.return_value = {
+        'critical_trigger_id': {
+            'triggerid': 'critical_trigger_id',
+            'description': 'Host is down',
+            'priority': 5,
+            'hosts': [{
+                'hostid': 'host_id_1',
+                'name': 'host-1',
+            }],
+            'groups': [
+                {
+                    'groupid': 'group_id_1',
+                    'name': 'Group 1',
+                },
+                {
+                    'groupid': 'summary_group_id',
+                    'name': 'match_filter Group 1',
+                },
+            ],
+        },
+        'warning_trigger_id': {
+            'triggerid': 'warning_trigger_id',
+            'description': 'High CPU usage',
+            'priority': 3,
+            'hosts': [{
+                'hostid': 'host_id_1',
+                'name': 'host-1',
+            }],
+            'groups': [{
+                'groupid': 'group_id_1',
+                'name': 'Group 1',
+            }],
+        }
+    }
+
+    snapshot = zabbix_api.get_snapshot([Event.CRITICAL, Event.WARNING], ['group_id_1'])
+
+    zabbix_api.mock_instance.problem.get.assert_called_once()
+    zabbix_api.mock_instance.trigger.get.assert_called_once()
+    args, kwargs = zabbix_api.mock_instance.problem.get.call_args
+    assert kwargs['groupids'] == ['group_id_1']
+    assert [ event.id for event in snapshot.problems ] == ['critical_event_id', 'warning_event_id']
+    assert len(snapshot.groups) == 1
+    assert snapshot.groups[0].id == 'group_id_1'
+    assert snapshot.groups[0].severity == Event.CRITICAL
+    assert snapshot.groups[0].problems == 2
+    assert snapshot.hosts == {'host-1': 2}
+
 @pytest.mark.parametrize(
     ('os_type', 'bin_file'),
     [
@@ -390,6 +637,142 @@ def test_get_host_name(zabbix_api):
     zabbix_api.mock_instance.host.get.assert_called_once()
     assert returned_name == 'my-host'
 
+def test_lookup_cache(zabbix_api):
+    zabbix_api.mock_instance.host.get = MagicMock()
+    zabbix_api.mock_instance.host.get.return_value = [{'hostid': 'host_id'}]
+    stats = zabbix_api.get_lookup_cache_stats()
+
+    assert zabbix_api.get_host_id('my-host') == 'host_id'
+    assert zabbix_api.get_host_id('my-host') == 'host_id'
+    assert zabbix_api.get_host_id('my-host', visible=True) == 'host_id'
+
+    assert zabbix_api.mock_instance.host.get.call_count == 2
+    assert zabbix_api.get_lookup_cache_stats()['hits'] == stats['hits'] + 1
+    assert zabbix_api.get_lookup_cache_stats()['misses'] == stats['misses'] + 2
+
+def test_lookup_cache_not_found(zabbix_api):
+    zabbix_api.mock_instance.hostgroup.get = MagicMock()
+    zabbix_api.mock_instance.hostgroup.get.return_value = []
+
+    with pytest.raises(UnimonError, match=r'Group "Missing group" is not found'):
+        zabbix_api.add_host('new-host', ['Missing group'])
+    with pytest.raises(UnimonError, match=r'Group "Missing group" is not found'):
+        zabbix_api.add_host('new-host', ['Missing group'])
+
+    zabbix_api.mock_instance.hostgroup.get.assert_called_once()
+
+def test_lookup_cache_invalidation(zabbix_api):
+    zabbix_api.mock_instance.host.get = MagicMock()
+    zabbix_api.mock_instance.host.get.return_value = []
+    zabbix_api.mock_instance.host.delete = MagicMock()
+
+    assert zabbix_api.get_host_id('my-host') is None
+    zabbix_api.mock_instance.host.get.return_value = [{'hostid': 'host_id'}]
+    assert zabbix_api.get_host_id('my-host') is None
+    zabbix_api.delete_host('other_host_id')
+    assert zabbix_api.get_host_id('my-host') == 'host_id'
+
+    assert zabbix_api.mock_instance.host.get.call_count == 2
+
+class FakeZabbixServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    ''' Local Zabbix JSON-RPC server which terminates the first session after a number of calls '''
+
+    daemon_threads = True
+
+    def __init__(self, expire_after_calls):
+        BaseHTTPServer.HTTPServer.__init__(self, ('127.0.0.1', 0), FakeZabbixRequestHandler)
+        self.expire_after_calls = expire_after_calls
+        self.calls = 0
+        self.logins = 0
+        self.auth = None
+        self.lock = threading.Lock()
+
+    def handle_call(self, request):
+        with self.lock:
+            self.calls += 1
+            if self.calls == self.expire_after_calls:
+                self.auth = None
+
+            if request['method'] == 'user.login':
+                self.logins += 1
+                self.auth = 'token_{}'.format(self.logins)
+                return {'result': self.auth}
+            elif request.get('auth') != self.auth:
+                return {'error': {'code': -32602, 'message': 'Invalid params.', 'data': 'Session terminated, re-login, please.'}}
+
+        if request['method'] == 'problem.get':
+            return {'result': [
+                { 'eventid': str(event_id), 'objectid': str(event_id % 10), 'tags': [] }
+                    for event_id in range(100, 0, -1)
+            ]}
+        elif request['method'] == 'trigger.get':
+            return {'result': {
+                trigger_id: {
+                    'triggerid': trigger_id,
+                    'description': 'Trigger ' + trigger_id,
+                    'priority': '4',
+                    'hosts': [{ 'hostid': trigger_id, 'name': 'host-' + trigger_id }],
+                    'groups': [{ 'groupid': '1', 'name': 'Group 1' }],
+                }
+                    for trigger_id in request['params']['triggerids']
+            }}
+        elif request['method'] == 'hostgroup.get':
+            return {'result': [{ 'groupid': '1', 'name': 'Group 1' }]}
+        else:
+            return {'error': {'code': -32601, 'message': 'Method not found.', 'data': request['method']}}
+
+class FakeZabbixRequestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        response = self.server.handle_call(request)
+        response.update({'jsonrpc': '2.0', 'id': request['id']})
+        body = json.dumps(response)
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def test_get_problems_concurrently():
+    server = FakeZabbixServer(expire_after_calls=20)
+    server_thread = threading.Thread(target=server.serve_forever)
+    server_thread.daemon = True
+    server_thread.start()
+    url = 'http://127.0.0.1:{}'.format(server.server_address[1])
+    shared_api = ZabbixAPI(url, 'Admin', 'zabbix', transport=HttpTransport(pool_size=4), trigger_cache_ttl=0)
+    results = []
+    errors = []
+
+    def get_problems():
+        try:
+            for i in range(5):
+                results.append([ (event.id, event.host, event.severity) for event in shared_api.get_problems() ])
+        except Exception as e:
+            errors.append(e)
+
+    threads = [ threading.Thread(target=get_problems) for i in range(8) ]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert errors == []
+    assert len(results) == 40
+    assert results[0][0] == ('100', 'host-0', Event.CRITICAL)
+    assert all( result == results[0] for result in results )
+    # One initial login and exactly one re-login after the session was terminated
+    assert server.logins == 2
+
 # def test_export_config(zabbix_api):
     # zabbix_api.mock_instance.configuration.export = MagicMock()
     # zabbix_api.mock_instance.template.get = MagicMock()
@@ -426,3 +809,372 @@ def test_get_host_name(zabbix_api):
     # zabbix_api.export_config()
 
     # zabbix_api.mock_instance.host.delete.assert_called_once_with('host_id')
+
+def test_install_agents(zabbix_api, monkeypatch, tmpdir):
+    script = tmpdir.join('install_lin.sh')
+    script.write('#!/bin/sh\necho "Installing to $2"\ncase "$2" in\n  slow-host) sleep 5;;\n  bad-host) exit 42;;\n  *) exit 2;;\nesac\n')
+    script.chmod(0o755)
+    monkeypatch.setattr(zabbix_api, '_agent_install_lin', str(script))
+    targets = [
+        ('Linux', 'my-host', 'root', '12345'),
+        ('Linux', 'bad-host', 'root', '12345'),
+        ('Linux', 'slow-host', 'root', '12345'),
+        ('Android', 'phone', 'root', '12345'),
+    ]
+
+    with patch.object(zabbix_api, '_log') as log:
+        results = dict(zabbix_api.install_agents(targets, max_workers=4, timeout=0.5))
+
+    assert results == {
+        targets[0]: MonitoringAPI.CONNECT_FAIL,
+        targets[1]: MonitoringAPI.UNKNOWN_ERROR,
+        targets[2]: MonitoringAPI.UNKNOWN_ERROR,
+        targets[3]: MonitoringAPI.UNSUPPORTED_OS,
+    }
+    log.info.assert_any_call(u'my-host: Installing to my-host')
+    log.error.assert_any_call(u'slow-host: agent installation timed out')
+
+def test_install_agents_cancel(zabbix_api, monkeypatch, tmpdir):
+    script = tmpdir.join('install_lin.sh')
+    script.write('#!/bin/sh\nsleep 0.2\n')
+    script.chmod(0o755)
+    monkeypatch.setattr(zabbix_api, '_agent_install_lin', str(script))
+    targets = [ ('Linux', 'host-%d' % i, 'root', '12345') for i in range(4) ]
+
+    installation = zabbix_api.install_agents(targets, max_workers=1)
+    target, result = next(installation)
+    installation.cancel()
+    results = [result] + [ result for target, result in installation.wait() ]
+
+    assert results.count(MonitoringAPI.INSTALL_SUCCESS) <= 2
+    assert results.count(MonitoringAPI.NOT_STARTED) >= 2
+
+def test_add_hosts(zabbix_api):
+    from pyzabbix import ZabbixAPIException
+    zabbix_api.mock_instance.hostgroup.get = MagicMock(return_value=[
+        {'groupid': '1', 'name': 'Linux servers'},
+        {'groupid': '2', 'name': 'Web servers'},
+    ])
+    def get_templates(filter, output):
+        templates = [{'templateid': '11', 'host': 'match_filter Linux servers', 'name': 'match_filter Web servers'}]
+        return [ template for template in templates if template[ filter.keys()[0] ] in filter.values()[0] ]
+    zabbix_api.mock_instance.template.get = MagicMock(side_effect=get_templates)
+    def create_hosts(*hosts):
+        if any( host['host'] == 'bad-host' for host in hosts ):
+            raise ZabbixAPIException('Host already exists', -32602)
+        return {'hostids': [ 'id-' + host['host'] for host in hosts ]}
+    zabbix_api.mock_instance.host.create = MagicMock(side_effect=create_hosts)
+
+    results = zabbix_api.add_hosts([
+        ('10.0.0.1', ['Linux servers']),
+        ('web-host', ['Linux servers', 'Web servers']),
+        ('lost-host', ['Unknown servers']),
+        ('bad-host', ['Web servers']),
+    ], chunk_size=10)
+
+    # Groups and templates are found once for all hosts
+    assert zabbix_api.mock_instance.hostgroup.get.call_count == 1
+    assert zabbix_api.mock_instance.template.get.call_count == 2
+    assert results[0] == 'id-10.0.0.1'
+    assert results[1] == 'id-web-host'
+    assert unicode(results[2]) == u'Group "Unknown servers" is not found in Zabbix database'
+    assert unicode(results[3]) == u'Cannot add host "bad-host": Host already exists'
+    first_call = zabbix_api.mock_instance.host.create.call_args_list[0]
+    assert [ host['host'] for host in first_call[0] ] == ['10.0.0.1', 'web-host', 'bad-host']
+    assert first_call[0][1]['templates'] == [{'templateid': '11'}, {'templateid': '11'}]
+
+def test_delete_hosts(zabbix_api):
+    zabbix_api.mock_instance.host.delete = MagicMock(side_effect=lambda *ids: {'hostids': list(ids)})
+
+    results = zabbix_api.delete_hosts(['1', '2', '3'], chunk_size=2)
+
+    assert results == ['1', '2', '3']
+    assert [ call[0] for call in zabbix_api.mock_instance.host.delete.call_args_list ] == [('1', '2'), ('3',)]
+
+def test_iter_problems(zabbix_api, monkeypatch):
+    all_problems = [ { 'eventid': str(i), 'objectid': 'trigger_id', 'tags': [] } for i in range(5, 0, -1) ]
+    def get_problems(**kwargs):
+        problems = [ problem for problem in all_problems if int(problem['eventid']) <= kwargs.get('eventid_till', 100) ]
+        return problems[:kwargs['limit']]
+    monkeypatch.setattr(zabbix_api.mock_instance.problem, 'get', MagicMock(side_effect=get_problems))
+    monkeypatch.setattr(zabbix_api.mock_instance.trigger, 'get', MagicMock(return_value={
+        'trigger_id': {
+            'triggerid': 'trigger_id',
+            'description': 'High CPU usage',
+            'priority': 1,
+            'hosts': [{'hostid': 'host_id', 'name': 'zabbix-server'}],
+            'groups': [{'groupid': 'group_id', 'name': 'Zabbix Servers'}],
+        }
+    }))
+
+    problems = zabbix_api.iter_problems(page_size=2)
+
+    # The first page is requested only when iteration starts
+    zabbix_api.mock_instance.problem.get.assert_not_called()
+    assert next(problems).id == '5'
+    assert zabbix_api.mock_instance.problem.get.call_count == 1
+    assert [ event.id for event in problems ] == ['4', '3', '2', '1']
+    assert [ call[1].get('eventid_till') for call in zabbix_api.mock_instance.problem.get.call_args_list ] == [None, 3, 1]
+    assert zabbix_api.mock_instance.trigger.get.call_count == 1
+
+def test_get_problems_without_summary_groups(zabbix_api, monkeypatch):
+    monkeypatch.setattr(zabbix_api.mock_instance.hostgroup, 'get', MagicMock(return_value=[
+        {'groupid': '1', 'name': 'Linux servers'},
+        {'groupid': '2', 'name': 'match_filter Linux servers'},
+    ]))
+    monkeypatch.setattr(zabbix_api.mock_instance.problem, 'get', MagicMock(return_value=[]))
+
+    zabbix_api.get_problems()
+    zabbix_api.get_summary([Event.INFO])
+    zabbix_api.get_problems(groups=['2'])
+
+    # Summary groups are found once and excluded by the query itself
+    zabbix_api.mock_instance.hostgroup.get.assert_called_once()
+    groupids = [ call[1]['groupids'] for call in zabbix_api.mock_instance.problem.get.call_args_list ]
+    assert groupids == [['1'], ['1'], ['2']]
+
+def test_get_problems_only_summary_groups(zabbix_api, monkeypatch):
+    monkeypatch.setattr(zabbix_api.mock_instance.hostgroup, 'get', MagicMock(return_value=[
+        {'groupid': '2', 'name': 'match_filter Linux servers'},
+    ]))
+    monkeypatch.setattr(zabbix_api.mock_instance.problem, 'get', MagicMock(return_value=[]))
+
+    assert zabbix_api.get_problems() == []
+    zabbix_api.mock_instance.problem.get.assert_not_called()
+
+def test_get_summary_incremental(zabbix_api, monkeypatch):
+    open_problems = {
+        '1': {'eventid': '1', 'objectid': 'trigger_1', 'tags': []},
+        '2': {'eventid': '2', 'objectid': 'trigger_2', 'tags': []},
+    }
+    def get_problems(**kwargs):
+        problems = sorted(open_problems.values(), key=lambda problem: int(problem['eventid']), reverse=True)
+        if 'eventids' in kwargs:
+            return [ problem for problem in problems if problem['eventid'] in kwargs['eventids'] ]
+        return [ problem for problem in problems if int(problem['eventid']) >= kwargs.get('eventid_from', 0) ]
+    def make_trigger(trigger_id, priority):
+        return {
+            'triggerid': trigger_id,
+            'description': 'Trigger',
+            'priority': priority,
+            'hosts': [{'hostid': 'host_id', 'name': 'zabbix-server'}],
+            'groups': [{'groupid': 'group_id', 'name': 'Zabbix Servers'}],
+        }
+    triggers = {'trigger_1': make_trigger('trigger_1', 2), 'trigger_2': make_trigger('trigger_2', 4), 'trigger_3': make_trigger('trigger_3', 4)}
+    recovery_events = []
+    def get_events(**kwargs):
+        return [ event for event in recovery_events if int(event['eventid']) >= kwargs.get('eventid_from', 0) ][:kwargs.get('limit')]
+    monkeypatch.setattr(zabbix_api.mock_instance.hostgroup, 'get', MagicMock(return_value=[]))
+    monkeypatch.setattr(zabbix_api.mock_instance.event, 'get', MagicMock(side_effect=get_events))
+    monkeypatch.setattr(zabbix_api.mock_instance.problem, 'get', MagicMock(side_effect=get_problems))
+    monkeypatch.setattr(zabbix_api.mock_instance.trigger, 'get', MagicMock(
+        side_effect=lambda **kwargs: { trigger_id: triggers[trigger_id] for trigger_id in kwargs['triggerids'] }
+    ))
+
+    summary = zabbix_api.get_summary([Event.INFO], incremental=True)
+    assert [ (group.id, group.problems, group.severity) for group in summary ] == [('group_id', 2, Event.CRITICAL)]
+
+    del open_problems['2']
+    open_problems['3'] = {'eventid': '3', 'objectid': 'trigger_3', 'tags': []}
+    del open_problems['1']
+    recovery_events.extend([{'eventid': '4', 'objectid': 'trigger_2'}, {'eventid': '5', 'objectid': 'trigger_1'}])
+    summary = zabbix_api.get_summary([Event.INFO], incremental=True)
+    assert [ (group.id, group.problems, group.severity) for group in summary ] == [('group_id', 1, Event.CRITICAL)]
+
+    # Only new problems are requested after the first call
+    last_call = zabbix_api.mock_instance.problem.get.call_args_list[-1]
+    assert last_call[1]['eventid_from'] == 3
+
+    # Problems of triggers without recovery events are not requested
+    problem_calls = zabbix_api.mock_instance.problem.get.call_count
+    assert len(zabbix_api.get_summary([Event.INFO], incremental=True)) == 1
+    assert zabbix_api.mock_instance.problem.get.call_count == problem_calls + 1
+    assert 'eventids' not in zabbix_api.mock_instance.problem.get.call_args[1]
+
+    del open_problems['3']
+    recovery_events.append({'eventid': '6', 'objectid': 'trigger_3'})
+    assert zabbix_api.get_summary([Event.INFO], incremental=True) == []
+    assert zabbix_api.get_summary([Event.INFO]) == []
+
+def test_get_problem_updates_new_group(zabbix_api, monkeypatch):
+    host_groups = [{'groupid': '1', 'name': 'Linux servers'}, {'groupid': '2', 'name': 'match_filter Linux servers'}]
+    problems = [{'eventid': '10', 'objectid': 'trigger_1', 'tags': []}]
+    triggers = {
+        'trigger_1': {'triggerid': 'trigger_1', 'description': 'Trigger 1', 'priority': '4',
+                      'hosts': [{'hostid': '1', 'name': 'host-1'}], 'groups': [{'groupid': '1', 'name': 'Linux servers'}]},
+        'trigger_2': {'triggerid': 'trigger_2', 'description': 'Trigger 2', 'priority': '4',
+                      'hosts': [{'hostid': '2', 'name': 'host-2'}], 'groups': [{'groupid': '3', 'name': 'Windows servers'}]},
+    }
+    group_ids = { 'trigger_1': '1', 'trigger_2': '3' }
+    def get_problems(**kwargs):
+        return [
+            problem for problem in problems
+                if int(problem['eventid']) >= kwargs.get('eventid_from', 0)
+                    and ('groupids' not in kwargs or group_ids[ problem['objectid'] ] in kwargs['groupids'])
+        ]
+    monkeypatch.setattr(zabbix_api.mock_instance.hostgroup, 'get', MagicMock(side_effect=lambda **kwargs: host_groups))
+    monkeypatch.setattr(zabbix_api.mock_instance.event, 'get', MagicMock(return_value=[]))
+    monkeypatch.setattr(zabbix_api.mock_instance.problem, 'get', MagicMock(side_effect=get_problems))
+    monkeypatch.setattr(zabbix_api.mock_instance.trigger, 'get', MagicMock(
+        side_effect=lambda **kwargs: { trigger_id: triggers[trigger_id] for trigger_id in kwargs['triggerids'] }
+    ))
+
+    new_events, resolved_events = zabbix_api.get_problem_updates()
+    assert [ event.id for event in new_events ] == ['10']
+    # Cache the list of non-summary groups
+    assert [ event.id for event in zabbix_api.get_problems() ] == ['10']
+
+    # Group created between polls is not in the cached list
+    host_groups.append({'groupid': '3', 'name': 'Windows servers'})
+    problems.insert(0, {'eventid': '11', 'objectid': 'trigger_2', 'tags': []})
+
+    new_events, resolved_events = zabbix_api.get_problem_updates()
+    assert [ event.id for event in new_events ] == ['11']
+    new_events, resolved_events = zabbix_api.get_problem_updates()
+    assert new_events == []
+
+def make_trigger(trigger_id, priority=4, group_name='Linux servers'):
+    return {
+        'triggerid': trigger_id, 'description': 'Trigger ' + trigger_id, 'priority': str(priority),
+        'hosts': [{'hostid': 'host_' + trigger_id, 'name': 'host-' + trigger_id}],
+        'groups': [{'groupid': 'group_' + group_name, 'name': group_name}],
+    }
+
+def mock_problem_server(zabbix_api, monkeypatch, problems, recovery_events, triggers, failures):
+    ''' Mock problem.get, event.get and trigger.get by lists of open problems (newest first), recovery events and
+        a dictionary of triggers. Every method in the list of failures fails once.
+    '''
+    def fail(method):
+        if method in failures:
+            failures.remove(method)
+            raise UnimonError('Connection refused')
+    def get_problems(**kwargs):
+        fail('problem.get')
+        return [
+            problem for problem in problems
+                if int(problem['eventid']) >= kwargs.get('eventid_from', 0)
+                    and ('eventids' not in kwargs or problem['eventid'] in kwargs['eventids'])
+        ]
+    def get_events(**kwargs):
+        fail('event.get')
+        events = [ event for event in recovery_events if int(event['eventid']) >= kwargs.get('eventid_from', 0) ]
+        return events[:kwargs['limit']] if 'limit' in kwargs else events
+    def get_triggers(**kwargs):
+        fail('trigger.get')
+        return { trigger_id: triggers[trigger_id] for trigger_id in kwargs['triggerids'] if trigger_id in triggers }
+    monkeypatch.setattr(zabbix_api.mock_instance.hostgroup, 'get', MagicMock(return_value=[]))
+    monkeypatch.setattr(zabbix_api.mock_instance.problem, 'get', MagicMock(side_effect=get_problems))
+    monkeypatch.setattr(zabbix_api.mock_instance.event, 'get', MagicMock(side_effect=get_events))
+    monkeypatch.setattr(zabbix_api.mock_instance.trigger, 'get', MagicMock(side_effect=get_triggers))
+
+@pytest.mark.parametrize('failed_method', ['event.get', 'problem.get', 'trigger.get'])
+def test_get_problem_updates_failure(zabbix_api, monkeypatch, failed_method):
+    problems = [{'eventid': '11', 'objectid': 'trigger_2', 'tags': []}, {'eventid': '10', 'objectid': 'trigger_1', 'tags': []}]
+    recovery_events = [{'eventid': '5', 'objectid': 'trigger_0'}]
+    failures = []
+    mock_problem_server(zabbix_api, monkeypatch, problems, recovery_events,
+        {'trigger_1': make_trigger('trigger_1'), 'trigger_2': make_trigger('trigger_2'), 'trigger_3': make_trigger('trigger_3')}, failures)
+
+    new_events, resolved_events = zabbix_api.get_problem_updates()
+    assert [ event.id for event in new_events ] == ['11', '10']
+
+    # Problem 10 is resolved and problem 12 occurs, but a call fails
+    problems[:] = [{'eventid': '12', 'objectid': 'trigger_3', 'tags': []}, {'eventid': '11', 'objectid': 'trigger_2', 'tags': []}]
+    recovery_events.insert(0, {'eventid': '13', 'objectid': 'trigger_1'})
+    failures.append(failed_method)
+    with pytest.raises(UnimonError, match=r'Connection refused'):
+        zabbix_api.get_problem_updates()
+
+    # The next call returns all updates
+    new_events, resolved_events = zabbix_api.get_problem_updates()
+    assert [ event.id for event in new_events ] == ['12']
+    assert [ (event.id, event.type) for event in resolved_events ] == [('10', Event.RESOLUTION)]
+    assert zabbix_api.get_problem_updates() == ([], [])
+
+def test_get_problem_updates_pending(zabbix_api, monkeypatch):
+    problems = [{'eventid': '3', 'objectid': 'dependent_trigger', 'tags': []}, {'eventid': '1', 'objectid': 'trigger_1', 'tags': []}]
+    triggers = {'trigger_1': make_trigger('trigger_1')}
+    mock_problem_server(zabbix_api, monkeypatch, problems, [], triggers, [])
+
+    # Dependent trigger is not returned until its parent trigger recovers
+    new_events, resolved_events = zabbix_api.get_problem_updates()
+    assert [ event.id for event in new_events ] == ['1']
+    assert zabbix_api.get_problem_updates() == ([], [])
+
+    # Trigger is returned after the negative trigger cache entry expires
+    triggers['dependent_trigger'] = make_trigger('dependent_trigger')
+    zabbix_api._trigger_cache.invalidate()
+    assert [ event.id for event in zabbix_api.get_problems() ] == ['3', '1']
+    new_events, resolved_events = zabbix_api.get_problem_updates()
+    assert [ event.id for event in new_events ] == ['3']
+    assert zabbix_api.get_problem_updates() == ([], [])
+
+def test_get_problem_updates_pending_resolved(zabbix_api, monkeypatch):
+    problems = [{'eventid': '3', 'objectid': 'dependent_trigger', 'tags': []}]
+    recovery_events = []
+    mock_problem_server(zabbix_api, monkeypatch, problems, recovery_events, {}, [])
+    assert zabbix_api.get_problem_updates() == ([], [])
+
+    # Resolved problem is not retried and its resolution is not reported
+    del problems[:]
+    recovery_events.append({'eventid': '4', 'objectid': 'dependent_trigger'})
+    assert zabbix_api.get_problem_updates() == ([], [])
+    zabbix_api.mock_instance.trigger.get.reset_mock()
+    zabbix_api._trigger_cache.invalidate()
+    assert zabbix_api.get_problem_updates() == ([], [])
+    zabbix_api.mock_instance.trigger.get.assert_not_called()
+
+@pytest.mark.parametrize('failed_method', ['event.get', 'problem.get', 'trigger.get'])
+def test_get_summary_incremental_failure(zabbix_api, monkeypatch, failed_method):
+    problems = [{'eventid': '11', 'objectid': 'trigger_2', 'tags': []}, {'eventid': '10', 'objectid': 'trigger_1', 'tags': []}]
+    recovery_events = [{'eventid': '5', 'objectid': 'trigger_0'}]
+    failures = []
+    mock_problem_server(zabbix_api, monkeypatch, problems, recovery_events,
+        {'trigger_1': make_trigger('trigger_1', 4), 'trigger_2': make_trigger('trigger_2', 2), 'trigger_3': make_trigger('trigger_3', 2)}, failures)
+
+    summary = zabbix_api.get_summary([Event.WARNING, Event.CRITICAL], incremental=True)
+    assert [ (group.problems, group.severity) for group in summary ] == [(2, Event.CRITICAL)]
+
+    # Problem 10 is resolved and problem 12 occurs, but a call fails
+    problems[:] = [{'eventid': '12', 'objectid': 'trigger_3', 'tags': []}, {'eventid': '11', 'objectid': 'trigger_2', 'tags': []}]
+    recovery_events.insert(0, {'eventid': '13', 'objectid': 'trigger_1'})
+    failures.append(failed_method)
+    with pytest.raises(UnimonError, match=r'Connection refused'):
+        zabbix_api.get_summary([Event.WARNING, Event.CRITICAL], incremental=True)
+
+    summary = zabbix_api.get_summary([Event.WARNING, Event.CRITICAL], incremental=True)
+    assert [ (group.problems, group.severity) for group in summary ] == [(2, Event.WARNING)]
+    assert summary[0].problems_by_severity == {Event.INFO: 0, Event.WARNING: 2, Event.CRITICAL: 0}
+
+def test_get_problem_updates_concurrently(zabbix_api, monkeypatch):
+    mock_problem_server(zabbix_api, monkeypatch, [], [], {}, [])
+    get_problems = zabbix_api.mock_instance.problem.get.side_effect
+    critical_requested = threading.Event()
+    critical_released = threading.Event()
+    def get_blocking_problems(**kwargs):
+        if kwargs.get('severities') == [4, 5]:
+            critical_requested.set()
+            critical_released.wait(5)
+        return get_problems(**kwargs)
+    zabbix_api.mock_instance.problem.get.side_effect = get_blocking_problems
+
+    critical_thread = threading.Thread(target=zabbix_api.get_problem_updates, args=([Event.CRITICAL],))
+    critical_thread.start()
+    assert critical_requested.wait(5)
+
+    # Updates of other states do not wait for the API call of the blocked state
+    threads = [
+        threading.Thread(target=zabbix_api.get_problem_updates, args=([Event.INFO],)),
+        threading.Thread(target=zabbix_api.get_summary, args=([Event.INFO],), kwargs={'incremental': True}),
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(2)
+    blocked = [ thread.is_alive() for thread in threads ]
+
+    critical_released.set()
+    critical_thread.join(5)
+    for thread in threads:
+        thread.join(5)
+    assert blocked == [False, False]
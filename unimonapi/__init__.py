@@ -2,6 +2,13 @@ from .error import UnimonError
 from .error import WrongIpRange
 from .error import NotImplemented
 from .event import Event
+from .event_batch import EventBatch
 from .host_group import HostGroup
+from .snapshot import Snapshot
 from .monitoring_api import MonitoringAPI
-from .zabbix.zabbix_api import ZabbixAPI
\ No newline at end of file
+from .federated_monitoring_api import FederatedMonitoringAPI
+from .federated_monitoring_api import PartialResult
+from .problem_poller import ProblemPoller
+from .zabbix.zabbix_api import ZabbixAPI
+from .zabbix.async_api import AsyncZabbixAPI
+from .zabbix.metrics import APIMetrics
@@ -2,9 +2,11 @@
 
 from error import UnimonError
 
-class Event:
+class Event(object):
     ''' Universal monitoring event '''
 
+    __slots__ = ('type', 'detailed', 'severity', 'host', 'text', 'id', 'source')
+
     RESOLUTION, PROBLEM = range(2)
     NO_SEVERITY, INFO, WARNING, CRITICAL = range(-1, 3)
     SEVERITY_ICONS = {
@@ -14,7 +16,7 @@ class Event:
     }
     RESOLUTION_ICON = u'\u2705' # unicode char 'white_check_mark'
 
-    def __init__(self, event_type, event_detailed, event_severity, event_host, event_text, event_id):
+    def __init__(self, event_type, event_detailed, event_severity, event_host, event_text, event_id, event_source=None):
         """ Initialize event object.
             :param event_type:          (int) event type (RESOLUTION or PROBLEM)
             :param event_detailed:      (bool) whether event is detailed
@@ -22,6 +24,7 @@ class Event:
             :param event_host:          (string) host related to the event
             :param event_text:          (string) text description of the event
             :param event_id:            (string) unique identifier of the event
+            :param event_source:        (string) name of monitoring system the event came from (set by FederatedMonitoringAPI)
         """
 
         if event_severity not in self.SEVERITY_ICONS:
@@ -37,6 +40,28 @@ class Event:
         self.host = event_host
         self.text = event_text
         self.id = event_id
+        self.source = event_source
+
+    @classmethod
+    def trusted(cls, event_type, event_detailed, event_severity, event_host, event_text, event_id, event_source=None):
+        ''' Create event from trusted (already validated) data skipping the checks of the constructor. '''
+        event = cls.__new__(cls)
+        event.type = event_type
+        event.detailed = event_detailed
+        event.severity = event_severity
+        event.host = event_host
+        event.text = event_text
+        event.id = event_id
+        event.source = event_source
+        return event
+
+    def __getstate__(self):
+        # Objects with __slots__ have no __dict__ to be pickled with protocols 0 and 1
+        return tuple( getattr(self, name) for name in self.__slots__ )
+
+    def __setstate__(self, state):
+        for name, value in zip(self.__slots__, state):
+            setattr(self, name, value)
 
     def __unicode__(self):
         return u'{} {}: {}'.format(self.SEVERITY_ICONS[ self.severity ], self.host, self.text)
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+
+from array import array
+from event import Event
+
+class EventBatch(object):
+    ''' Compact sequence of events stored by columns: types, detalization flags and severities in arrays,
+        host and source names interned (stored once per distinct name).
+        Indexing and iteration return Event objects created on demand, so the batch can replace a list of events.
+    '''
+
+    def __init__(self, events=()):
+        self.types = array('b')
+        self.detailed = array('b')
+        self.severities = array('b')
+        self.hosts = []
+        self.texts = []
+        self.ids = []
+        self.sources = []
+        self._strings = {}
+
+        for event in events:
+            self.append_event(event)
+
+    def _intern(self, string):
+        return self._strings.setdefault(string, string)
+
+    def append(self, event_type, event_detailed, event_severity, event_host, event_text, event_id, event_source=None):
+        ''' Append event data without creating Event object (the data is trusted, see Event.trusted). '''
+        self.types.append(event_type)
+        self.detailed.append(event_detailed)
+        self.severities.append(event_severity)
+        self.hosts.append(self._intern(event_host))
+        self.texts.append(event_text)
+        self.ids.append(event_id)
+        self.sources.append(self._intern(event_source))
+
+    def extend(self, event_type, event_detailed, rows, event_source=None):
+        ''' Append events of the same type, detalization and source from (severity, host, text, id) tuples. '''
+        severities_append = self.severities.append
+        hosts_append = self.hosts.append
+        texts_append = self.texts.append
+        ids_append = self.ids.append
+        intern = self._strings.setdefault
+        count = 0
+
+        for severity, host, text, id in rows:
+            severities_append(severity)
+            hosts_append(intern(host, host))
+            texts_append(text)
+            ids_append(id)
+            count += 1
+
+        self.types.extend(array('b', [event_type]) * count)
+        self.detailed.extend(array('b', [event_detailed]) * count)
+        self.sources.extend([ self._intern(event_source) ] * count)
+
+    def append_event(self, event):
+        self.append(event.type, event.detailed, event.severity, event.host, event.text, event.id, event.source)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [ self[i] for i in range(*index.indices(len(self))) ]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('EventBatch index out of range')
+
+        return Event.trusted(
+            self.types[index],
+            bool(self.detailed[index]),
+            self.severities[index],
+            self.hosts[index],
+            self.texts[index],
+            self.ids[index],
+            self.sources[index],
+        )
+
+    def __iter__(self):
+        for i in xrange(len(self)):
+            yield self[i]
+
+    def count_by_severity(self):
+        ''' Return a dictionary with numbers of events by severity computed from the severity column only. '''
+        counts = dict.fromkeys(Event.SEVERITY_ICONS, 0)
+        for severity in self.severities:
+            counts[severity] += 1
+        return counts
@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+
+from multiprocessing.pool import ThreadPool
+from multiprocessing import TimeoutError
+from monitoring_api import MonitoringAPI
+from host_group import HostGroup
+from error import UnimonError
+import logging, threading, time
+
+class PartialResult(list):
+    ''' List of results merged from backends which responded in time.
+        Backends which failed or timed out are in the errors dictionary {backend name: exception}.
+    '''
+
+    def __init__(self, items=(), errors=None):
+        list.__init__(self, items)
+        self.errors = errors if errors is not None else {}
+
+    def is_complete(self):
+        return len(self.errors) == 0
+
+class FederatedMonitoringAPI(MonitoringAPI):
+    ''' Monitoring API merging results of several monitoring systems queried concurrently. '''
+
+    # Methods changing the state of backends: results of calls which finished after a timeout are returned by the next call
+    STATEFUL_METHODS = ('get_problem_updates',)
+
+    def __init__(self, backends, timeout=30, workers=None, default_timeout=30):
+        """ Initialize federated monitoring API object.
+            :param backends:        (dict) MonitoringAPI objects by backend name
+            :param timeout:         (float or dict) seconds to wait for every backend (or a dictionary of timeouts by backend name)
+            :param workers:         (int) maximum number of concurrent calls (the number of backends by default:
+                                    a backend still running after a timeout is not called again until it finishes)
+            :param default_timeout: (float) seconds to wait for backends missing in the dictionary of timeouts
+        """
+        self._backends = backends
+        self._timeout = timeout
+        self._default_timeout = default_timeout
+        self._pool = ThreadPool(workers or max(1, len(backends)))
+        self._running = {}
+        self._late_results = {}
+        self._running_lock = threading.Lock()
+        self._log = logging.getLogger()
+
+    def _get_timeout(self, name):
+        if isinstance(self._timeout, dict):
+            return self._timeout.get(name, self._default_timeout)
+        return self._timeout
+
+    def _call_backends(self, method_name, *args, **kwargs):
+        ''' Call the method of all backends concurrently, return a tuple of dictionaries by backend name: results and errors. '''
+        start = time.time()
+        async_results = {}
+        errors = {}
+        with self._running_lock:
+            for name, backend in self._backends.items():
+                # A backend which timed out still holds a worker: do not queue more calls to it until it finishes
+                if name in self._running and not self._running[name].ready():
+                    errors[name] = UnimonError(u'Monitoring system "{}" is busy with a previous call'.format(name))
+                    self._log.warning(unicode(errors[name]))
+                    continue
+                async_results[name] = self._running[name] = self._pool.apply_async(getattr(backend, method_name), args, kwargs)
+
+        results = {}
+        for name in sorted(async_results):
+            timeout = self._get_timeout(name)
+            if timeout is not None:
+                timeout = max(0, start + timeout - time.time())
+            try:
+                results[name] = async_results[name].get(timeout)
+            except TimeoutError:
+                errors[name] = UnimonError(u'Monitoring system "{}" did not respond in time'.format(name))
+                if method_name in self.STATEFUL_METHODS:
+                    with self._running_lock:
+                        self._late_results[name] = (method_name, args, async_results[name])
+            except Exception as e:
+                errors[name] = e
+
+            if name in errors:
+                self._log.warning(u'Monitoring system "{}" failed: {}'.format(name, unicode(errors[name])))
+
+        return results, errors
+
+    def _pop_late_results(self, method_name, *args):
+        ''' Return a dictionary by backend name of results of the method calls with the same arguments
+            which have finished after a timeout (see STATEFUL_METHODS).
+        '''
+        results = {}
+        with self._running_lock:
+            for name, (late_method_name, late_args, async_result) in self._late_results.items():
+                if late_method_name != method_name or late_args != args or not async_result.ready():
+                    continue
+                del self._late_results[name]
+                try:
+                    results[name] = async_result.get()
+                except Exception as e:
+                    self._log.warning(u'Monitoring system "{}" failed: {}'.format(name, unicode(e)))
+        return results
+
+    def _merge_events(self, events_by_backend, errors):
+        events = PartialResult(errors=errors)
+        for name in sorted(events_by_backend):
+            for event in events_by_backend[name]:
+                event.source = name
+                events.append(event)
+
+        # Stable sort keeps the order of events of the same severity
+        events.sort(key=lambda event: event.severity, reverse=True)
+        return events
+
+    def get_problems(self, severities=None, groups=None):
+        ''' Return PartialResult of problems of all backends (with source set) ordered by severity. '''
+        results, errors = self._call_backends('get_problems', severities, groups)
+        return self._merge_events(results, errors)
+
+    def get_problem_updates(self, severities=None, groups=None):
+        ''' Return a tuple of PartialResult of new problems and PartialResult of resolutions of all backends.
+            Updates of a backend which did not respond in time are returned by the next call.
+        '''
+        late_results = self._pop_late_results('get_problem_updates', severities, groups)
+        results, errors = self._call_backends('get_problem_updates', severities, groups)
+        for name, (late_problems, late_resolutions) in late_results.items():
+            problems, resolutions = results.get(name, ([], []))
+            results[name] = (late_problems + problems, late_resolutions + resolutions)
+        problems = self._merge_events({ name: results[name][0] for name in results }, errors)
+        resolutions = self._merge_events({ name: results[name][1] for name in results }, errors)
+        return problems, resolutions
+
+    def get_summary(self, severities):
+        ''' Return PartialResult of HostGroup objects, groups with the same name are merged.
+            ID of merged group is a dictionary of group IDs by backend name.
+        '''
+        results, errors = self._call_backends('get_summary', severities)
+        groups = {}
+        summary = PartialResult(errors=errors)
+        for name in sorted(results):
+            for host_group in results[name]:
+                if host_group.name not in groups:
+                    groups[host_group.name] = HostGroup(host_group.name, {})
+                    summary.append(groups[host_group.name])
+                groups[host_group.name].id[name] = host_group.id
+                groups[host_group.name].merge(host_group)
+
+        summary.sort(key=lambda host_group: host_group.severity, reverse=True)
+        return summary
+
+    def get_available_host_groups(self):
+        results, errors = self._call_backends('get_available_host_groups')
+        host_groups = PartialResult(errors=errors)
+        names = set()
+        for name in sorted(results):
+            for host_group in results[name]:
+                if host_group not in names:
+                    names.add(host_group)
+                    host_groups.append(host_group)
+        return host_groups
+
+    def close(self):
+        ''' Stop the threads without waiting for backends still running. '''
+        self._pool.terminate()
@@ -3,7 +3,9 @@
 from event import Event
 from error import UnimonError
 
-class HostGroup:
+class HostGroup(object):
+
+    __slots__ = ('name', 'id', 'severity', 'problems', 'problems_by_severity')
 
     def __init__(self, group_name, group_id):
         self.name = group_name
@@ -15,6 +17,14 @@ class HostGroup:
         for severity in Event.SEVERITY_ICONS:
             self.problems_by_severity[severity] = 0
 
+    def __getstate__(self):
+        # Objects with __slots__ have no __dict__ to be pickled with protocols 0 and 1
+        return tuple( getattr(self, name) for name in self.__slots__ )
+
+    def __setstate__(self, state):
+        for name, value in zip(self.__slots__, state):
+            setattr(self, name, value)
+
     def __unicode__(self):
         if self.severity in Event.SEVERITY_ICONS:
             group_str = Event.SEVERITY_ICONS[self.severity] + self.name
@@ -33,4 +43,27 @@ class HostGroup:
             self.severity = severity
 
         self.problems += 1
-        self.problems_by_severity[severity] += 1
\ No newline at end of file
+        self.problems_by_severity[severity] += 1
+
+    def uncount_problem(self, severity):
+        ''' Revert count_problem of a resolved problem. '''
+        if severity not in Event.SEVERITY_ICONS:
+            raise UnimonError('Unsupported problem severity "{}"'.format(str(severity)))
+        elif self.problems_by_severity[severity] == 0:
+            raise UnimonError('No problems with severity "{}" to uncount'.format(str(severity)))
+
+        self.problems -= 1
+        self.problems_by_severity[severity] -= 1
+
+        if self.problems_by_severity[severity] == 0 and severity == self.severity:
+            counted_severities = [ severity for severity in self.problems_by_severity if self.problems_by_severity[severity] != 0 ]
+            self.severity = max(counted_severities) if counted_severities else Event.NO_SEVERITY
+
+    def merge(self, host_group):
+        ''' Add problem counters of another host group (e.g. the same group of another monitoring system). '''
+        if host_group.severity > self.severity:
+            self.severity = host_group.severity
+
+        self.problems += host_group.problems
+        for severity in host_group.problems_by_severity:
+            self.problems_by_severity[severity] += host_group.problems_by_severity[severity]
@@ -40,12 +40,28 @@ class MonitoringAPI:
         """
         raise NotImplemented('MonitoringAPI method "get_problems" is not implemented')
 
+    def get_problem_updates(self, severities=None, groups=None):
+        """ Return a tuple of two lists of Event objects: problems occurred (PROBLEM events) and problems resolved (RESOLUTION events)
+            since the previous call with the same arguments. The first call returns all actual problems as occurred ones.
+            :param severities:        (list of int) severity list of problems to be returned (possible values are Event.SEVERITY_ICONS.keys()), None means all possible
+            :param groups:            (list of strings) host group ids of problems to be returned, None means all possible
+        """
+        raise NotImplemented('MonitoringAPI method "get_problem_updates" is not implemented')
+
     def get_summary(self, severities):
         """ Return a list of HostGroup objects with at least one problem with severity not lower than specified.
             :param severities:        (list of int) severity list of groups to be returned (possible values are Event.SEVERITY_ICONS.keys())
         """
         raise NotImplemented('MonitoringAPI method "get_summary" is not implemented')
 
+    def get_snapshot(self, severities=None, groups=None):
+        """ Return a Snapshot object with actual problems, a summary of host groups and numbers of problems by host
+            built from the same monitoring data (see get_problems and get_summary).
+            :param severities:        (list of int) severity list of problems to be returned (possible values are Event.SEVERITY_ICONS.keys()), None means all possible
+            :param groups:            (list of strings) host group ids of problems to be returned, None means all possible
+        """
+        raise NotImplemented('MonitoringAPI method "get_snapshot" is not implemented')
+
     def get_supported_agent_os(self):
         """ Return a list of supported operating system types to install monitoring agent by install_agent method. """
         raise NotImplemented('MonitoringAPI method "get_supported_agent_os" is not implemented')
@@ -59,6 +75,14 @@ class MonitoringAPI:
         """
         raise NotImplemented('MonitoringAPI method "install_agent" is not implemented')
 
+    def install_agents(self, targets, max_workers=10):
+        """ Install monitoring agents to many hosts concurrently. Return an iterable of (target, result code) pairs
+            yielded as installations finish, its cancel() method skips installations not started yet (NOT_STARTED code).
+            :param targets:         (list of tuples) arguments of install_agent for every host: (os_type, hostname, user, password)
+            :param max_workers:     (int) maximum number of installations run at once
+        """
+        raise NotImplemented('MonitoringAPI method "install_agents" is not implemented')
+
     def get_available_host_groups(self):
         """ Return a list of available host groups for assigning to a host. """
         raise NotImplemented('MonitoringAPI method "get_available_host_groups" is not implemented')
@@ -70,6 +94,12 @@ class MonitoringAPI:
         """
         raise NotImplemented('MonitoringAPI method "add_host" is not implemented')
 
+    def add_hosts(self, hosts):
+        """ Create many hosts at once. Return a list with new host id (string) or UnimonError for every specified host.
+            :param hosts:            (list of tuples) name and list of groups of every host (see add_host)
+        """
+        raise NotImplemented('MonitoringAPI method "add_hosts" is not implemented')
+
     def get_host_name(self, id):
         """ Return a host name by id or None if not found.
             :param id:            (string) host id
@@ -88,6 +118,12 @@ class MonitoringAPI:
         """
         raise NotImplemented('MonitoringAPI method "delete_host" is not implemented')
 
+    def delete_hosts(self, ids):
+        """ Delete many hosts at once. Return a list with deleted host id or UnimonError for every specified id.
+            :param ids:            (list of strings) host ids to be deleted
+        """
+        raise NotImplemented('MonitoringAPI method "delete_hosts" is not implemented')
+
     def export_config(self, auto_created=False):
         """ Return a dictionary with all configurations from monitoring system via API.
             :param auto_created:            (bool) export auto-created/discovered/temporary configurations
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+
+from event import Event
+from error import NotImplemented
+import logging, threading, time
+
+class ProblemPoller(object):
+    ''' Background poller of a monitoring API pushing PROBLEM and RESOLUTION events to subscribers.
+        Every poll gets problem updates (get_problem_updates or, if it is not implemented, a diff of get_problems by event id)
+        and passes all events of the poll to every subscriber at once, so event storms are delivered as one batch.
+        Polls are never queued up: if a poll takes longer than the interval, the next one starts right after it.
+    '''
+
+    def __init__(self, monitoring_api, interval=60, severities=None, groups=None):
+        """ Initialize poller object.
+            :param monitoring_api:      (MonitoringAPI) API to poll (its problem updates state must not be used by other callers)
+            :param interval:            (float) seconds between polls
+            :param severities:          (list of int) severity list of problems (see MonitoringAPI.get_problems)
+            :param groups:              (list of strings) host group ids of problems (see MonitoringAPI.get_problems)
+        """
+        self._monitoring_api = monitoring_api
+        self._interval = interval
+        self._severities = severities
+        self._groups = groups
+        self._subscribers = []
+        self._open_problems = {}
+        self._diff_problems = False
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._log = logging.getLogger()
+
+    def subscribe(self, callback):
+        ''' Add a function called with a list of events of every poll (e.g. Queue.put), it is called in the poller thread. '''
+        with self._lock:
+            self._subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        with self._lock:
+            self._subscribers.remove(callback)
+
+    def get_open_problems(self):
+        ''' Return a list of problems open after the last poll. '''
+        with self._lock:
+            return self._open_problems.values()
+
+    def _get_updates(self):
+        if not self._diff_problems:
+            try:
+                return self._monitoring_api.get_problem_updates(self._severities, self._groups)
+            except NotImplemented:
+                self._log.info('Problem updates are not supported, compare problem lists')
+                self._diff_problems = True
+
+        problems = { event.id: event for event in self._monitoring_api.get_problems(self._severities, self._groups) }
+        new_events = [ event for event_id, event in problems.items() if event_id not in self._open_problems ]
+        resolved_events = [
+            Event.trusted(Event.RESOLUTION, event.detailed, event.severity, event.host, event.text, event.id, event.source)
+                for event_id, event in self._open_problems.items()
+                    if event_id not in problems
+        ]
+        return new_events, resolved_events
+
+    def poll(self):
+        ''' Poll the API once, notify subscribers and return a list of events (new problems and then resolutions). '''
+        new_events, resolved_events = self._get_updates()
+
+        with self._lock:
+            for event in resolved_events:
+                self._open_problems.pop(event.id, None)
+            for event in new_events:
+                self._open_problems[event.id] = event
+            subscribers = list(self._subscribers)
+
+        events = new_events + resolved_events
+        if len(events) != 0:
+            for callback in subscribers:
+                try:
+                    callback(events)
+                except Exception:
+                    self._log.exception('Problem events subscriber failed')
+
+        return events
+
+    def _run(self):
+        next_poll = time.time()
+        while not self._stopped.is_set():
+            try:
+                self.poll()
+            except Exception:
+                self._log.exception('Problem poll failed')
+
+            next_poll = max(next_poll + self._interval, time.time())
+            self._stopped.wait(next_poll - time.time())
+
+    def start(self):
+        ''' Start polling in a background (daemon) thread. '''
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name='ProblemPoller')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        ''' Stop polling and wait for the current poll to finish. '''
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
@@ -0,0 +1,14 @@
+# -*- coding: utf-8 -*-
+
+class Snapshot:
+    ''' Actual problems and their summary built from the same monitoring data '''
+
+    def __init__(self, problems, groups, hosts):
+        """ Initialize snapshot object.
+            :param problems:        (list of Event) actual problems
+            :param groups:          (list of HostGroup) host groups with at least one problem
+            :param hosts:           (dict) number of problems by host name
+        """
+        self.problems = problems
+        self.groups = groups
+        self.hosts = hosts
@@ -1 +1,3 @@
-from .zabbix_api import ZabbixAPI
\ No newline at end of file
+from .zabbix_api import ZabbixAPI
+from .async_api import AsyncZabbixAPI
+from .metrics import APIMetrics
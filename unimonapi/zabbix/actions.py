@@ -1,8 +1,9 @@
 # -*- coding: utf-8 -*-
 
-from unimonapi import UnimonError
 import lookup
-import logging
+import batch
+from reconcile import reconcile
+import logging, copy
 
 FILTER_KEYS = [
     'actionid',
@@ -32,24 +33,19 @@ RENAME_KEYS = {
     'acknowledgeOperations': 'acknowledge_operations',
 }
 
-def expand_filter_condition_values(zabbix_api, conditions, export=True):
-    for condition in conditions:
-        # TODO: Expand discovery check and proxy IDs
-        if condition['conditiontype'] == '0':       object_type = lookup.HOST_GROUP
-        elif condition['conditiontype'] == '1':     object_type = lookup.HOST
-        elif condition['conditiontype'] == '2':     object_type = lookup.TRIGGER
-        elif condition['conditiontype'] == '13':    object_type = lookup.TEMPLATE
-        elif condition['conditiontype'] == '18':    object_type = lookup.DISCO_RULE
-        else:                                       object_type = None
-
-        if object_type is not None:
-            value = lookup.lookup_object(zabbix_api, condition['value'], object_type, by_id=export)
-            if value:
-                condition['value'] = value
-            else:
-                raise UnimonError(u'Object of type {} not found: {}'.format(unicode(object_type), condition['value']))
-
-    return conditions
+def get_condition_value_type(condition):
+    # TODO: Expand discovery check and proxy IDs
+    conditiontype = condition.get('conditiontype')
+    if conditiontype == '0':        return lookup.HOST_GROUP
+    elif conditiontype == '1':      return lookup.HOST
+    elif conditiontype == '2':      return lookup.TRIGGER
+    elif conditiontype == '13':     return lookup.TEMPLATE
+    elif conditiontype == '18':     return lookup.DISCO_RULE
+    else:                           return None
+
+TYPED_KEYS = {
+    'value': get_condition_value_type,
+}
 
 def filter_actions_maintenance_mode(zabbix_api, actions, export=True):
     # Filter maintenance_mode for not trigger actions
@@ -72,50 +68,66 @@ def export_actions(zabbix_api):
         export=True,
         filter_keys=FILTER_KEYS,
         expand_keys=EXPAND_KEYS,
+        typed_keys=TYPED_KEYS,
         copy_keys=COPY_KEYS,
         rename_keys=RENAME_KEYS,
         custom_keys={
-            'conditions': expand_filter_condition_values,
             'actions': filter_actions_maintenance_mode,
         }
     )['actions']
 
-def import_actions(zabbix_api, actions_to_import, overwrite=True, delete=False):
+def import_actions(zabbix_api, actions_to_import, overwrite=True, delete=False, manifest=None, chunk_size=batch.IMPORT_CHUNK_SIZE):
     log = logging.getLogger()
     existing_actions_list = zabbix_api.action.get(output='extend')
     existing_actions_dict = { action['name']: action for action in existing_actions_list }
     kwargs = {
         'export': False,
         'expand_keys': EXPAND_KEYS,
-        'custom_keys': {
-            'conditions': expand_filter_condition_values,
-        },
+        'typed_keys': TYPED_KEYS,
     }
+    actions_to_update = []
+    actions_to_create = []
 
     for action in actions_to_import:
         name = action['name']
         if name in existing_actions_dict:
-            if overwrite:
-                id = existing_actions_dict[name]['actionid']
-                log.info('Update action "{}"'.format(name.encode('utf-8')))
-                # Filter eventsource: cannot update this parameter
-                action = lookup.prepare_object_for_import_export(zabbix_api, action, filter_keys=['eventsource'], **kwargs)
-                zabbix_api.action.update(actionid=id, **action)
-                log.info('Action updated')
+            if manifest is not None and manifest.is_unchanged('actions', name, action):
+                log.debug('Skip unchanged action "{}"'.format(name.encode('utf-8')))
+            elif overwrite:
+                actions_to_update.append(action)
         else:
-            log.info('Create action "{}"'.format(name.encode('utf-8')))
-            action = lookup.prepare_object_for_import_export(zabbix_api, action, **kwargs)
-            zabbix_api.action.create(**action)
-            log.info('Action created')
+            actions_to_create.append(action)
+
+    # Actions are recorded to the manifest as they are imported (before preparation)
+    actions_to_record = { action['name']: action for action in actions_to_update + actions_to_create }
+
+    # Prepare copies of all actions at once to expand names to IDs in bulk:
+    # preparation changes objects in place, imported ones must stay intact for the manifest and the caller
+    # Filter eventsource: cannot update this parameter
+    actions_to_update = lookup.prepare_object_for_import_export(zabbix_api, copy.deepcopy(actions_to_update), filter_keys=['eventsource'], **kwargs)
+    actions_to_create = lookup.prepare_object_for_import_export(zabbix_api, copy.deepcopy(actions_to_create), **kwargs)
+
+    def record(actions):
+        if manifest is not None:
+            for action in actions:
+                manifest.record('actions', action['name'], actions_to_record[ action['name'] ])
+
+    if len(actions_to_update) > 0:
+        for action in actions_to_update:
+            log.info('Update action "{}"'.format(action['name'].encode('utf-8')))
+            action['actionid'] = existing_actions_dict[ action['name'] ]['actionid']
+        batch.call_in_chunks(zabbix_api.action.update, actions_to_update, chunk_size, record)
+        log.info('Actions updated')
+
+    if len(actions_to_create) > 0:
+        for action in actions_to_create:
+            log.info('Create action "{}"'.format(action['name'].encode('utf-8')))
+        batch.call_in_chunks(zabbix_api.action.create, actions_to_create, chunk_size, record)
+        log.info('Actions created')
 
     if delete:
         action_names_to_import = [ action['name'] for action in actions_to_import ]
-        actions_to_delete = {
-            action['actionid']: action['name']
-                for action in existing_actions_list
-                    if action['name'] not in action_names_to_import
-        }
-        if len(actions_to_delete) > 0:
-            log.info('Delete actions: ' + unicode(actions_to_delete.values()).encode('utf-8'))
-            zabbix_api.action.delete(*actions_to_delete.keys())
-            log.info('Actions deleted')
+        reconcile(zabbix_api, 'actions', action_names_to_import, existing_objects=existing_actions_list)
+
+        if manifest is not None:
+            manifest.prune('actions', action_names_to_import)
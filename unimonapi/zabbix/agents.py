@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+
+from multiprocessing.pool import ThreadPool
+from unimonapi import MonitoringAPI
+import threading
+
+def get_install_result_code(returncode):
+    ''' Map exit code of agent installer to one of MonitoringAPI installation result codes. '''
+    if returncode is not None and MonitoringAPI.UNKNOWN_ERROR <= returncode <= MonitoringAPI.UNSUPPORTED_OS:
+        return returncode
+    return MonitoringAPI.UNKNOWN_ERROR
+
+class AgentInstallation:
+    ''' Installation of agents to many hosts run by a pool of threads.
+        Iterate over the object to get (target, result code) pairs as soon as installations finish.
+        Cancelled installations which have not started yet are returned with NOT_STARTED code.
+    '''
+
+    def __init__(self, install, targets, max_workers):
+        """ Start installation.
+            :param install:         (function) installs agent to one target and returns result code
+            :param targets:         (list) targets passed to the install function
+            :param max_workers:     (int) maximum number of installations run at once
+        """
+        self._install = install
+        self._cancelled = threading.Event()
+        self._pool = ThreadPool(max_workers)
+        self._results = self._pool.imap_unordered(self._install_target, targets)
+        self._pool.close()
+
+    def _install_target(self, target):
+        if self._cancelled.is_set():
+            return target, MonitoringAPI.NOT_STARTED
+        return target, self._install(target)
+
+    def __iter__(self):
+        return self
+
+    def next(self):
+        return self._results.next()
+
+    def cancel(self):
+        ''' Do not start remaining installations, running ones are finished (or killed by timeout). '''
+        self._cancelled.set()
+
+    def wait(self):
+        ''' Wait for all installations and return a list of (target, result code) pairs not iterated yet. '''
+        return list(self)
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+
+from multiprocessing.pool import ThreadPool
+
+ASYNC_WORKERS = 8
+
+class AsyncZabbixAPI:
+    ''' Non-blocking interface of ZabbixAPI for event-driven applications.
+        Methods are run by a pool of threads and return multiprocessing.pool.AsyncResult immediately:
+        its result is available with get() or passed to the callback (called in a pool thread).
+        Requests and results are built by the wrapped ZabbixAPI, independent API calls of a method are run concurrently.
+    '''
+
+    def __init__(self, zabbix_api, workers=ASYNC_WORKERS):
+        """ Initialize asynchronous API object.
+            :param zabbix_api:  (ZabbixAPI) logged in API object shared by all calls
+            :param workers:     (int) maximum number of methods run at once
+        """
+        self.zabbix_api = zabbix_api
+        self._pool = ThreadPool(workers)
+        # Separate pool for API calls of running methods, so that methods never wait for their own pool
+        self._calls_pool = ThreadPool(workers)
+
+    def _apply_async(self, function, args=(), kwargs={}, callback=None):
+        return self._pool.apply_async(function, args, kwargs, callback)
+
+    def get_problems(self, severities=None, groups=None, callback=None):
+        return self._apply_async(self.zabbix_api.get_problems, (severities, groups), callback=callback)
+
+    def get_summary(self, severities, callback=None):
+        return self._apply_async(self.zabbix_api.get_summary, (severities,), callback=callback)
+
+    def get_available_host_groups(self, callback=None):
+        def get_available_host_groups():
+            all_groups = self._calls_pool.apply_async(self.zabbix_api._get_all_host_groups)
+            template_groups = self._calls_pool.apply_async(self.zabbix_api._get_template_host_groups)
+            return self.zabbix_api._filter_template_groups(all_groups.get(), template_groups.get())
+        return self._apply_async(get_available_host_groups, callback=callback)
+
+    def add_host(self, name, groups, callback=None):
+        return self._apply_async(self.zabbix_api.add_host, (name, groups), callback=callback)
+
+    def export_config(self, auto_created=False, callback=None, **kwargs):
+        return self._apply_async(self.zabbix_api.export_config, (auto_created,), kwargs, callback)
+
+    def import_config(self, config, overwrite=True, delete=False, callback=None, **kwargs):
+        return self._apply_async(self.zabbix_api.import_config, (config, overwrite, delete), kwargs, callback)
+
+    def close(self):
+        ''' Wait for running methods and stop the threads. '''
+        self._pool.close()
+        self._pool.join()
+        self._calls_pool.close()
+        self._calls_pool.join()
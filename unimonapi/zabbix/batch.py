@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+
+from pyzabbix import ZabbixAPIException
+import logging
+
+# Maximum number of objects created, updated or deleted by one API call
+IMPORT_CHUNK_SIZE = 100
+
+def chunks(objects, chunk_size):
+    ''' Split a list into consecutive chunks of at most chunk_size items (no split if chunk_size is not positive). '''
+    objects = list(objects)
+    if not chunk_size or chunk_size <= 0:
+        chunk_size = len(objects) or 1
+    for i in range(0, len(objects), chunk_size):
+        yield objects[i:i + chunk_size]
+
+def call_in_chunks(api_method, objects, chunk_size=IMPORT_CHUNK_SIZE, on_success=None):
+    ''' Call API method (e.g. zabbix_api.action.create) with chunks of objects passed as an array.
+        If a chunk fails, its objects are passed one by one, so the raised error refers to the offending object.
+        Function on_success(objects) is called with objects of every successful call.
+    '''
+    log = logging.getLogger()
+    for chunk in chunks(objects, chunk_size):
+        try:
+            api_method(*chunk)
+        except ZabbixAPIException as e:
+            if len(chunk) == 1:
+                raise
+            log.warning('Call with {} objects failed, call with every object: {}'.format(len(chunk), e))
+            for object in chunk:
+                api_method(object)
+                if on_success is not None:
+                    on_success([object])
+        else:
+            if on_success is not None:
+                on_success(chunk)
+
+def try_in_chunks(api_method, objects, chunk_size, result_key):
+    ''' Call API method with chunks of objects like call_in_chunks, but do not stop on errors.
+        Return a list with an ID (item of result_key array of the result, e.g. "hostids") or ZabbixAPIException for every object.
+    '''
+    log = logging.getLogger()
+    results = []
+    for chunk in chunks(objects, chunk_size):
+        try:
+            results += api_method(*chunk)[result_key]
+        except ZabbixAPIException as e:
+            if len(chunk) == 1:
+                results.append(e)
+                continue
+            log.warning('Call with {} objects failed, call with every object: {}'.format(len(chunk), e))
+            for object in chunk:
+                try:
+                    results += api_method(object)[result_key]
+                except ZabbixAPIException as e:
+                    results.append(e)
+    return results
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+
+from collections import OrderedDict
+import time, threading
+
+class LRUCache:
+    ''' Thread-safe bounded LRU cache with expiration of entries and hit/miss counters '''
+
+    MISSING = object()
+
+    def __init__(self, max_size=1024, ttl=None, negative_ttl=None):
+        """ Initialize cache object.
+            :param max_size:        (int) maximum number of entries (zero disables caching)
+            :param ttl:             (float) entry lifetime in seconds, None means unlimited
+            :param negative_ttl:    (float) lifetime of None entries ("not found"), None means the same as ttl
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.negative_ttl = ttl if negative_ttl is None else negative_ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        ''' Return cached value or LRUCache.MISSING if the key is not cached or expired. '''
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None or (entry[1] is not None and entry[1] < time.time()):
+                self.misses += 1
+                return self.MISSING
+
+            # Reinsert the entry to mark it as the most recently used one
+            self._entries[key] = entry
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value):
+        if self.max_size <= 0:
+            return
+
+        ttl = self.negative_ttl if value is None else self.ttl
+        expires = None if ttl is None else time.time() + ttl
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (value, expires)
+
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, match=None):
+        ''' Remove entries which keys match the specified function (all entries by default). '''
+        with self._lock:
+            if match is None:
+                self._entries.clear()
+            else:
+                for key in [ key for key in self._entries if match(key) ]:
+                    del self._entries[key]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits':     self.hits,
+                'misses':   self.misses,
+                'size':     len(self._entries),
+            }
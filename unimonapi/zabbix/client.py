@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+
+from pyzabbix import ZabbixAPIException
+import threading
+
+SESSION_EXPIRED_ERRORS = [
+    're-login',
+    'Not authorised',
+    'Not authorized',
+]
+
+def is_session_expired(error):
+    message = unicode(error)
+    for expired_error in SESSION_EXPIRED_ERRORS:
+        if message.find(expired_error) != -1:
+            return True
+    return False
+
+class ZabbixObject(object):
+    ''' Zabbix API object (e.g. host) of ZabbixClient, its attributes are API methods (e.g. host.get) '''
+
+    def __init__(self, client, name):
+        self._client = client
+        self._name = name
+
+    def __getattr__(self, method):
+        if method.startswith('__'):
+            raise AttributeError(method)
+
+        def call(*args, **kwargs):
+            return self._client.call(self._name, method, *args, **kwargs)
+        return call
+
+class ZabbixClient(object):
+    ''' Wrapper of pyzabbix API object to be shared by many threads.
+        All threads use one auth token, which is transparently renewed by a single thread when the session expires.
+        It provides the same interface as pyzabbix: zabbix_api.host.get(...), zabbix_api.confimport(...).
+        If metrics (APIMetrics) are specified, every call is measured including session renewal.
+    '''
+
+    def __init__(self, zabbix_api, user, password, metrics=None):
+        self._zabbix_api = zabbix_api
+        self._user = user
+        self._password = password
+        self._metrics = metrics
+        self._login_lock = threading.Lock()
+
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        return ZabbixObject(self, name)
+
+    def _login(self):
+        if self._metrics is None:
+            self._zabbix_api.login(self._user, self._password)
+        else:
+            self._metrics.measure('user.login', self._zabbix_api.login, self._user, self._password)
+
+    def login(self):
+        with self._login_lock:
+            self._login()
+
+    def _relogin(self, expired_auth):
+        with self._login_lock:
+            # Another thread may have already renewed the session
+            if self._zabbix_api.auth == expired_auth:
+                self._login()
+
+    def _call(self, method, function, *args, **kwargs):
+        if self._metrics is None:
+            return self._call_in_session(function, *args, **kwargs)
+        return self._metrics.measure(method, self._call_in_session, function, *args, **kwargs)
+
+    def _call_in_session(self, function, *args, **kwargs):
+        auth = self._zabbix_api.auth
+        try:
+            return function(*args, **kwargs)
+        except ZabbixAPIException as e:
+            if not is_session_expired(e):
+                raise
+            self._relogin(auth)
+            return function(*args, **kwargs)
+
+    def call(self, object_name, method_name, *args, **kwargs):
+        def function(*args, **kwargs):
+            api_method = getattr(getattr(self._zabbix_api, object_name), method_name)
+            return api_method(*args, **kwargs)
+        return self._call(object_name + '.' + method_name, function, *args, **kwargs)
+
+    def confimport(self, confformat='', source='', rules=''):
+        return self._call('configuration.import', self._zabbix_api.confimport, confformat=confformat, source=source, rules=rules)
@@ -2,6 +2,8 @@
 
 import logging
 import lookup
+import batch
+from reconcile import reconcile
 
 def export_discovery_rules(zabbix_api):
     rules = zabbix_api.drule.get(output='extend', selectDChecks='extend')
@@ -14,32 +16,43 @@ def export_discovery_rules(zabbix_api):
         ]
     )
 
-def import_discovery_rules(zabbix_api, rules_to_import, overwrite=True, delete=False):
+def import_discovery_rules(zabbix_api, rules_to_import, overwrite=True, delete=False, manifest=None, chunk_size=batch.IMPORT_CHUNK_SIZE):
     log = logging.getLogger()
     existing_rules_list = zabbix_api.drule.get(output='extend')
     existing_rules_dict = { rule['name']: rule for rule in existing_rules_list }
+    rules_to_update = []
+    rules_to_create = []
 
     for rule in rules_to_import:
         name = rule['name']
         if name in existing_rules_dict:
-            if overwrite:
-                id = existing_rules_dict[name]['druleid']
-                log.info('Update discovery rule "{}"'.format(name.encode('utf-8')))
-                zabbix_api.drule.update(druleid=id, **rule)
-                log.info('Discovery rule updated')
+            if not overwrite:
+                continue
+            if manifest is not None and manifest.is_unchanged('discovery_rules', name, rule):
+                log.debug('Skip unchanged discovery rule "{}"'.format(name.encode('utf-8')))
+                continue
+            log.info('Update discovery rule "{}"'.format(name.encode('utf-8')))
+            rules_to_update.append(dict(rule, druleid=existing_rules_dict[name]['druleid']))
         else:
             log.info('Create discovery rule "{}"'.format(name.encode('utf-8')))
-            zabbix_api.drule.create(**rule)
-            log.info('Discovery rule created')
+            rules_to_create.append(rule)
+
+    def record(rules):
+        if manifest is not None:
+            for rule in rules:
+                rule = { key: rule[key] for key in rule if key != 'druleid' }
+                manifest.record('discovery_rules', rule['name'], rule)
+
+    if len(rules_to_update) > 0:
+        batch.call_in_chunks(zabbix_api.drule.update, rules_to_update, chunk_size, record)
+        log.info('Discovery rules updated')
+    if len(rules_to_create) > 0:
+        batch.call_in_chunks(zabbix_api.drule.create, rules_to_create, chunk_size, record)
+        log.info('Discovery rules created')
 
     if delete:
         rule_names_to_import = [ rule['name'] for rule in rules_to_import ]
-        rules_to_delete = {
-            rule['druleid']: rule['name']
-                for rule in existing_rules_list
-                    if rule['name'] not in rule_names_to_import
-        }
-        if len(rules_to_delete) > 0:
-            log.info('Delete discovery rules: ' + unicode(rules_to_delete.values()).encode('utf-8'))
-            zabbix_api.drule.delete(*rules_to_delete.keys())
-            log.info('Discovery rules deleted')
+        reconcile(zabbix_api, 'discovery_rules', rule_names_to_import, existing_objects=existing_rules_list)
+
+        if manifest is not None:
+            manifest.prune('discovery_rules', rule_names_to_import)
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+
+import json, shutil, tempfile
+
+class JsonExportWriter:
+    ''' Write exported configurations to a file as one JSON object.
+        Objects of every section are serialized as soon as they are written and spooled
+        to a temporary file, so only one object at a time is kept in memory.
+    '''
+
+    def __init__(self, file, indent=None):
+        self._file = file
+        self._indent = indent
+        self._separators = (',', ': ') if indent else (',', ':')
+        self._sections = []
+        self._spools = {}
+        self._values = {}
+
+    def _dumps(self, object, level):
+        text = json.dumps(object, indent=self._indent, separators=self._separators)
+        if self._indent:
+            text = text.replace('\n', '\n' + ' ' * self._indent * level)
+        return text
+
+    def _newline(self, level):
+        if self._indent:
+            return '\n' + ' ' * self._indent * level
+        return ''
+
+    def write(self, section, objects):
+        ''' Write a list of section objects or a value of scalar section. '''
+        if section not in self._sections:
+            self._sections.append(section)
+
+        if not isinstance(objects, list):
+            self._values[section] = objects
+            return
+
+        spool = self._spools.get(section)
+        if spool is None:
+            spool = self._spools[section] = tempfile.TemporaryFile()
+
+        # Previous writes of the section may be empty lists
+        separator = ',' if spool.tell() != 0 else ''
+
+        for object in objects:
+            spool.write(separator + self._newline(2) + self._dumps(object, 2))
+            separator = ','
+
+    def close(self):
+        self._file.write('{')
+        separator = ''
+
+        for section in self._sections:
+            self._file.write(separator + self._newline(1) + json.dumps(section) + self._separators[1])
+            separator = ','
+
+            if section in self._values:
+                self._file.write(self._dumps(self._values[section], 1))
+                continue
+
+            spool = self._spools[section]
+            empty = spool.tell() == 0
+            spool.seek(0)
+            self._file.write('[')
+            shutil.copyfileobj(spool, self._file)
+            self._file.write(']' if empty else self._newline(1) + ']')
+            spool.close()
+
+        self._file.write(self._newline(0) + '}\n')
+        self._spools = {}
+
+class NdjsonExportWriter:
+    ''' Write exported configurations to a file as newline-delimited JSON:
+        one {"section": ..., "object": ...} line per object (or per value of scalar section).
+    '''
+
+    def __init__(self, file):
+        self._file = file
+
+    def write(self, section, objects):
+        if not isinstance(objects, list):
+            objects = [objects]
+
+        for object in objects:
+            self._file.write(json.dumps({'section': section, 'object': object}, separators=(',', ':')) + '\n')
+
+        self._file.flush()
+
+    def close(self):
+        pass
@@ -6,7 +6,16 @@ from discovery_rules import export_discovery_rules
 from discovery_rules import import_discovery_rules
 from actions import export_actions
 from actions import import_actions
-import logging, json
+from multiprocessing.pool import ThreadPool
+from collections import deque
+import batch
+import lookup
+from manifest import get_object_hash
+from reconcile import reconcile
+from reconcile import plan_reconcile
+from reconcile import ReconcilePlan
+from reconcile import RECONCILE_OBJECTS
+import logging, json, re
 
 EXPORT_KEYS = [
     'templates',
@@ -18,30 +27,150 @@ EXPORT_KEYS = [
     'groups',
 ]
 
-def export_configs(zabbix_api, auto_created=False):
-    template_ids = zabbix_api.template.get(output=['templateid'], preservekeys=True).keys()
-    host_ids = zabbix_api.host.get(output=['hostid'], preservekeys=True).keys()
-    value_map_ids = zabbix_api.valuemap.get(output=['valuemapid'], preservekeys=True).keys()
-    host_group_ids = zabbix_api.hostgroup.get(output=['groupid'], preservekeys=True).keys()
-    export_result = zabbix_api.configuration.export(
-        format='json',
-        options={
-            'templates': template_ids,
-            'hosts': host_ids,
-            'valueMaps': value_map_ids,
-            'groups': host_group_ids,
+# Sections which may contain the same objects in different chunks of configuration export
+# and keys to identify the objects (None means the whole object)
+MERGE_EXPORT_KEYS = {
+    'groups': 'name',
+    'value_maps': 'name',
+    'triggers': None,
+    'graphs': None,
+}
+
+# Sections deleted separately from "configuration.import"
+CONFIGURATION_SECTIONS = ['hosts', 'templates', 'value_maps', 'groups']
+
+# Sections compared by diff import: name key, lookup object type and "configuration.export" option of the objects
+DIFF_IMPORT_KEYS = {
+    'templates':    ('template', lookup.TEMPLATE, 'templates'),
+    'hosts':        ('host', lookup.HOST, 'hosts'),
+    'value_maps':   ('name', lookup.VALUE_MAP, 'valueMaps'),
+}
+DIFF_IMPORT_SECTIONS = ['groups', 'value_maps', 'templates', 'hosts', 'triggers', 'graphs']
+
+# Names of objects in import manifest (other sections are identified by hash)
+MANIFEST_NAME_KEYS = {
+    'groups':       'name',
+    'value_maps':   'name',
+    'templates':    'template',
+    'hosts':        'host',
+}
+MANIFEST_OBJECT_TYPES = {
+    'groups':       lookup.HOST_GROUP,
+    'value_maps':   lookup.VALUE_MAP,
+    'templates':    lookup.TEMPLATE,
+    'hosts':        lookup.HOST,
+}
+
+EXPORT_WORKERS = 4
+EXPORT_CHUNK_SIZE = 1000
+
+def get_ids(zabbix_api, object_name, id_key):
+    return getattr(zabbix_api, object_name).get(output=[id_key], preservekeys=True).keys()
+
+def export_configuration_chunk(zabbix_api, options):
+    export_result = zabbix_api.configuration.export(format='json', options=options)
+    return json.loads(export_result)['zabbix_export']
+
+def iter_configuration_exports(zabbix_api, options, chunk_size=EXPORT_CHUNK_SIZE, pool=None, prefetch=EXPORT_WORKERS):
+    ''' Export configuration in chunks of at most chunk_size IDs, yield "zabbix_export" section of every chunk in order.
+        If pool is specified, up to prefetch chunks are exported concurrently.
+    '''
+    ids = [ (key, id) for key in sorted(options) for id in options[key] ]
+    chunks_options = []
+    for ids_chunk in batch.chunks(ids, chunk_size):
+        chunk_options = { key: [] for key in options }
+        for key, id in ids_chunk:
+            chunk_options[key].append(id)
+        chunks_options.append(chunk_options)
+
+    if pool is None:
+        for chunk_options in chunks_options:
+            yield export_configuration_chunk(zabbix_api, chunk_options)
+    else:
+        # Limit number of exported chunks kept in memory
+        chunk_results = deque()
+        for chunk_options in chunks_options:
+            if len(chunk_results) >= max(1, prefetch):
+                yield chunk_results.popleft().get()
+            chunk_results.append( pool.apply_async(export_configuration_chunk, (zabbix_api, chunk_options)) )
+        while chunk_results:
+            yield chunk_results.popleft().get()
+
+def iter_merged_sections(exports):
+    ''' Yield (section, objects) pairs for sections of chunked configuration export
+        skipping objects duplicated in different chunks (scalar sections are yielded once as (section, value)).
+    '''
+    merged_objects = { key: set() for key in MERGE_EXPORT_KEYS }
+    merged_scalars = set()
+
+    for export in exports:
+        for key in EXPORT_KEYS:
+            if key not in export:
+                continue
+
+            if not isinstance(export[key], list):
+                if key not in merged_scalars:
+                    merged_scalars.add(key)
+                    yield key, export[key]
+                continue
+
+            if key not in MERGE_EXPORT_KEYS:
+                yield key, export[key]
+                continue
+
+            objects = []
+            for object in export[key]:
+                if MERGE_EXPORT_KEYS[key] is None:
+                    object_key = get_object_hash(object)
+                else:
+                    object_key = object[ MERGE_EXPORT_KEYS[key] ]
+                if object_key not in merged_objects[key]:
+                    merged_objects[key].add(object_key)
+                    objects.append(object)
+            yield key, objects
+
+def iter_export_configs(zabbix_api, auto_created=False, workers=EXPORT_WORKERS, chunk_size=EXPORT_CHUNK_SIZE, concurrent_chunks=False):
+    ''' Export configurations running independent API calls concurrently.
+        Yield (section, objects) pairs as soon as they are exported: objects is a list of the section objects
+        (the same section may be yielded several times) or a value of scalar section (e.g. "version").
+        :param workers:             (int) maximum number of concurrent API calls
+        :param chunk_size:          (int) maximum number of object IDs passed to one "configuration.export" call
+        :param concurrent_chunks:   (bool) export chunks concurrently
+    '''
+    pool = ThreadPool(max(1, workers))
+    try:
+        template_ids = pool.apply_async(get_ids, (zabbix_api, 'template', 'templateid'))
+        host_ids = pool.apply_async(get_ids, (zabbix_api, 'host', 'hostid'))
+        value_map_ids = pool.apply_async(get_ids, (zabbix_api, 'valuemap', 'valuemapid'))
+        host_group_ids = pool.apply_async(get_ids, (zabbix_api, 'hostgroup', 'groupid'))
+        macros = pool.apply_async(export_macros, (zabbix_api,))
+        discovery_rules = pool.apply_async(export_discovery_rules, (zabbix_api,))
+        actions = pool.apply_async(export_actions, (zabbix_api,))
+
+        options = {
+            'templates': template_ids.get(),
+            'hosts': host_ids.get(),
+            'valueMaps': value_map_ids.get(),
+            'groups': host_group_ids.get(),
         }
-    )
-    export_result = json.loads(export_result)
-    export_result = export_result['zabbix_export']
-    export_result = {
-        key: export_result[key]
-            for key in EXPORT_KEYS
-                if key in export_result
-    }
-    export_result['macros'] = export_macros(zabbix_api)
-    export_result['discovery_rules'] = export_discovery_rules(zabbix_api)
-    export_result['actions'] = export_actions(zabbix_api)
+        exports = iter_configuration_exports(zabbix_api, options, chunk_size, pool if concurrent_chunks else None, workers)
+        for section in iter_merged_sections(exports):
+            yield section
+
+        yield 'macros', macros.get()
+        yield 'discovery_rules', discovery_rules.get()
+        yield 'actions', actions.get()
+    finally:
+        pool.terminate()
+
+def export_configs(zabbix_api, auto_created=False, workers=EXPORT_WORKERS, chunk_size=EXPORT_CHUNK_SIZE, concurrent_chunks=False):
+    ''' Return a dictionary with all exported configurations (see iter_export_configs). '''
+    export_result = {}
+    for key, objects in iter_export_configs(zabbix_api, auto_created, workers, chunk_size, concurrent_chunks):
+        if isinstance(objects, list):
+            export_result.setdefault(key, []).extend(objects)
+        else:
+            export_result[key] = objects
     return export_result
 
 def import_rule(create=None, update=None, delete=None):
@@ -51,88 +180,156 @@ def import_rule(create=None, update=None, delete=None):
     if delete is not None: import_rule['deleteMissing'] = delete
     return import_rule
 
-def delete_missing_hosts(zabbix_api, hosts_to_import):
-    log = logging.getLogger()
-    host_names_to_import = [ host['host'] for host in hosts_to_import ]
-    existing_hosts = zabbix_api.host.get(output=['host', 'hostid'])
-    hosts_to_delete = {
-        host['hostid']: host['host']
-            for host in existing_hosts
-                if host['host'] not in host_names_to_import
-    }
-    if len(hosts_to_delete) > 0:
-        log.info('Delete hosts: ' + unicode(hosts_to_delete.values()).encode('utf-8'))
-        zabbix_api.host.delete(*hosts_to_delete.keys())
-        log.info('Hosts deleted')
+def get_referenced_hosts(section, object):
+    ''' Return names of hosts and templates referenced by a trigger or a graph of configuration export. '''
+    if section == 'triggers':
+        expression = object.get('expression', '') + object.get('recovery_expression', '')
+        return set(re.findall(r'\{([^{}:]+):', expression))
+    else:
+        return set( graph_item['item']['host'] for graph_item in object.get('graph_items', []) )
 
-def delete_missing_templates(zabbix_api, templates_to_import):
-    log = logging.getLogger()
-    template_names_to_import = [ template['template'] for template in templates_to_import ]
-    existing_templates = zabbix_api.template.get(output=['host', 'templateid'])
-    templates_to_delete = {
-        template['templateid']: template['host']
-            for template in existing_templates
-                if template['host'] not in template_names_to_import
-    }
-    if len(templates_to_delete) > 0:
-        log.info('Delete templates: ' + unicode(templates_to_delete.values()).encode('utf-8'))
-        zabbix_api.template.delete(*templates_to_delete.keys())
-        log.info('Templates deleted')
+def filter_import_source(import_source, is_unchanged):
+    ''' Remove unchanged objects from import source (dictionary of configuration sections).
+        is_unchanged(section, object) is called for objects of groups, value maps, templates, hosts, triggers and graphs.
+        Triggers and graphs are kept if they reference an imported host or template:
+        otherwise they would be deleted as missing from the imported one.
+        Return a dictionary with numbers of skipped objects by section.
+    '''
+    skipped = {}
+    imported_hosts = set()
+    for section in DIFF_IMPORT_SECTIONS:
+        if section not in import_source:
+            continue
 
-def delete_missing_value_maps(zabbix_api, value_maps_to_import):
-    log = logging.getLogger()
-    value_map_names_to_import = [ value_map['name'] for value_map in value_maps_to_import ]
-    existing_value_maps = zabbix_api.valuemap.get(output=['valuemapid', 'name'])
-    value_maps_to_delete = {
-        value_map['valuemapid']: value_map['name']
-            for value_map in existing_value_maps
-                if value_map['name'] not in value_map_names_to_import
-    }
-    if len(value_maps_to_delete) > 0:
-        log.info('Delete value maps: ' + unicode(value_maps_to_delete.values()).encode('utf-8'))
-        zabbix_api.valuemap.delete(*value_maps_to_delete.keys())
-        log.info('Value maps deleted')
+        objects = []
+        for object in import_source[section]:
+            if not is_unchanged(section, object):
+                objects.append(object)
+            elif section in ['triggers', 'graphs'] and get_referenced_hosts(section, object) & imported_hosts:
+                objects.append(object)
 
-def delete_missing_host_groups(zabbix_api, groups_to_import):
-    log = logging.getLogger()
-    group_names_to_import = [ group['name'] for group in groups_to_import ]
-    existing_groups = zabbix_api.hostgroup.get(output=['name', 'internal', 'groupid'])
-    groups_to_delete = {
-        group['groupid']: group['name']
-            for group in existing_groups
-                if (
-                    group['name'] not in group_names_to_import and
-                    group['internal'] != '1'
-                )
-    }
-    if len(groups_to_delete) > 0:
-        log.info('Delete host groups: ' + unicode(groups_to_delete.values()).encode('utf-8'))
-        zabbix_api.hostgroup.delete(*groups_to_delete.keys())
-        log.info('Host groups deleted')
+        if section in ['templates', 'hosts']:
+            name_key = DIFF_IMPORT_KEYS[section][0]
+            imported_hosts.update( object[name_key] for object in objects )
+
+        skipped[section] = len(import_source[section]) - len(objects)
+        import_source[section] = objects
+
+    return skipped
+
+def diff_import_source(zabbix_api, import_source, chunk_size=EXPORT_CHUNK_SIZE):
+    ''' Remove objects equal to existing ones from import source, return numbers of skipped objects by section. '''
+    options = { 'templates': [], 'hosts': [], 'valueMaps': [], 'groups': [] }
+    for section in DIFF_IMPORT_KEYS:
+        name_key, object_type, option = DIFF_IMPORT_KEYS[section]
+        names = [ object[name_key] for object in import_source.get(section, []) ]
+        if len(names) != 0:
+            options[option] = lookup.get_object_ids(zabbix_api, names, object_type).values()
+
+    # Export current state of the affected objects only
+    existing_objects = { section: set() for section in DIFF_IMPORT_SECTIONS }
+    for export in iter_configuration_exports(zabbix_api, options, chunk_size):
+        for section in DIFF_IMPORT_SECTIONS:
+            existing_objects[section].update( get_object_hash(object) for object in export.get(section, []) )
+
+    return filter_import_source(import_source,
+        lambda section, object: get_object_hash(object) in existing_objects[section])
+
+def get_manifest_name(section, object):
+    ''' Return name of imported object in manifest: triggers and graphs have no unique names, so they are identified by hash. '''
+    if section in MANIFEST_NAME_KEYS:
+        return object[MANIFEST_NAME_KEYS[section]]
+    return get_object_hash(object)
+
+def manifest_import_source(zabbix_api, import_source, manifest):
+    ''' Remove existing objects imported last time with the same content, return numbers of skipped objects by section. '''
+    # Objects deleted from the server since the last import must be imported again
+    existing_names = {}
+    for section in MANIFEST_NAME_KEYS:
+        names = [ get_manifest_name(section, object) for object in import_source.get(section, []) ]
+        if len(names) != 0:
+            existing_names[section] = lookup.get_object_ids(zabbix_api, names, MANIFEST_OBJECT_TYPES[section])
+
+    def is_unchanged(section, object):
+        name = get_manifest_name(section, object)
+        if section in existing_names and name not in existing_names[section]:
+            return False
+        return manifest.is_unchanged(section, name, object)
 
-def import_configs(zabbix_api, config, overwrite=True, delete=False):
+    return filter_import_source(import_source, is_unchanged)
+
+def record_import_source(manifest, import_source, delete=False):
+    for section in DIFF_IMPORT_SECTIONS:
+        if section not in import_source:
+            continue
+        names = []
+        for object in import_source[section]:
+            name = get_manifest_name(section, object)
+            manifest.record(section, name, object)
+            names.append(name)
+        # Changed triggers and graphs get new names, so old ones are always forgotten
+        if delete or section not in MANIFEST_NAME_KEYS:
+            manifest.prune(section, names)
+
+def plan_import_configs(zabbix_api, config, delete=False):
+    ''' Return a dictionary {section: ReconcilePlan} of objects to be created, updated and deleted by import (dry run). '''
+    plans = {}
+    for section in RECONCILE_OBJECTS:
+        if section in config:
+            names = [ object[ RECONCILE_OBJECTS[section]['import_name'] ] for object in config[section] ]
+            plans[section] = plan_reconcile(zabbix_api, section, names, delete)
+    return plans
+
+def import_configs(zabbix_api, config, overwrite=True, delete=False, diff=False, manifest=None, chunk_size=batch.IMPORT_CHUNK_SIZE):
+    ''' Import configurations, return a dictionary with numbers of objects skipped as unchanged by section.
+        :param diff:        (bool) import only new and changed templates, hosts, value maps, triggers, graphs and groups
+        :param manifest:    (ImportManifest) skip objects imported last time with the same content and record imported ones
+        :param chunk_size:  (int) maximum number of macros, discovery rules or actions created or updated by one API call
+    '''
     log = logging.getLogger()
+    skipped = {}
     if 'macros' in config:
-        import_macros(zabbix_api, config['macros'], overwrite, delete)
+        import_macros(zabbix_api, config['macros'], overwrite, delete, manifest, chunk_size)
     if 'discovery_rules' in config:
-        import_discovery_rules(zabbix_api, config['discovery_rules'], overwrite, delete)
+        import_discovery_rules(zabbix_api, config['discovery_rules'], overwrite, delete, manifest, chunk_size)
 
     if delete:
         # Zabbix API method "configuration.import" cannot delete these objects:
-        if 'hosts' in config:
-            delete_missing_hosts(zabbix_api, config['hosts'])
-        if 'templates' in config:
-            delete_missing_templates(zabbix_api, config['templates'])
-        if 'value_maps' in config:
-            delete_missing_value_maps(zabbix_api, config['value_maps'])
-        if 'groups' in config:
-            delete_missing_host_groups(zabbix_api, config['groups'])
+        for section in CONFIGURATION_SECTIONS:
+            if section in config:
+                names = [ object[ RECONCILE_OBJECTS[section]['import_name'] ] for object in config[section] ]
+                reconcile(zabbix_api, section, names)
 
     import_source = {
         key: config[key]
             for key in EXPORT_KEYS
                 if key in config
     }
+    if manifest is not None:
+        skipped = manifest_import_source(zabbix_api, import_source, manifest)
+        log.info('Skip objects unchanged since the last import: ' + str(skipped))
+    if diff:
+        diff_skipped = diff_import_source(zabbix_api, import_source)
+        log.info('Skip unchanged objects: ' + str(diff_skipped))
+        for section in diff_skipped:
+            skipped[section] = skipped.get(section, 0) + diff_skipped[section]
+
+    if any( isinstance(objects, list) and len(objects) != 0 for objects in import_source.values() ):
+        import_objects(zabbix_api, import_source, overwrite, delete)
+    else:
+        log.info('No objects to import')
+
+    # Existing objects are not updated without overwrite, so their content is unknown
+    if manifest is not None and overwrite:
+        record_import_source(manifest, { key: config[key] for key in DIFF_IMPORT_SECTIONS if key in config }, delete)
+
+    if 'actions' in config:
+        import_actions(zabbix_api, config['actions'], overwrite, delete, manifest, chunk_size)
+
+    return skipped
+
+def import_objects(zabbix_api, import_source, overwrite=True, delete=False):
+    log = logging.getLogger()
     import_source = { 'zabbix_export': import_source }
     log.info('Import objects: ' + str(EXPORT_KEYS))
     zabbix_api.confimport(
@@ -154,5 +351,3 @@ def import_configs(zabbix_api, config, overwrite=True, delete=False):
         },
     )
     log.info('Objects imported')
-    if 'actions' in config:
-        import_actions(zabbix_api, config['actions'], overwrite, delete)
@@ -1,8 +1,11 @@
 # -*- coding: utf-8 -*-
 
 from unimonapi import UnimonError
+import batch
 
-HOST, HOST_GROUP, TEMPLATE, USER, USER_GROUP, SCRIPT, TRIGGER, DISCO_RULE = range(8)
+HOST, HOST_GROUP, TEMPLATE, USER, USER_GROUP, SCRIPT, TRIGGER, DISCO_RULE, VALUE_MAP = range(9)
+
+LOOKUP_CHUNK_SIZE = 1000
 
 API_OBJECT_KEYS = {
     HOST:        { 'name': 'host',          'visible_name': 'name',         'id': 'hostid',     'ids': 'hostids' },
@@ -13,13 +16,14 @@ API_OBJECT_KEYS = {
     SCRIPT:      { 'name': 'name',          'visible_name': 'name',         'id': 'scriptid',   'ids': 'scriptids' },
     TRIGGER:     { 'name': 'description',   'visible_name': 'description',  'id': 'triggerid',  'ids': 'triggerids' },
     DISCO_RULE:  { 'name': 'name',          'visible_name': 'name',         'id': 'druleid',    'ids': 'druleids' },
+    VALUE_MAP:   { 'name': 'name',          'visible_name': 'name',         'id': 'valuemapid', 'ids': 'valuemapids' },
 }
 
 def get_object_type_by_id_key(id_key):
     for object_type in API_OBJECT_KEYS:
         if API_OBJECT_KEYS[object_type]['id'] == id_key:
             return object_type
-    return UnimonError('Unsupported Zabbix API object ID key: ' + id_key)
+    raise UnimonError('Unsupported Zabbix API object ID key: ' + id_key)
 
 def get_api_method_by_type(zabbix_api, object_type):
     if object_type == HOST:          return zabbix_api.host.get
@@ -30,98 +34,178 @@ def get_api_method_by_type(zabbix_api, object_type):
     elif object_type == SCRIPT:      return zabbix_api.script.get
     elif object_type == TRIGGER:     return zabbix_api.trigger.get
     elif object_type == DISCO_RULE:  return zabbix_api.drule.get
+    elif object_type == VALUE_MAP:   return zabbix_api.valuemap.get
     else:
         raise UnimonError('Unsupported Zabbix API object type: ' + object_type)
 
-def get_object_name(zabbix_api, id, object_type, visible=False):
-    api_metod = get_api_method_by_type(zabbix_api, object_type)
-    ids_key = API_OBJECT_KEYS[object_type]['ids']
+def _get_name_key(object_type, visible=False):
     if visible:
-        name_key = API_OBJECT_KEYS[object_type]['visible_name']
+        return API_OBJECT_KEYS[object_type]['visible_name']
     else:
-        name_key = API_OBJECT_KEYS[object_type]['name']
+        return API_OBJECT_KEYS[object_type]['name']
+
+def get_object_name(zabbix_api, id, object_type, visible=False, cache=None):
+    if cache is not None:
+        cache_key = (object_type, id, visible, True)
+        name = cache.get(cache_key)
+        if name is not cache.MISSING: return name
+
+    api_metod = get_api_method_by_type(zabbix_api, object_type)
+    ids_key = API_OBJECT_KEYS[object_type]['ids']
+    name_key = _get_name_key(object_type, visible)
     kwargs = {
         ids_key:  [id],
         'output': [name_key],
     }
     objects = api_metod(**kwargs)
-    if len(objects) == 0: return None
-    return objects[0][name_key]
+    name = objects[0][name_key] if len(objects) != 0 else None
+
+    if cache is not None:
+        cache.put(cache_key, name)
+    return name
+
+def get_object_id(zabbix_api, name, object_type, visible=False, cache=None):
+    if cache is not None:
+        cache_key = (object_type, name, visible, False)
+        id = cache.get(cache_key)
+        if id is not cache.MISSING: return id
 
-def get_object_id(zabbix_api, name, object_type, visible=False):
     api_metod = get_api_method_by_type(zabbix_api, object_type)
     id_key = API_OBJECT_KEYS[object_type]['id']
-    if visible:
-        name_key = API_OBJECT_KEYS[object_type]['visible_name']
-    else:
-        name_key = API_OBJECT_KEYS[object_type]['name']
+    name_key = _get_name_key(object_type, visible)
     objects = api_metod(filter={name_key: name}, output=[id_key])
-    if len(objects) == 0: return None
-    return objects[0][id_key]
+    id = objects[0][id_key] if len(objects) != 0 else None
+
+    if cache is not None:
+        cache.put(cache_key, id)
+    return id
 
-def lookup_object(zabbix_api, object, object_type, by_id=True, visible=False):
+def invalidate_cache(cache, object_type=None):
+    ''' Remove cached lookups of the specified object type (all types by default). '''
+    if object_type is None:
+        cache.invalidate()
+    else:
+        cache.invalidate(lambda cache_key: cache_key[0] == object_type)
+
+def get_object_names(zabbix_api, ids, object_type, visible=False, chunk_size=LOOKUP_CHUNK_SIZE):
+    ''' Return a dictionary {id: name} of found objects using one API call per chunk of IDs. '''
+    api_metod = get_api_method_by_type(zabbix_api, object_type)
+    id_key = API_OBJECT_KEYS[object_type]['id']
+    ids_key = API_OBJECT_KEYS[object_type]['ids']
+    name_key = _get_name_key(object_type, visible)
+    names = {}
+    for ids_chunk in batch.chunks(set(ids), chunk_size):
+        kwargs = {
+            ids_key:  ids_chunk,
+            'output': [id_key, name_key],
+        }
+        for object in api_metod(**kwargs):
+            names.setdefault(object[id_key], object[name_key])
+    return names
+
+def get_object_ids(zabbix_api, names, object_type, visible=False, chunk_size=LOOKUP_CHUNK_SIZE):
+    ''' Return a dictionary {name: id} of found objects using one API call per chunk of names. '''
+    api_metod = get_api_method_by_type(zabbix_api, object_type)
+    id_key = API_OBJECT_KEYS[object_type]['id']
+    name_key = _get_name_key(object_type, visible)
+    ids = {}
+    for names_chunk in batch.chunks(set(names), chunk_size):
+        for object in api_metod(filter={name_key: names_chunk}, output=[id_key, name_key]):
+            ids.setdefault(object[name_key], object[id_key])
+    return ids
+
+def lookup_object(zabbix_api, object, object_type, by_id=True, visible=False, cache=None):
     if by_id:
-        return get_object_name(zabbix_api, object, object_type, visible)
+        return get_object_name(zabbix_api, object, object_type, visible, cache)
     else:
-        return get_object_id(zabbix_api, object, object_type, visible)
+        return get_object_id(zabbix_api, object, object_type, visible, cache)
 
-def prepare_object_for_import_export(zabbix_api, object, object_key=None, export=True, filter_keys=[], expand_keys=[], copy_keys={}, rename_keys={}, custom_keys={}):
+class ObjectReferences:
+    ''' References (IDs or names) collected from an object tree to be expanded in bulk. '''
+
+    def __init__(self):
+        self._references = {}
+
+    def add(self, container, key, object_type):
+        self._references.setdefault(object_type, []).append((container, key))
+
+    def expand(self, zabbix_api, by_id=True, visible=False):
+        ''' Replace every collected reference using one bulk lookup per object type. '''
+        for object_type, references in self._references.items():
+            objects = [ container[key] for container, key in references ]
+            if by_id:
+                expanded_objects = get_object_names(zabbix_api, objects, object_type, visible)
+            else:
+                expanded_objects = get_object_ids(zabbix_api, objects, object_type, visible)
+
+            for container, key in references:
+                object = container[key]
+                if object not in expanded_objects:
+                    raise UnimonError(u'Object "{}" not found: {}'.format(API_OBJECT_KEYS[object_type]['id'], object))
+                container[key] = expanded_objects[object]
+
+        self._references = {}
+
+def prepare_object_for_import_export(zabbix_api, object, object_key=None, export=True, filter_keys=[], expand_keys=[], typed_keys={}, copy_keys={}, rename_keys={}, custom_keys={}):
     ''' Prepare raw Zabbix API object for export or exported object for import by:
         - filtering read-only parameters,
         - expanding IDs to names (and vice versa),
         - copying and renaming needed parameters,
         - custom processing.
+        Expansion is done in two phases: all references are collected first
+        and then resolved with one bulk lookup per object type.
+        :param expand_keys:     (list) ID keys to be expanded, object type is defined by the key
+        :param typed_keys:      (dict) keys to be expanded, mapped to functions returning object type
+                                (or None to skip) by the dictionary containing the key
     '''
 
+    references = ObjectReferences()
+    holder = [object]
+    _prepare_value(zabbix_api, holder, 0, object_key, references,
+        export=export,
+        filter_keys=filter_keys,
+        expand_keys=expand_keys,
+        typed_keys=typed_keys,
+        copy_keys=copy_keys,
+        rename_keys=rename_keys,
+        custom_keys=custom_keys,
+    )
+    references.expand(zabbix_api, by_id=export)
+    return holder[0]
+
+def _prepare_value(zabbix_api, container, index, object_key, references, **options):
+    object = container[index]
+
     if isinstance(object, dict):
         for key in object.keys():
-            if key in copy_keys:
-                to_key = copy_keys[key]
+            if key in options['copy_keys']:
+                to_key = options['copy_keys'][key]
                 if to_key in object:
                     object[to_key] = object[key]
 
-            if key in rename_keys:
-                to_key = rename_keys[key]
+            if key in options['rename_keys']:
+                to_key = options['rename_keys'][key]
                 object[to_key] = object[key]
                 del object[key]
 
-            if key in custom_keys:
-                custom_prepare_function = custom_keys[key]
-                object[key] = custom_prepare_function(zabbix_api, object[key], export)
+            if key in options['custom_keys']:
+                custom_prepare_function = options['custom_keys'][key]
+                object[key] = custom_prepare_function(zabbix_api, object[key], options['export'])
 
         for key in object.keys():
-            if key in filter_keys:
+            if key in options['filter_keys']:
                 del object[key]
+            elif key in options['typed_keys'] and not isinstance(object[key], (dict, list)):
+                object_type = options['typed_keys'][key](object)
+                if object_type is not None:
+                    references.add(object, key, object_type)
             else:
-                object[key] = prepare_object_for_import_export(zabbix_api, object[key],
-                    export=export,
-                    object_key=key,
-                    filter_keys=filter_keys,
-                    expand_keys=expand_keys,
-                    copy_keys=copy_keys,
-                    rename_keys=rename_keys,
-                    custom_keys=custom_keys,
-                )
+                _prepare_value(zabbix_api, object, key, key, references, **options)
 
     elif isinstance(object, list):
         for i in range(len(object)):
-            object[i] = prepare_object_for_import_export(zabbix_api, object[i],
-                export=export,
-                object_key=object_key,
-                filter_keys=filter_keys,
-                expand_keys=expand_keys,
-                copy_keys=copy_keys,
-                rename_keys=rename_keys,
-                custom_keys=custom_keys,
-            )
-
-    elif object_key in expand_keys:
-        if object != '0':
-            object_type = get_object_type_by_id_key(object_key)
-            expanded_object = lookup_object(zabbix_api, object, object_type, by_id=export)
-            if expanded_object is not None:
-                object = expanded_object
-            else:
-                raise UnimonError(u'Object "{}" not found: {}'.format(object_key, object))
+            _prepare_value(zabbix_api, object, i, object_key, references, **options)
 
-    return object
+    elif object_key in options['expand_keys']:
+        if object != '0':
+            references.add(container, index, get_object_type_by_id_key(object_key))
@@ -2,6 +2,8 @@
 
 import logging
 import lookup
+import batch
+from reconcile import reconcile
 
 def export_macros(zabbix_api):
     macros = zabbix_api.usermacro.get(globalmacro=True, output='extend')
@@ -10,34 +12,49 @@ def export_macros(zabbix_api):
         filter_keys=['globalmacroid'],
     )
 
-def import_macros(zabbix_api, macros_to_import, overwrite=True, delete=False):
+def import_macros(zabbix_api, macros_to_import, overwrite=True, delete=False, manifest=None, chunk_size=batch.IMPORT_CHUNK_SIZE):
     log = logging.getLogger()
     existing_macros_list = zabbix_api.usermacro.get(globalmacro=True, output='extend')
     existing_macros_dict = { macro['macro']: macro for macro in existing_macros_list }
+    macros_to_update = []
+    macros_to_create = []
+    imported_macros = {}
+    updated_macro_names = {}
 
     for macro in macros_to_import:
         name = macro['macro']
         value = macro['value']
+        imported_macros[name] = macro
         if name in existing_macros_dict:
             # Update only if value is different
-            if overwrite and value != existing_macros_dict[name]['value']:
-                id = existing_macros_dict[name]['globalmacroid']
+            if value == existing_macros_dict[name]['value']:
+                if manifest is not None:
+                    manifest.record('macros', name, macro)
+            elif overwrite:
                 log.info('Update macro "{}"'.format(name.encode('utf-8')))
-                zabbix_api.usermacro.updateglobal(globalmacroid=id, value=value)
-                log.info('Macro updated')
+                id = existing_macros_dict[name]['globalmacroid']
+                macros_to_update.append({'globalmacroid': id, 'value': value})
+                updated_macro_names[id] = name
         else:
             log.info('Create macro "{}"'.format(name.encode('utf-8')))
-            zabbix_api.usermacro.createglobal(macro=name, value=value)
-            log.info('Macro created')
+            macros_to_create.append({'macro': name, 'value': value})
+
+    def record(macros):
+        if manifest is not None:
+            for macro in macros:
+                name = macro['macro'] if 'macro' in macro else updated_macro_names[ macro['globalmacroid'] ]
+                manifest.record('macros', name, imported_macros[name])
+
+    if len(macros_to_update) > 0:
+        batch.call_in_chunks(zabbix_api.usermacro.updateglobal, macros_to_update, chunk_size, record)
+        log.info('Macros updated')
+    if len(macros_to_create) > 0:
+        batch.call_in_chunks(zabbix_api.usermacro.createglobal, macros_to_create, chunk_size, record)
+        log.info('Macros created')
 
     if delete:
         macros_names_to_import = [ macro['macro'] for macro in macros_to_import ]
-        macros_to_delete = {
-            macro['globalmacroid']: macro['macro']
-                for macro in existing_macros_list
-                    if macro['macro'] not in macros_names_to_import
-        }
-        if len(macros_to_delete) > 0:
-            log.info('Delete macros: ' + unicode(macros_to_delete.values()).encode('utf-8'))
-            zabbix_api.usermacro.deleteglobal(*macros_to_delete.keys())
-            log.info('Macros deleted')
+        reconcile(zabbix_api, 'macros', macros_names_to_import, existing_objects=existing_macros_list)
+
+        if manifest is not None:
+            manifest.prune('macros', macros_names_to_import)
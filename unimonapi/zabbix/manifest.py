@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+
+import json, hashlib, os
+
+def get_object_hash(object):
+    ''' Return canonical content hash of configuration object. '''
+    return hashlib.sha1(json.dumps(object, sort_keys=True)).hexdigest()
+
+class ImportManifest:
+    ''' Local state file with content hashes of objects last imported successfully to every Zabbix server.
+        The file is a JSON object: {server URL: {section: {object name: hash}}}.
+        Objects are recorded by importers right after they are applied, so that the next import can skip them.
+    '''
+
+    def __init__(self, path, server_url):
+        """ Load manifest of the server from the file (missing file means empty manifest).
+            :param path:        (string) path to the manifest file
+            :param server_url:  (string) URL of Zabbix server
+        """
+        self.path = path
+        self.server_url = server_url
+        self._manifests = {}
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                self._manifests = json.load(f)
+        self._sections = self._manifests.setdefault(server_url, {})
+
+    def is_unchanged(self, section, name, object):
+        ''' Check that the object was imported with the same content last time. '''
+        return self._sections.get(section, {}).get(name) == get_object_hash(object)
+
+    def record(self, section, name, object):
+        self._sections.setdefault(section, {})[name] = get_object_hash(object)
+
+    def prune(self, section, names):
+        ''' Forget objects of the section which are not in names (e.g. deleted by import). '''
+        names = set(names)
+        objects = self._sections.get(section, {})
+        for name in [ name for name in objects if name not in names ]:
+            del objects[name]
+
+    def clear(self):
+        ''' Forget all objects imported to the server. '''
+        self._sections.clear()
+
+    def save(self):
+        # Replace the file atomically not to lose the manifest if writing is interrupted
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump(self._manifests, f, sort_keys=True)
+        os.rename(temp_path, self.path)
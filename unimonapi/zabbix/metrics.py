@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+
+import bisect, logging, threading, time
+
+# Upper bounds of latency histogram buckets in seconds (the last bucket is unbounded)
+LATENCY_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60]
+
+# Transfers of API calls measured by every thread: a stack of [request bytes, response bytes]
+_measured_calls = threading.local()
+
+def record_transfer(request_bytes, response_bytes):
+    ''' Add bytes sent and received by a transport to the API call measured by the current thread (if any). '''
+    calls = getattr(_measured_calls, 'stack', None)
+    if calls:
+        calls[-1][0] += request_bytes
+        calls[-1][1] += response_bytes
+
+def _escape_label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_bound(bound):
+    return repr(float(bound))
+
+class APIMetrics:
+    ''' Metrics of Zabbix API calls by JSON-RPC method (e.g. "host.get"): numbers of calls and errors,
+        latency histogram and request/response bytes (payload passed to and from the transport).
+        An instance is passed to ZabbixAPI and shared by all its threads.
+    '''
+
+    def __init__(self, callback=None, buckets=LATENCY_BUCKETS):
+        """ Initialize metrics object.
+            :param callback:    (function) called after every API call with method, latency (seconds),
+                                request bytes, response bytes and error flag, e.g. to feed an external metrics system
+            :param buckets:     (list of float) upper bounds of latency histogram buckets in seconds
+        """
+        self._callback = callback
+        self._buckets = sorted(buckets)
+        self._methods = {}
+        self._lock = threading.Lock()
+        self._log = logging.getLogger()
+
+    def measure(self, method, function, *args, **kwargs):
+        ''' Call function making API call of the method and record its metrics. '''
+        calls = getattr(_measured_calls, 'stack', None)
+        if calls is None:
+            calls = _measured_calls.stack = []
+
+        transfer = [0, 0]
+        calls.append(transfer)
+        error = False
+        start = time.time()
+        try:
+            return function(*args, **kwargs)
+        except Exception:
+            error = True
+            raise
+        finally:
+            latency = time.time() - start
+            calls.pop()
+            self.record(method, latency, transfer[0], transfer[1], error)
+
+    def record(self, method, latency, request_bytes=0, response_bytes=0, error=False):
+        with self._lock:
+            metrics = self._methods.get(method)
+            if metrics is None:
+                metrics = self._methods[method] = {
+                    'calls': 0,
+                    'errors': 0,
+                    'latency_sum': 0.0,
+                    'latency_counts': [0] * (len(self._buckets) + 1),
+                    'request_bytes': 0,
+                    'response_bytes': 0,
+                }
+            metrics['calls'] += 1
+            metrics['errors'] += 1 if error else 0
+            metrics['latency_sum'] += latency
+            metrics['latency_counts'][ bisect.bisect_left(self._buckets, latency) ] += 1
+            metrics['request_bytes'] += request_bytes
+            metrics['response_bytes'] += response_bytes
+
+        if self._callback is not None:
+            try:
+                self._callback(method, latency, request_bytes, response_bytes, error)
+            except Exception:
+                self._log.exception('API metrics callback failed')
+
+    def get(self):
+        ''' Return a dictionary {method: metrics} with numbers of calls and errors, latency sum, request and response bytes
+            and latency histogram: a list of (upper bound, cumulative number of calls) pairs ending with (None, calls).
+        '''
+        with self._lock:
+            snapshot = {}
+            for method, metrics in self._methods.items():
+                method_snapshot = dict(metrics)
+                del method_snapshot['latency_counts']
+                histogram = []
+                count = 0
+                for bound, bucket_count in zip(self._buckets + [None], metrics['latency_counts']):
+                    count += bucket_count
+                    histogram.append( (bound, count) )
+                method_snapshot['latency_histogram'] = histogram
+                snapshot[method] = method_snapshot
+            return snapshot
+
+    def reset(self):
+        with self._lock:
+            self._methods.clear()
+
+    def format_prometheus(self, prefix='zabbix_api'):
+        ''' Return metrics in Prometheus text exposition format. '''
+        snapshot = self.get()
+        methods = sorted(snapshot)
+        lines = []
+
+        for name, key, help in [
+            ('calls_total',             'calls',            'Number of Zabbix API calls.'),
+            ('errors_total',            'errors',           'Number of failed Zabbix API calls.'),
+            ('request_bytes_total',     'request_bytes',    'Bytes of Zabbix API requests.'),
+            ('response_bytes_total',    'response_bytes',   'Bytes of Zabbix API responses.'),
+        ]:
+            lines.append('# HELP {}_{} {}'.format(prefix, name, help))
+            lines.append('# TYPE {}_{} counter'.format(prefix, name))
+            for method in methods:
+                lines.append('{}_{}{{method="{}"}} {}'.format(prefix, name, _escape_label(method), snapshot[method][key]))
+
+        lines.append('# HELP {}_call_duration_seconds Latency of Zabbix API calls.'.format(prefix))
+        lines.append('# TYPE {}_call_duration_seconds histogram'.format(prefix))
+        for method in methods:
+            label = _escape_label(method)
+            for bound, count in snapshot[method]['latency_histogram']:
+                le = _format_bound(bound) if bound is not None else '+Inf'
+                lines.append('{}_call_duration_seconds_bucket{{method="{}",le="{}"}} {}'.format(prefix, label, le, count))
+            lines.append('{}_call_duration_seconds_sum{{method="{}"}} {}'.format(prefix, label, repr(snapshot[method]['latency_sum'])))
+            lines.append('{}_call_duration_seconds_count{{method="{}"}} {}'.format(prefix, label, snapshot[method]['calls']))
+
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+
+import logging
+import batch
+
+# Configuration sections reconciled by name: API object, name and ID keys, delete method, get parameters
+# and name key of imported objects
+RECONCILE_OBJECTS = {
+    'hosts':            { 'object': 'host',         'name': 'host',     'id': 'hostid',         'delete': 'delete',
+                          'import_name': 'host' },
+    'templates':        { 'object': 'template',     'name': 'host',     'id': 'templateid',     'delete': 'delete',
+                          'import_name': 'template' },
+    'value_maps':       { 'object': 'valuemap',     'name': 'name',     'id': 'valuemapid',     'delete': 'delete',
+                          'import_name': 'name' },
+    'groups':           { 'object': 'hostgroup',    'name': 'name',     'id': 'groupid',        'delete': 'delete',
+                          'import_name': 'name', 'output': ['internal'] },
+    'macros':           { 'object': 'usermacro',    'name': 'macro',    'id': 'globalmacroid',  'delete': 'deleteglobal',
+                          'import_name': 'macro', 'params': {'globalmacro': True} },
+    'discovery_rules':  { 'object': 'drule',        'name': 'name',     'id': 'druleid',        'delete': 'delete',
+                          'import_name': 'name' },
+    'actions':          { 'object': 'action',       'name': 'name',     'id': 'actionid',       'delete': 'delete',
+                          'import_name': 'name' },
+}
+
+# Maximum number of objects deleted by one API call
+DELETE_CHUNK_SIZE = 500
+
+class ReconcilePlan:
+    ''' Changes required to turn existing objects of one type into the desired ones:
+        creates - names of missing objects, updates - {name: ID} of existing objects, deletes - {ID: name} of extra objects.
+    '''
+
+    def __init__(self, object_type, creates=None, updates=None, deletes=None):
+        self.object_type = object_type
+        self.creates = creates if creates is not None else []
+        self.updates = updates if updates is not None else {}
+        self.deletes = deletes if deletes is not None else {}
+
+    def __repr__(self):
+        return 'ReconcilePlan({}: create {}, update {}, delete {})'.format(
+            self.object_type, len(self.creates), len(self.updates), len(self.deletes))
+
+    def is_empty(self):
+        return len(self.creates) == 0 and len(self.updates) == 0 and len(self.deletes) == 0
+
+def get_existing_objects(zabbix_api, object_type):
+    keys = RECONCILE_OBJECTS[object_type]
+    api_object = getattr(zabbix_api, keys['object'])
+    output = [ keys['id'], keys['name'] ] + keys.get('output', [])
+    return api_object.get(output=output, **keys.get('params', {}))
+
+def is_deletable(object_type, object):
+    # Internal host groups (e.g. "Discovered hosts") cannot be deleted
+    return not (object_type == 'groups' and object.get('internal') == '1')
+
+def plan_reconcile(zabbix_api, object_type, names, delete=True, existing_objects=None):
+    ''' Compare desired object names with existing objects (fetched if not specified), return ReconcilePlan. '''
+    keys = RECONCILE_OBJECTS[object_type]
+    if existing_objects is None:
+        existing_objects = get_existing_objects(zabbix_api, object_type)
+
+    names = set(names)
+    existing_ids = {}
+    plan = ReconcilePlan(object_type)
+    for object in existing_objects:
+        name = object[ keys['name'] ]
+        existing_ids.setdefault(name, object[ keys['id'] ])
+        if name in names:
+            plan.updates[name] = object[ keys['id'] ]
+        elif delete and is_deletable(object_type, object):
+            plan.deletes[ object[ keys['id'] ] ] = name
+
+    plan.creates = sorted( name for name in names if name not in existing_ids )
+    return plan
+
+def delete_objects(zabbix_api, plan, chunk_size=DELETE_CHUNK_SIZE):
+    ''' Delete objects of the plan in chunks of at most chunk_size IDs. '''
+    log = logging.getLogger()
+    if len(plan.deletes) == 0:
+        return
+
+    keys = RECONCILE_OBJECTS[plan.object_type]
+    api_method = getattr(getattr(zabbix_api, keys['object']), keys['delete'])
+    log.info('Delete {}: {}'.format(plan.object_type, unicode(plan.deletes.values()).encode('utf-8')))
+    batch.call_in_chunks(api_method, sorted(plan.deletes), chunk_size)
+    log.info('Deleted {}: {}'.format(plan.object_type, len(plan.deletes)))
+
+def reconcile(zabbix_api, object_type, names, delete=True, dry_run=False, chunk_size=DELETE_CHUNK_SIZE, existing_objects=None):
+    ''' Plan reconciliation of objects of the type (configuration section name, e.g. "hosts") with the desired names
+        and delete extra objects unless dry_run is set. Return ReconcilePlan.
+    '''
+    plan = plan_reconcile(zabbix_api, object_type, names, delete, existing_objects)
+    if not dry_run:
+        delete_objects(zabbix_api, plan, chunk_size)
+    return plan
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+
+from requests.adapters import HTTPAdapter
+from metrics import record_transfer
+import requests, json, threading, Queue
+
+class HttpTransport:
+    ''' Pooled HTTP transport for Zabbix JSON-RPC requests.
+        An instance is passed to pyzabbix as a session, so it provides "headers" and "post" like requests.Session.
+        Every call checks out its own session (with a kept-alive connection) from the pool, so the transport is thread-safe.
+    '''
+
+    def __init__(self, pool_size=10, connect_timeout=10, read_timeout=300, compression=True, verify=True, max_retries=0):
+        """ Initialize transport object.
+            :param pool_size:           (int) maximum number of sessions (and kept-alive connections) used at once
+            :param connect_timeout:     (float) connect timeout of every call in seconds
+            :param read_timeout:        (float) read timeout of every call in seconds
+            :param compression:         (bool) ask the server for gzip/deflate compressed responses
+            :param verify:              (bool or string) verify TLS certificate (or path to CA bundle)
+            :param max_retries:         (int) number of retries of failed connections
+        """
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.headers = {
+            'Connection': 'keep-alive',
+            'Accept-Encoding': 'gzip, deflate' if compression else 'identity',
+        }
+        self._pool_size = pool_size
+        self._verify = verify
+        self._max_retries = max_retries
+        self._sessions = Queue.LifoQueue()
+        self._sessions_created = 0
+        self._lock = threading.Lock()
+
+    def _create_session(self):
+        session = requests.Session()
+        session.verify = self._verify
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=1, max_retries=self._max_retries)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    def _checkout_session(self):
+        try:
+            return self._sessions.get_nowait()
+        except Queue.Empty:
+            pass
+
+        with self._lock:
+            if self._sessions_created < self._pool_size:
+                self._sessions_created += 1
+                return self._create_session()
+
+        # Wait for a session released by another thread
+        return self._sessions.get()
+
+    def post(self, url, data=None, timeout=None):
+        if timeout is None:
+            timeout = (self.connect_timeout, self.read_timeout)
+
+        session = self._checkout_session()
+        try:
+            response = session.post(url, data=data, headers=self.headers, timeout=timeout)
+        finally:
+            self._sessions.put(session)
+
+        # Response content is decompressed, so it is the size of JSON payload
+        record_transfer(len(data or ''), len(response.content))
+        return response
+
+    def close(self):
+        while True:
+            try:
+                self._sessions.get_nowait().close()
+            except Queue.Empty:
+                break
+
+class LocalResponse:
+    ''' Response of LocalTransport compatible with requests.Response used by pyzabbix '''
+
+    status_code = 200
+
+    def __init__(self, text):
+        self.text = text
+        self.content = text
+
+    def raise_for_status(self):
+        pass
+
+class LocalTransport:
+    ''' In-process transport passing JSON-RPC requests to a handler (e.g. a fake Zabbix server for tests).
+        The handler receives method name and parameters and returns the result,
+        any exception raised by the handler is returned as a JSON-RPC error.
+    '''
+
+    def __init__(self, handler):
+        self.headers = {}
+        self._handler = handler
+
+    def post(self, url, data=None, timeout=None):
+        request = json.loads(data)
+        response = {
+            'jsonrpc': '2.0',
+            'id': request.get('id'),
+        }
+
+        try:
+            response['result'] = self._handler(request['method'], request.get('params'))
+        except Exception as e:
+            response['error'] = {
+                'code': -32500,
+                'message': 'Application error.',
+                'data': unicode(e),
+            }
+
+        response = LocalResponse(json.dumps(response))
+        record_transfer(len(data or ''), len(response.content))
+        return response
+
+    def close(self):
+        pass
@@ -4,19 +4,35 @@ from unimonapi import UnimonError
 from unimonapi import WrongIpRange
 from unimonapi import MonitoringAPI
 from unimonapi import Event
+from unimonapi import EventBatch
 from unimonapi import HostGroup
+from unimonapi import Snapshot
 from import_export import export_configs
+from import_export import iter_export_configs
 from import_export import import_configs
+from import_export import plan_import_configs
+from import_export import EXPORT_WORKERS
+from import_export import EXPORT_CHUNK_SIZE
 import lookup
+import batch
+from cache import LRUCache
+from transport import HttpTransport
+from client import ZabbixClient
+from agents import AgentInstallation
+from agents import get_install_result_code
 from pyzabbix import ZabbixAPI as PyZabbixAPI
 from pyzabbix import ZabbixAPIException
-import logging, re, subprocess, threading
+import logging, re, subprocess, threading, os, signal, time
 
 class ZabbixAPI(MonitoringAPI):
 
     MAX_DISCOVERY_ADDRESS_NUMBER = 64000
     DEFAULT_ZABBIX_PORT = 10050
     INSTALL_AGENT_TIMEOUT_SEC = 300
+    INSTALL_AGENT_WORKERS = 10
+    PROBLEM_IDS_CHUNK_SIZE = 1000
+    HOSTS_CHUNK_SIZE = 100
+    PROBLEMS_PAGE_SIZE = 1000
     NOT_CLASSIFIED, INFO, WARNING, AVERAGE, HIGH, DISASTER = range(6)
 
     SUPPORTED_AGENT_OS = [
@@ -33,13 +49,25 @@ class ZabbixAPI(MonitoringAPI):
         DISASTER:        Event.CRITICAL,
     }
 
-    def __init__(self, url, user, password, agent_repository=None, agent_install_win=None, agent_install_lin=None, match_filter='DUMMY'):
+    def __init__(self, url, user, password, agent_repository=None, agent_install_win=None, agent_install_lin=None, match_filter='DUMMY',
+            lookup_cache_size=1024, lookup_cache_ttl=300, lookup_negative_ttl=30, trigger_cache_size=10000, trigger_cache_ttl=60,
+            transport=None, summary_resync_interval=300, metrics=None, problem_resync_interval=300):
         self._agent_repository = agent_repository
         self._agent_install_win = agent_install_win
         self._agent_install_lin = agent_install_lin
         self._match_filter = match_filter
-        self._zabbix_api = PyZabbixAPI(url)
-        self._zabbix_api.login(user, password)
+        self._lookup_cache = LRUCache(lookup_cache_size, lookup_cache_ttl, lookup_negative_ttl)
+        self._trigger_cache = LRUCache(trigger_cache_size, trigger_cache_ttl)
+        self._problem_states = {}
+        self._summary_states = {}
+        self._summary_resync_interval = summary_resync_interval
+        self._problem_resync_interval = problem_resync_interval
+        self._problem_states_lock = threading.Lock()
+        self._problem_state_locks = {}
+        self._transport = transport if transport is not None else HttpTransport()
+        self._metrics = metrics
+        self._zabbix_api = ZabbixClient(PyZabbixAPI(url, session=self._transport), user, password, metrics)
+        self._zabbix_api.login()
         self._log = logging.getLogger()
         self._log.info('Logged in to Zabbix API as ' + user)
 
@@ -89,7 +117,10 @@ class ZabbixAPI(MonitoringAPI):
 
         return zabbix_severities
 
-    def _get_problems(self, zabbix_severities, groups=None):
+    def _get_problems(self, zabbix_severities, groups=None, eventid_from=None, eventid_till=None, limit=None, exclude_summary=True):
+        ''' Request problems, summary problems are excluded by the cached list of non-summary host groups
+            unless exclude_summary is False (then they are skipped by callers).
+        '''
         kwargs = {
             'output':        ['eventid', 'objectid'],
             'severities':    zabbix_severities,
@@ -99,21 +130,38 @@ class ZabbixAPI(MonitoringAPI):
         }
         if groups:
             kwargs['groupids'] = groups
+        elif exclude_summary:
+            # Do not request summary problems: all their host groups are summary ones
+            non_summary_group_ids = self._get_non_summary_group_ids()
+            if non_summary_group_ids is not None:
+                if len(non_summary_group_ids) == 0:
+                    return []
+                kwargs['groupids'] = non_summary_group_ids
+        if eventid_from is not None:
+            kwargs['eventid_from'] = eventid_from
+        if eventid_till is not None:
+            kwargs['eventid_till'] = eventid_till
+        if limit:
+            kwargs['limit'] = limit
 
         return self._zabbix_api.problem.get(**kwargs)
 
     def _get_triggers_by_problems(self, problems):
-        trigger_ids = []
-        triggers = []
-
-        for problem in problems:
-            if problem['objectid'] not in trigger_ids:
-                trigger_ids.append( problem['objectid'] )
-
-        if len(trigger_ids) != 0:
-            triggers = self._zabbix_api.trigger.get(
+        trigger_ids = set( problem['objectid'] for problem in problems )
+        triggers = {}
+        trigger_ids_to_get = []
+
+        for trigger_id in trigger_ids:
+            trigger = self._trigger_cache.get(trigger_id)
+            if trigger is LRUCache.MISSING:
+                trigger_ids_to_get.append(trigger_id)
+            elif trigger is not None:
+                triggers[trigger_id] = trigger
+
+        if len(trigger_ids_to_get) != 0:
+            new_triggers = self._zabbix_api.trigger.get(
                 output = ['triggerid', 'description', 'priority'],
-                triggerids = trigger_ids,
+                triggerids = trigger_ids_to_get,
                 expandDescription = 1,
                 selectHosts = ['name', 'hostid'],
                 selectGroups = ['name', 'groupid'],
@@ -122,6 +170,13 @@ class ZabbixAPI(MonitoringAPI):
                 skipDependent = 1,
             )
 
+            for trigger_id in trigger_ids_to_get:
+                # Dependent or disabled triggers are not returned: cache them as not found too
+                trigger = new_triggers[trigger_id] if trigger_id in new_triggers else None
+                self._trigger_cache.put(trigger_id, trigger)
+                if trigger is not None:
+                    triggers[trigger_id] = trigger
+
         return triggers
 
     def _is_summary_trigger(self, trigger):
@@ -131,12 +186,64 @@ class ZabbixAPI(MonitoringAPI):
 
         return True
 
+    def _get_non_summary_group_ids(self):
+        ''' Return a list of IDs of host groups which are not summary ones (None if there are no summary groups). '''
+        cache_key = (lookup.HOST_GROUP, 'non_summary_ids')
+        group_ids = self._lookup_cache.get(cache_key)
+        if group_ids is LRUCache.MISSING:
+            host_groups = self._zabbix_api.hostgroup.get(output=['groupid', 'name'])
+            group_ids = [ host_group['groupid'] for host_group in host_groups if not self._is_summary_group(host_group) ]
+            if len(group_ids) == len(host_groups):
+                group_ids = None
+            self._lookup_cache.put(cache_key, group_ids)
+        return group_ids
+
     def _is_summary_group(self, host_group):
         if host_group['name'].find(self._match_filter) != -1:
             return True
         else:
             return False
 
+    def _get_problem_trigger(self, problem, triggers):
+        trigger_id = problem['objectid']
+
+        if trigger_id in triggers:
+            trigger = triggers[trigger_id]
+        else:
+            # This trigger is dependent on another or was disabled after the problem occurred
+            return None
+
+        if self._is_summary_trigger(trigger):
+            # Skip summary problems
+            return None
+
+        return trigger
+
+    def _get_event_fields(self, problem, trigger):
+        ''' Return a tuple of event severity, host, text and id of problem. '''
+        event_id = problem['eventid']
+        event_severity = self.ZABBIX_TO_UNIMON_SEVERITY[ int(trigger['priority']) ]
+        event_object = trigger['hosts'][0]['name']
+        event_text = trigger['description']
+
+        if len(problem['tags']) != 0:
+            event_text += ' [ '
+
+            for tag in problem['tags']:
+                event_text += tag['tag']
+
+                if len(tag['value']) != 0:
+                    event_text += ':' + tag['value']
+
+                event_text += ', '
+
+            event_text = event_text[:-2] + ' ]'
+
+        return event_severity, event_object, event_text, event_id
+
+    def _make_event(self, problem, trigger):
+        return Event.trusted(Event.PROBLEM, True, *self._get_event_fields(problem, trigger))
+
     def get_problems(self, severities=None, groups=None):
         if severities is None:
             severities = Event.SEVERITY_ICONS.keys()
@@ -147,88 +254,357 @@ class ZabbixAPI(MonitoringAPI):
         triggers = self._get_triggers_by_problems(problems)
 
         for problem in problems:
-            trigger_id = problem['objectid']
+            trigger = self._get_problem_trigger(problem, triggers)
+            if trigger is not None:
+                events.append( self._make_event(problem, trigger) )
 
-            if trigger_id in triggers:
-                trigger = triggers[trigger_id]
-            else:
-                # This trigger is dependent on another or was disabled after the problem occurred
-                continue
+        return events
 
-            if self._is_summary_trigger(trigger):
-                # Skip summary problems
-                continue
+    def iter_problems(self, severities=None, groups=None, page_size=PROBLEMS_PAGE_SIZE):
+        ''' Yield actual problems (Event objects) like get_problems, newest first.
+            Problems are requested by pages of page_size problems (using the last event ID as a cursor),
+            so only one page is kept in memory and the first events are yielded after the first page.
+        '''
+        if severities is None:
+            severities = Event.SEVERITY_ICONS.keys()
 
-            event_id = problem['eventid']
-            event_severity = self.ZABBIX_TO_UNIMON_SEVERITY[ int(trigger['priority']) ]
-            event_object = trigger['hosts'][0]['name']
-            event_text = trigger['description']
+        zabbix_severities = self._unimon_to_zabbix_severity(severities)
+        eventid_till = None
+        while True:
+            problems = self._get_problems(zabbix_severities, groups, eventid_till=eventid_till, limit=page_size)
+            triggers = self._get_triggers_by_problems(problems)
+
+            for problem in problems:
+                trigger = self._get_problem_trigger(problem, triggers)
+                if trigger is not None:
+                    yield self._make_event(problem, trigger)
+
+            if not page_size or len(problems) < page_size:
+                break
+            # Problems are sorted by event ID in descending order
+            eventid_till = int(problems[-1]['eventid']) - 1
+
+    def get_problem_batch(self, severities=None, groups=None):
+        ''' Return actual problems like get_problems, but as EventBatch without creating Event objects. '''
+        if severities is None:
+            severities = Event.SEVERITY_ICONS.keys()
 
-            if len(problem['tags']) != 0:
-                event_text += ' [ '
+        events = EventBatch()
+        zabbix_severities = self._unimon_to_zabbix_severity(severities)
+        problems = self._get_problems(zabbix_severities, groups)
+        triggers = self._get_triggers_by_problems(problems)
+        problem_triggers = ( (problem, self._get_problem_trigger(problem, triggers)) for problem in problems )
 
-                for tag in problem['tags']:
-                    event_text += tag['tag']
+        events.extend(Event.PROBLEM, True, (
+            self._get_event_fields(problem, trigger)
+                for problem, trigger in problem_triggers
+                    if trigger is not None
+        ))
+        return events
 
-                    if len(tag['value']) != 0:
-                        event_text += ':' + tag['value']
+    def _get_open_problem_ids(self, problem_ids):
+        open_problem_ids = set()
 
-                    event_text += ', '
+        # Only unresolved problems are returned by "problem.get"
+        for problem_ids_chunk in batch.chunks(problem_ids, self.PROBLEM_IDS_CHUNK_SIZE):
+            problems = self._zabbix_api.problem.get(output=['eventid'], eventids=problem_ids_chunk)
+            open_problem_ids.update( problem['eventid'] for problem in problems )
 
-                event_text = event_text[:-2] + ' ]'
+        return open_problem_ids
 
-            event = Event(Event.PROBLEM, True, event_severity, event_object, event_text, event_id)
-            events.append(event)
+    def _get_recovered_trigger_ids(self, state, groups=None):
+        ''' Return a tuple of set of IDs of triggers with recovery events after the recovery event watermark of the state
+            and the new watermark (the state is not changed, the first call only finds the watermark).
+        '''
+        kwargs = {
+            'output':       ['eventid', 'objectid'],
+            'source':       0,
+            'object':       0,
+            'value':        0,
+            'sortfield':    ['eventid'],
+            'sortorder':    'DESC',
+        }
+        if groups:
+            kwargs['groupids'] = groups
 
-        return events
+        if state['last_recovery_eventid'] is None:
+            kwargs['limit'] = 1
+            recovery_events = self._zabbix_api.event.get(**kwargs)
+            return set(), int(recovery_events[0]['eventid']) if len(recovery_events) != 0 else 0
+
+        kwargs['eventid_from'] = state['last_recovery_eventid'] + 1
+        recovery_events = self._zabbix_api.event.get(**kwargs)
+        if len(recovery_events) == 0:
+            return set(), state['last_recovery_eventid']
+        return set( event['objectid'] for event in recovery_events ), max( int(event['eventid']) for event in recovery_events )
+
+    def _get_resolved_problem_ids(self, state, groups=None, check_all=False):
+        ''' Return a tuple of list of IDs of problems tracked by the state (see _track_problem) resolved since
+            the recovery event watermark of the state and the new watermark (to be set by the caller).
+            Only problems of triggers recovered since then are checked, so the cost depends on the number of changes
+            rather than on the number of open problems. check_all checks all tracked problems
+            (e.g. to find problems closed without recovery events, like problems of deleted triggers).
+        '''
+        recovered_trigger_ids, last_recovery_eventid = self._get_recovered_trigger_ids(state, groups)
+        if check_all:
+            problem_ids = state['problem_triggers'].keys()
+        else:
+            problem_ids = [
+                problem_id
+                    for trigger_id in recovered_trigger_ids
+                        for problem_id in state['trigger_problems'].get(trigger_id, ())
+            ]
+
+        if len(problem_ids) == 0:
+            return [], last_recovery_eventid
+        open_problem_ids = self._get_open_problem_ids(problem_ids)
+        return [ problem_id for problem_id in problem_ids if problem_id not in open_problem_ids ], last_recovery_eventid
+
+    def _track_problem(self, state, problem):
+        state['problem_triggers'][ problem['eventid'] ] = problem['objectid']
+        state['trigger_problems'].setdefault(problem['objectid'], set()).add(problem['eventid'])
+
+    def _untrack_problem(self, state, problem_id):
+        trigger_id = state['problem_triggers'].pop(problem_id)
+        trigger_problems = state['trigger_problems'][trigger_id]
+        trigger_problems.discard(problem_id)
+        if len(trigger_problems) == 0:
+            del state['trigger_problems'][trigger_id]
+
+    def _get_problem_state_lock(self, lock_key):
+        ''' Return the lock of the problem update or incremental summary state (created on the first call).
+            The locks are kept by clear_cache: threads updating a state must not get different locks of it.
+        '''
+        with self._problem_states_lock:
+            lock = self._problem_state_locks.get(lock_key)
+            if lock is None:
+                lock = self._problem_state_locks[lock_key] = threading.Lock()
+            return lock
+
+    def get_problem_updates(self, severities=None, groups=None):
+        if severities is None:
+            severities = Event.SEVERITY_ICONS.keys()
+
+        zabbix_severities = self._unimon_to_zabbix_severity(severities)
+        state_key = (tuple(sorted(zabbix_severities)), tuple(sorted(groups)) if groups else None)
+
+        # Updates of the same state are serialized to keep it consistent, other states are updated concurrently
+        with self._get_problem_state_lock(('updates', state_key)):
+            state = self._problem_states.get(state_key)
+            if state is None:
+                state = self._problem_states[state_key] = {
+                    'last_eventid': None,
+                    'last_recovery_eventid': None,
+                    'events': {},
+                    'pending': {},
+                    'problem_triggers': {},
+                    'trigger_problems': {},
+                    'synced': time.time(),
+                }
+            return self._get_state_problem_updates(state, zabbix_severities, groups)
+
+    def _get_state_problem_updates(self, state, zabbix_severities, groups):
+        # All requests are made before the state is changed, so a failed call is retried by the next one without losing updates
+        now = time.time()
+
+        # Detect resolved problems by recovery events, check all known problems every problem_resync_interval
+        check_all = now - state['synced'] >= self._problem_resync_interval
+        resolved_problem_ids, last_recovery_eventid = self._get_resolved_problem_ids(state, groups, check_all)
+
+        # Fetch only problems occurred after the last seen one
+        if state['last_eventid'] is None:
+            problems = self._get_problems(zabbix_severities, groups, exclude_summary=False)
+        else:
+            # Summary problems are skipped here: the event watermark must not pass problems of host groups
+            # created after the cached list of non-summary groups, they would never be requested again
+            problems = self._get_problems(zabbix_severities, groups, eventid_from=state['last_eventid'] + 1, exclude_summary=False)
+        last_eventid = max( int(problem['eventid']) for problem in problems ) if len(problems) != 0 else state['last_eventid']
+
+        # Problems of triggers not found before (e.g. dependent ones) are retried until the triggers are found or problems resolved
+        resolved_problem_ids_set = set(resolved_problem_ids)
+        pending_problems = sorted(
+            ( problem for problem_id, problem in state['pending'].items() if problem_id not in resolved_problem_ids_set ),
+            key=lambda problem: int(problem['eventid']), reverse=True,
+        )
+        triggers = self._get_triggers_by_problems(problems + pending_problems)
+
+        found_problems = []
+        not_found_problems = []
+        for problem in problems + pending_problems:
+            trigger = triggers.get(problem['objectid'])
+            if trigger is None:
+                not_found_problems.append(problem)
+            elif self._is_summary_trigger(trigger):
+                # Skip summary problems
+                found_problems.append( (problem, None) )
+            else:
+                found_problems.append( (problem, self._make_event(problem, trigger)) )
+
+        # Apply the updates to the state
+        state['last_eventid'] = last_eventid
+        state['last_recovery_eventid'] = last_recovery_eventid
+        if check_all:
+            state['synced'] = now
+
+        resolved_events = []
+        for event_id in resolved_problem_ids:
+            self._untrack_problem(state, event_id)
+            state['pending'].pop(event_id, None)
+            event = state['events'].pop(event_id, None)
+            if event is not None:
+                resolved_events.append( Event.trusted(Event.RESOLUTION, event.detailed, event.severity, event.host, event.text, event.id) )
+
+        for problem in not_found_problems:
+            state['pending'][ problem['eventid'] ] = problem
+            self._track_problem(state, problem)
+
+        new_events = []
+        for problem, event in found_problems:
+            was_pending = state['pending'].pop(problem['eventid'], None) is not None
+            if event is not None:
+                state['events'][event.id] = event
+                self._track_problem(state, problem)
+                new_events.append(event)
+            elif was_pending:
+                self._untrack_problem(state, problem['eventid'])
+
+        return new_events, resolved_events
+
+    def _count_group_problem(self, object_groups, trigger):
+        ''' Count problem of the trigger in its host groups, return a tuple of list of group IDs and severity counted. '''
+        group_ids = []
+        severity = self.ZABBIX_TO_UNIMON_SEVERITY[ int(trigger['priority']) ]
+
+        for host_group in trigger['groups']:
+            if self._is_summary_group(host_group):
+                # Skip summary groups
+                continue
+
+            group_id = host_group['groupid']
+            group_name = host_group['name']
+
+            if group_id in object_groups:
+                # Get already created object
+                object_group = object_groups[group_id]
+            else:
+                # Create new object
+                object_group = HostGroup(group_name, group_id)
+                object_groups[group_id] = object_group
+
+            object_group.count_problem(severity)
+            group_ids.append(group_id)
+
+        return group_ids, severity
+
+    def get_summary(self, severities, incremental=False):
+        ''' Return a list of HostGroup objects with problems (see MonitoringAPI.get_summary).
+            :param incremental:     (bool) keep group counters between calls and update them only by problems
+                                    occurred and resolved since the previous call (fully rebuilt every summary_resync_interval)
+        '''
+        if incremental:
+            return self._get_incremental_summary(severities)
 
-    def get_summary(self, severities):
         object_groups = {}
         zabbix_severities = self._unimon_to_zabbix_severity(severities)
         problems = self._get_problems(zabbix_severities)
         triggers = self._get_triggers_by_problems(problems)
 
         for problem in problems:
-            trigger_id = problem['objectid']
+            trigger = self._get_problem_trigger(problem, triggers)
+            if trigger is not None:
+                self._count_group_problem(object_groups, trigger)
 
-            if trigger_id in triggers:
-                trigger = triggers[trigger_id]
-            else:
-                # This trigger is dependent on another or was disabled after the problem occurred
-                continue
+        return object_groups.values()
 
-            if self._is_summary_trigger(trigger):
-                # Skip summary problems
-                continue
+    def _get_incremental_summary(self, severities):
+        zabbix_severities = self._unimon_to_zabbix_severity(severities)
+        state_key = tuple(sorted(zabbix_severities))
+
+        with self._get_problem_state_lock(('summary', state_key)):
+            state = self._summary_states.get(state_key)
+            if state is None or time.time() - state['synced'] >= self._summary_resync_interval:
+                # Rebuild counters from scratch to correct drift (e.g. problems of changed triggers)
+                state = {
+                    'last_eventid': None,
+                    'last_recovery_eventid': None,
+                    'problems': {},
+                    'problem_triggers': {},
+                    'trigger_problems': {},
+                    'groups': {},
+                    'synced': time.time(),
+                }
+                self._summary_states[state_key] = state
+
+            self._update_summary_state(state, zabbix_severities)
+
+            # Return copies: the counters are updated by next calls
+            summary = []
+            for object_group in state['groups'].values():
+                if object_group.problems != 0:
+                    summary_group = HostGroup(object_group.name, object_group.id)
+                    summary_group.merge(object_group)
+                    summary.append(summary_group)
+            return summary
+
+    def _update_summary_state(self, state, zabbix_severities):
+        # All requests are made before the counters are changed (see _get_state_problem_updates)
+        counted_problems = state['problems']
+        object_groups = state['groups']
+
+        # Only problems of recovered triggers are checked (the state is rebuilt every summary_resync_interval)
+        resolved_problem_ids, last_recovery_eventid = self._get_resolved_problem_ids(state)
+
+        if state['last_eventid'] is None:
+            problems = self._get_problems(zabbix_severities, exclude_summary=False)
+        else:
+            # Summary problems are skipped by _get_problem_trigger (see _get_state_problem_updates)
+            problems = self._get_problems(zabbix_severities, eventid_from=state['last_eventid'] + 1, exclude_summary=False)
+        triggers = self._get_triggers_by_problems(problems)
 
-            for host_group in trigger['groups']:
-                if self._is_summary_group(host_group):
-                    # Skip summary groups
-                    continue
+        # Apply the updates to the state
+        state['last_recovery_eventid'] = last_recovery_eventid
+        for event_id in resolved_problem_ids:
+            self._untrack_problem(state, event_id)
+            group_ids, severity = counted_problems.pop(event_id)
+            for group_id in group_ids:
+                object_groups[group_id].uncount_problem(severity)
 
-                group_id = host_group['groupid']
-                group_name = host_group['name']
+        if len(problems) != 0:
+            state['last_eventid'] = max( int(problem['eventid']) for problem in problems )
 
-                if group_id in object_groups:
-                    # Get already created object
-                    object_group = object_groups[group_id]
-                else:
-                    # Create new object
-                    object_group = HostGroup(group_name, group_id)
-                    object_groups[group_id] = object_group
+            for problem in problems:
+                trigger = self._get_problem_trigger(problem, triggers)
+                if trigger is not None:
+                    counted_problems[ problem['eventid'] ] = self._count_group_problem(object_groups, trigger)
+                    self._track_problem(state, problem)
 
-                severity = self.ZABBIX_TO_UNIMON_SEVERITY[ int(trigger['priority']) ]
-                object_group.count_problem(severity)
+    def get_snapshot(self, severities=None, groups=None):
+        if severities is None:
+            severities = Event.SEVERITY_ICONS.keys()
 
-        return object_groups.values()
+        events = []
+        object_groups = {}
+        host_problems = {}
+        zabbix_severities = self._unimon_to_zabbix_severity(severities)
+        problems = self._get_problems(zabbix_severities, groups)
+        triggers = self._get_triggers_by_problems(problems)
+
+        for problem in problems:
+            trigger = self._get_problem_trigger(problem, triggers)
+            if trigger is None:
+                continue
+
+            event = self._make_event(problem, trigger)
+            events.append(event)
+            host_problems[event.host] = host_problems.get(event.host, 0) + 1
+            self._count_group_problem(object_groups, trigger)
+
+        return Snapshot(events, object_groups.values(), host_problems)
 
     def get_supported_agent_os(self):
         return self.SUPPORTED_AGENT_OS
 
-    def install_agent(self, os_type, hostname, user, password):
-        if not self._agent_repository:
-            raise UnimonError('Install agent repository is not specified')
-
+    def _get_install_agent_command(self, os_type, hostname, user, password):
         if os_type == 'Windows' and self._agent_install_win:
             cmd = [ self._agent_install_win ]
         elif os_type == 'Linux' and self._agent_install_lin:
@@ -236,13 +612,18 @@ class ZabbixAPI(MonitoringAPI):
         else:
             raise UnimonError('Usupported OS type "{0}"'.format(os_type))
 
-        cmd += [
+        return cmd + [
             self._agent_repository,
             hostname,
             user,
             password,
         ]
 
+    def install_agent(self, os_type, hostname, user, password):
+        if not self._agent_repository:
+            raise UnimonError('Install agent repository is not specified')
+
+        cmd = self._get_install_agent_command(os_type, hostname, user, password)
         process = subprocess.Popen(cmd, stdin = subprocess.PIPE, stdout = subprocess.PIPE, stderr = subprocess.PIPE)
         timer = threading.Timer(self.INSTALL_AGENT_TIMEOUT_SEC, process.kill)
 
@@ -261,11 +642,69 @@ class ZabbixAPI(MonitoringAPI):
 
         return process.returncode
 
-    def get_available_host_groups(self):
+    def _run_agent_installer(self, cmd, hostname, timeout):
+        ''' Run installer logging its output line by line, return exit code (None if killed by timeout). '''
+        # Run installer in its own process group to kill its child processes holding the output pipe too
+        preexec_fn = os.setsid if os.name == 'posix' else None
+        process = subprocess.Popen(cmd, stdin = subprocess.PIPE, stdout = subprocess.PIPE, stderr = subprocess.STDOUT, preexec_fn = preexec_fn)
+        process.stdin.close()
+        timed_out = threading.Event()
+
+        def kill():
+            timed_out.set()
+            try:
+                if preexec_fn:
+                    os.killpg(process.pid, signal.SIGKILL)
+                else:
+                    process.kill()
+            except OSError:
+                pass
+
+        timer = threading.Timer(timeout, kill)
+        try:
+            timer.start()
+            for line in iter(process.stdout.readline, ''):
+                self._log.info(u'{}: {}'.format(hostname, line.rstrip().decode('utf-8', 'replace')))
+            process.wait()
+        finally:
+            timer.cancel()
+
+        if timed_out.is_set():
+            self._log.error(u'{}: agent installation timed out'.format(hostname))
+            return None
+        return process.returncode
+
+    def install_agents(self, targets, max_workers=INSTALL_AGENT_WORKERS, timeout=INSTALL_AGENT_TIMEOUT_SEC):
+        if not self._agent_repository:
+            raise UnimonError('Install agent repository is not specified')
+
+        def install(target):
+            os_type, hostname, user, password = target
+            try:
+                cmd = self._get_install_agent_command(os_type, hostname, user, password)
+            except UnimonError as e:
+                self._log.error(u'{}: {}'.format(hostname, unicode(e)))
+                return self.UNSUPPORTED_OS
+
+            try:
+                returncode = self._run_agent_installer(cmd, hostname, timeout)
+            except Exception as e:
+                self._log.error(u'{}: cannot run agent installer: {}'.format(hostname, unicode(e)))
+                return self.UNKNOWN_ERROR
+
+            return get_install_result_code(returncode)
+
+        return AgentInstallation(install, targets, max_workers)
+
+    def _get_all_host_groups(self):
+        return self._zabbix_api.hostgroup.get(output=['groupid', 'name'], filter={'flags': 0})
+
+    def _get_template_host_groups(self):
+        return self._zabbix_api.hostgroup.get(output=['groupid'], templated_hosts=True)
+
+    def _filter_template_groups(self, all_groups, template_groups):
         host_groups = []
-        all_groups = self._zabbix_api.hostgroup.get(output=['groupid', 'name'], filter={'flags': 0})
-        template_groups = self._zabbix_api.hostgroup.get(output=['groupid'], templated_hosts=True)
-        template_groups = [ group['groupid'] for group in template_groups ]
+        template_groups = set( group['groupid'] for group in template_groups )
 
         # Filter out template groups
         for group in all_groups:
@@ -274,6 +713,9 @@ class ZabbixAPI(MonitoringAPI):
 
         return host_groups
 
+    def get_available_host_groups(self):
+        return self._filter_template_groups(self._get_all_host_groups(), self._get_template_host_groups())
+
     def add_host(self, name, groups):
         group_ids = []
         template_ids = []
@@ -294,6 +736,11 @@ class ZabbixAPI(MonitoringAPI):
             group_ids.append({ 'groupid': group_id })
             template_ids.append({ 'templateid': template_id })
 
+        result = self._zabbix_api.host.create(**self._get_host_params(name, group_ids, template_ids))
+        lookup.invalidate_cache(self._lookup_cache, lookup.HOST)
+        return result['hostids'][0]
+
+    def _get_host_params(self, name, group_ids, template_ids):
         # Check whether name is an IP address or hostname
         if re.search('^(\d{1,3}\.){3}\d{1,3}$', name):
             dns = ''
@@ -304,9 +751,9 @@ class ZabbixAPI(MonitoringAPI):
             ip = ''
             use_ip = 0
 
-        result = self._zabbix_api.host.create(
-            host = name,
-            interfaces = [{
+        return {
+            'host': name,
+            'interfaces': [{
                 'type': 1,
                 'main': 1,
                 'useip': use_ip,
@@ -314,28 +761,119 @@ class ZabbixAPI(MonitoringAPI):
                 'dns': dns,
                 'port': self.DEFAULT_ZABBIX_PORT,
             }],
-            groups = group_ids,
-            templates = template_ids,
-        )
-        return result['hostids'][0]
+            'groups': group_ids,
+            'templates': template_ids,
+        }
+
+    def add_hosts(self, hosts, chunk_size=HOSTS_CHUNK_SIZE):
+        groups = set( group for name, host_groups in hosts for group in host_groups )
+        group_ids = lookup.get_object_ids(self._zabbix_api, groups, lookup.HOST_GROUP)
+        templates = set( self._match_filter + ' ' + group for group in groups )
+        template_ids = lookup.get_object_ids(self._zabbix_api, templates, lookup.TEMPLATE, visible=False)
+        missing_templates = [ template for template in templates if template not in template_ids ]
+        if len(missing_templates) != 0:
+            # Try to find also by visible names
+            visible_template_ids = lookup.get_object_ids(self._zabbix_api, missing_templates, lookup.TEMPLATE, visible=True)
+            template_ids.update(visible_template_ids)
+
+        results = [None] * len(hosts)
+        hosts_to_create = []
+        for i, (name, host_groups) in enumerate(hosts):
+            try:
+                host_group_ids = []
+                host_template_ids = []
+                for group in host_groups:
+                    if group not in group_ids:
+                        raise UnimonError(u'Group "{}" is not found in Zabbix database'.format(group))
+                    template = self._match_filter + ' ' + group
+                    if template not in template_ids:
+                        raise UnimonError(u'Template "{}" is not found in Zabbix database'.format(template))
+                    host_group_ids.append({ 'groupid': group_ids[group] })
+                    host_template_ids.append({ 'templateid': template_ids[template] })
+                hosts_to_create.append( (i, self._get_host_params(name, host_group_ids, host_template_ids)) )
+            except UnimonError as e:
+                results[i] = e
+
+        try:
+            created = batch.try_in_chunks(self._zabbix_api.host.create, [ params for i, params in hosts_to_create ], chunk_size, 'hostids')
+        finally:
+            lookup.invalidate_cache(self._lookup_cache, lookup.HOST)
+
+        for (i, params), result in zip(hosts_to_create, created):
+            if isinstance(result, ZabbixAPIException):
+                result = UnimonError(u'Cannot add host "{}": {}'.format(params['host'], result.args[0]))
+            results[i] = result
+
+        return results
 
     def get_host_id(self, name, visible=False):
-        return lookup.get_object_id(self._zabbix_api, name, lookup.HOST, visible)
+        return lookup.get_object_id(self._zabbix_api, name, lookup.HOST, visible, self._lookup_cache)
 
     def get_host_name(self, id, visible=False):
-        return lookup.get_object_name(self._zabbix_api, id, lookup.HOST, visible)
+        return lookup.get_object_name(self._zabbix_api, id, lookup.HOST, visible, self._lookup_cache)
 
     def _get_group_id(self, name):
-        return lookup.get_object_id(self._zabbix_api, name, lookup.HOST_GROUP)
+        return lookup.get_object_id(self._zabbix_api, name, lookup.HOST_GROUP, cache=self._lookup_cache)
 
     def _get_template_id(self, name, visible=False):
-        return lookup.get_object_id(self._zabbix_api, name, lookup.TEMPLATE, visible)
+        return lookup.get_object_id(self._zabbix_api, name, lookup.TEMPLATE, visible, self._lookup_cache)
+
+    def get_lookup_cache_stats(self):
+        ''' Return a dictionary with hit/miss counters and size of the lookup cache. '''
+        return self._lookup_cache.stats()
+
+    def get_trigger_cache_stats(self):
+        ''' Return a dictionary with hit/miss counters and size of the trigger metadata cache. '''
+        return self._trigger_cache.stats()
+
+    def get_api_metrics(self):
+        ''' Return a dictionary {method: metrics} of API calls (see APIMetrics.get), empty if metrics are not enabled. '''
+        return self._metrics.get() if self._metrics is not None else {}
+
+    def clear_cache(self):
+        ''' Drop all cached data received from Zabbix. '''
+        lookup.invalidate_cache(self._lookup_cache)
+        self._trigger_cache.invalidate()
+        with self._problem_states_lock:
+            self._problem_states.clear()
+            self._summary_states.clear()
 
     def delete_host(self, id):
-        self._zabbix_api.host.delete(id)
+        try:
+            self._zabbix_api.host.delete(id)
+        finally:
+            lookup.invalidate_cache(self._lookup_cache, lookup.HOST)
 
-    def export_config(self, auto_created=False):
-        return export_configs(self._zabbix_api, auto_created)
+    def delete_hosts(self, ids, chunk_size=HOSTS_CHUNK_SIZE):
+        try:
+            deleted = batch.try_in_chunks(self._zabbix_api.host.delete, ids, chunk_size, 'hostids')
+        finally:
+            lookup.invalidate_cache(self._lookup_cache, lookup.HOST)
+
+        results = []
+        for id, result in zip(ids, deleted):
+            if isinstance(result, ZabbixAPIException):
+                result = UnimonError(u'Cannot delete host "{}": {}'.format(id, result.args[0]))
+            results.append(result)
+        return results
+
+    def export_config(self, auto_created=False, workers=EXPORT_WORKERS, chunk_size=EXPORT_CHUNK_SIZE, concurrent_chunks=False):
+        return export_configs(self._zabbix_api, auto_created, workers, chunk_size, concurrent_chunks)
 
-    def import_config(self, config, overwrite=True, delete=False):
-        import_configs(self._zabbix_api, config, overwrite, delete)
+    def iter_config(self, auto_created=False, workers=EXPORT_WORKERS, chunk_size=EXPORT_CHUNK_SIZE, concurrent_chunks=False):
+        ''' Yield (section, objects) pairs of configurations as soon as they are exported (see export_config). '''
+        return iter_export_configs(self._zabbix_api, auto_created, workers, chunk_size, concurrent_chunks)
+
+    def plan_import_config(self, config, delete=False):
+        ''' Return a dictionary {section: ReconcilePlan} of objects that import would create, update and delete. '''
+        return plan_import_configs(self._zabbix_api, config, delete)
+
+    def import_config(self, config, overwrite=True, delete=False, diff=False, manifest=None, chunk_size=batch.IMPORT_CHUNK_SIZE):
+        ''' Import configurations, manifest (ImportManifest) is saved even if import fails to keep imported objects. '''
+        try:
+            return import_configs(self._zabbix_api, config, overwrite, delete, diff, manifest, chunk_size)
+        finally:
+            # Imported objects may be created, renamed or deleted
+            lookup.invalidate_cache(self._lookup_cache)
+            if manifest is not None:
+                manifest.save()